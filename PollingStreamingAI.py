@@ -1,17 +1,27 @@
 #!/usr/bin/python
 # -*- coding:utf-8 -*-
 
+import asyncio
 import datetime
 import sys, os
 import time
-import statistics
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),
-                                             os.path.pardir)))
-from CommonUtils import kbhit
 
-from Automation.BDaq import *
-from Automation.BDaq.WaveformAiCtrl import WaveformAiCtrl
-from Automation.BDaq.BDaqApi import AdxEnumToString, BioFailed
+# Placa real ou simulador, conforme DAQ_BACKEND (ver dispositivo.py)
+from dispositivo import (WaveformAiCtrl, ErrorCode, AdxEnumToString, BioFailed,
+                         kbhit, instalarAvisoBurnout)
+
+from gravador import GravadorIncremental
+from formato_binario import GravadorBinario
+from formato_comprimido import GravadorComprimido
+from pipeline import PipelineAquisicao
+from processamento import blocoAtivo, blocoParaMatriz, inicioEmNs, processarBloco
+from buffer_colunar import BufferColunar
+from gatilho import CondicaoGatilho, MotorGatilho, GravadorEventos
+from resumos import ResumoMultiescala
+from aquisicao_eventos import AquisicaoPorEventos
+from autoajuste import AjusteBloco
+from metricas import Metricas, ExportadorMetricas
+from memoria_compartilhada import AnelCompartilhado
 
 # Configure os parâmetros a seguir
 deviceDescription = "USB-4716,BID#1"
@@ -19,62 +29,93 @@ profilePath = u"C:/Advantech/DAQNavi/Examples/profile/USB-4716.xml"
 
 startChannel = 0
 channelCount = 1
+clockRate = 1000 # Taxa de amostragem TOTAL
 
 sectionLength = 100
 sectionCount = 0 # 0 = Modo Streaming (contínuo)
 
-userParam = DaqEventParam()
-
-@DaqEventCallback(None, c_void_p, POINTER(BfdAiEventArgs), c_void_p)
-def OnBurnoutEvent(sender, args, userParam):
-    status  = cast(args, POINTER(BfdAiEventArgs))[0]
-    channel = status.Offset
-    print("AI Channel%d is burntout!" % (channel))
+# Política do gravador incremental (um arquivo por sessão, só acrescenta o bloco novo)
+flushBytes = 64 * 1024      # descarrega para o disco a cada 64 KB pendentes...
+flushSegundos = 1.0         # ...ou a cada 1 s, o que ocorrer primeiro
+rotacaoBytes = None         # ex.: 50 * 1024 * 1024 para um novo arquivo a cada 50 MB
+rotacaoSegundos = None      # ex.: 3600 para um novo arquivo a cada hora
+
+# "polling" = getData em laço; "eventos" = blocos entregues pelos eventos DataReady do
+# driver (ver aquisicao_eventos.py), com overruns contados e sem travar se a placa parar
+modoAquisicao = "polling"
+timeoutEventoSegundos = 0.5  # espera máxima por um bloco antes de checar o teclado de novo
+
+# Ajuste automático do tamanho de cada getData no modo "polling" (ver autoajuste.py):
+# limites (s) da duração de um bloco. None = sempre USER_BUFFER_SIZE.
+latenciaBloco = (0.01, 0.2)
+blocoMaximoSecoes = 8       # teto do bloco em seções, para caber no buffer do driver
+
+# Métricas do pipeline (ver metricas.py): um JSON por linha a cada intervalo e/ou HTTP local
+arquivoMetricas = None      # ex.: "metricas.jsonl"
+portaMetricas = None        # ex.: 8765 -> http://127.0.0.1:8765/metricas
+intervaloMetricas = 5.0
+
+# Envio das amostras gravadas para o MariaDB (ver banco.py), além dos arquivos.
+# None = desligado; ex.: dict(host="localhost", user="daq", password="...", database="daq")
+conexaoBanco = None
+tabelaBanco = "amostras"
+metodoBanco = "executemany"  # ou "load_data" (LOAD DATA LOCAL INFILE)
+
+# Anel em memória compartilhada para outros processos (gráfico, classificador...)
+# lerem a coleta ao vivo (ver memoria_compartilhada.py). None = desligado.
+memoriaCompartilhada = None         # ex.: "daq_ao_vivo"
+segundosMemoriaCompartilhada = 10   # quanto do fim da coleta fica no anel
+
+# Pasta onde os arquivos de captura são criados
+diretorioSaida = "."
+
+# "csv" = texto legado (Timestamp, Canal_N); "binario" = captura .daq (ver exportar_csv.py);
+# "codigos" = códigos de 16 bits do ADC comprimidos, .daqz (ver formato_comprimido.py)
+formatoGravacao = "csv"
+compressaoCodigos = "zlib"  # "zlib" (rápido) ou "lzma" (menor, mais CPU)
+
+# Blocos que podem aguardar processamento antes de a aquisição começar a descartar
+tamanhoFila = 256
+
+# Blocos com média abaixo deste valor não são gravados
+limiarAtividade = 0.01
+
+# Captura por evento (ver gatilho.py). Lista vazia = filtro antigo pela média do bloco.
+# Não combina com formatoGravacao = "codigos" (o índice de eventos guarda posições em bytes).
+# ex.: gatilhos = [CondicaoGatilho(0, "borda_subida", limiar=0.5, histerese=0.1)]
+gatilhos = []
+preGatilhoSegundos = 0.05   # guardado antes de cada gatilho
+posGatilhoSegundos = 0.2    # guardado depois do último gatilho da janela
+
+# Larguras (s) das janelas de resumo mín/máx/média/RMS (ver resumos.py). Vazio = desligado.
+escalasResumo = [0.01, 1.0, 60.0]
+
+# Segundos de dados mantidos em memória (None = guarda a sessão inteira)
+duracaoMaximaMemoria = 600
 
 USER_BUFFER_SIZE = channelCount * sectionLength
 
-def saveFile(dados_coletados):
-    # --- Bloco de Salvamento ---
-    if len(dados_coletados) > 90:
-        print(f"\nColeta finalizada. Salvando dados em arquivo...")
-
-        agora = datetime.datetime.now()
-        nome_do_arquivo = agora.strftime("dados_%Y-%m-%d_%H-%M-%S.csv")
-
-        with open(nome_do_arquivo, "w") as f:
-            # Escreve o cabeçalho das colunas
-            cabecalho = "Timestamp, " + ", ".join([f"Canal_{i}" for i in range(startChannel, startChannel + channelCount)])
-            f.write(cabecalho + "\n")
-
-            # Percorre a lista de dados coletados e escreve no arquivo
-            for amostra_completa in dados_coletados:
-                timestamp, valores = amostra_completa
-
-                # Verifica se os valores de ambos os canais atendem à condição
-                #if valores[0] > 0.001 and valores[1] > 0.001:
-                if True: # Descomente esta linha para salvar todos os dados, ignorando a condição
-                
-                    # O bloco abaixo só executa se a condição 'if' for verdadeira.
-                    
-                    # Formata o timestamp para incluir milissegundos
-                    timestamp_str = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                    # Formata os valores numéricos
-                    valores_str = ", ".join([f"{valor:.6f}" for valor in valores])
-                    # Cria a linha de texto completa
-                    linha = f"{timestamp_str}, {valores_str}"
-                    # Escreve a linha no arquivo
-                    f.write(linha + "\n")
-                    
-            print(f"Arquivo '{nome_do_arquivo}' salvo com sucesso!")
+async def coletarPorEventos(aquisicao, publicar, metricas):
+    # Mesmo papel do laço de getData, mas esperando os blocos que os eventos entregam
+    async with aquisicao:
+        espera = time.perf_counter()
+        async for bloco in aquisicao.blocos(timeoutEventoSegundos):
+            if bloco is not None:
+                metricas.registrar("getdata", bloco.returnedCount, time.perf_counter() - espera)
+                publicar(bloco.indice_inicial, bloco.returnedCount, bloco.data)
+            if kbhit():
+                break
+            espera = time.perf_counter()
 
 def AdvPollingStreamingAI():
     ret = ErrorCode.Success
 
     # Passo 1: Criar o controlador WaveformAiCtrl
     wfAiCtrl = WaveformAiCtrl(deviceDescription)
-    wfAiCtrl.addBurnOutHandler(OnBurnoutEvent, userParam)
+    instalarAvisoBurnout(wfAiCtrl)
 
-    dados_coletados = []
+    # Resumo da sessão devolvido ao chamador (usado pelo benchmark.py)
+    resumo = {}
 
     for _ in range(1):
         # Carrega o perfil para inicializar o dispositivo
@@ -83,7 +124,7 @@ def AdvPollingStreamingAI():
         # Passo 2: Configurar os parâmetros da operação
         wfAiCtrl.conversion.channelStart = startChannel
         wfAiCtrl.conversion.channelCount = channelCount
-        wfAiCtrl.conversion.clockRate    = 1000 # Taxa de amostragem TOTAL
+        wfAiCtrl.conversion.clockRate    = clockRate
 
         wfAiCtrl.record.sectionCount = sectionCount  
         wfAiCtrl.record.sectionLength = sectionLength
@@ -93,14 +134,83 @@ def AdvPollingStreamingAI():
             #wfAiCtrl.channels[startChannel + i].signalType      = AiSignalType.SingleEnded
             #wfAiCtrl.channels[startChannel + i].valueRange      = ValueRange.V_0To5
 
+        # Taxa de amostragem de cada canal individualmente
+        # (se a taxa total é 2000 Hz para 2 canais, então cada canal tem 1000 amostras/segundo)
+        taxa_por_canal = wfAiCtrl.conversion.clockRate / channelCount
+
+        # Tempos de cada etapa e overruns (dos dois modos) vão para as métricas
+        metricas = Metricas(taxa_por_canal, channelCount)
+
+        # No modo por eventos os handlers precisam existir antes do start()
+        aquisicao = None
+        if modoAquisicao == "eventos":
+            aquisicao = AquisicaoPorEventos(wfAiCtrl, channelCount, tamanho_fila=tamanhoFila,
+                                            ao_overrun=metricas.registrar_overrun)
+
+        # O que depende de recurso externo é aberto antes do start(): se falhar,
+        # a placa ainda não está coletando.
+        canais = range(startChannel, startChannel + channelCount)
+        hora_sessao = datetime.datetime.now()
+        envio_banco = None
+        anel = None
+        exportador = None
+
+        def liberarPreparados():
+            # A coleta não chegou a começar: fecha o que já foi aberto
+            if envio_banco is not None:
+                envio_banco.fechar()
+            if anel is not None:
+                anel.fechar()
+            if exportador is not None:
+                exportador.parar()
+
+        try:
+            # O índice de eventos guarda a posição em bytes de cada janela, que o
+            # .daqz só conhece quando o registro comprimido é fechado
+            if gatilhos and formatoGravacao == "codigos":
+                raise ValueError('gatilhos não podem ser usados com formatoGravacao = "codigos"; '
+                                 'use "binario" ou "csv"')
+
+            # O envio ao banco recebe os mesmos blocos que vão para o arquivo, numa fila
+            # própria; com o banco fora do ar ele abre mesmo assim e manda tudo para o
+            # arquivo de transbordo.
+            if conexaoBanco is not None:
+                from banco import EnvioBanco
+                envio_banco = EnvioBanco(conexaoBanco, tabelaBanco, canais,
+                                         hora_sessao.strftime("%Y-%m-%d_%H-%M-%S"), metodo=metodoBanco,
+                                         caminho_transbordo=os.path.join(diretorioSaida, hora_sessao.strftime(
+                                             "transbordo_%Y-%m-%d_%H-%M-%S.csv")))
+                if not envio_banco.contadores()["conectado"]:
+                    print("Banco indisponível, enviando para", envio_banco.caminho_transbordo)
+
+            # Outros processos leem a coleta ao vivo do anel; ler nunca atrasa a aquisição.
+            # Os leitores só o aceitam depois do anel.iniciar(), já com o horário do início.
+            if memoriaCompartilhada is not None:
+                anel = AnelCompartilhado(memoriaCompartilhada, channelCount,
+                                         int(segundosMemoriaCompartilhada * taxa_por_canal), taxa_por_canal)
+                print(f"Anel em memória compartilhada: '{anel.nome}'")
+
+            # A porta HTTP das métricas é reservada aqui; as threads só começam com a coleta
+            if arquivoMetricas is not None or portaMetricas is not None:
+                caminho_metricas = None if arquivoMetricas is None else os.path.join(diretorioSaida, arquivoMetricas)
+                exportador = ExportadorMetricas(metricas, caminho_metricas, portaMetricas, intervaloMetricas)
+        except BaseException:
+            liberarPreparados()
+            wfAiCtrl.release()
+            wfAiCtrl.dispose()
+            raise
+
         # Passo 3: Preparar e iniciar a operação
         ret = wfAiCtrl.prepare()
         if BioFailed(ret):
+            liberarPreparados()
             break
 
         ret = wfAiCtrl.start()
         if BioFailed(ret):
+            liberarPreparados()
             break
+        metricas.iniciar()
 
         # Passo 4: Coletar dados em tempo real
         print("Coleta de dados em progresso... Pressione qualquer tecla para parar e salvar.")
@@ -109,19 +219,130 @@ def AdvPollingStreamingAI():
         # 1. Marca o tempo de início exato da aquisição
         hora_inicio_coleta = datetime.datetime.now()
         
-        # 2. Calcula a taxa de amostragem para cada canal individualmente
-        #    Se a taxa total é 2000 Hz para 2 canais, então cada canal tem 1000 amostras/segundo.
-        taxa_por_canal = wfAiCtrl.conversion.clockRate / channelCount
-        intervalo_por_amostra = datetime.timedelta(seconds=1.0 / taxa_por_canal)
-        
-        # 3. Mantém um contador de quantas amostras (por canal) já foram processadas
+        # 2. Mantém um contador de quantas amostras (por canal) já foram processadas
         contador_amostras_processadas = 0
         # --- FIM DA MELHORIA ---
 
-        while not kbhit():
+        inicio_ns = inicioEmNs(hora_inicio_coleta)
+        if anel is not None:
+            anel.iniciar(inicio_ns)
+
+        # Abre o gravador uma única vez para toda a sessão
+        politica = dict(diretorio=diretorioSaida, flush_bytes=flushBytes, flush_segundos=flushSegundos,
+                        rotacao_bytes=rotacaoBytes, rotacao_segundos=rotacaoSegundos)
+        if formatoGravacao in ("binario", "codigos"):
+            metadados = {
+                "deviceDescription": deviceDescription,
+                "clockRate": wfAiCtrl.conversion.clockRate,
+                "inicio_ns": inicio_ns,
+                "inicio": hora_inicio_coleta.isoformat(),
+                "valueRange": [str(wfAiCtrl.channels[i].valueRange) for i in canais],
+            }
+            if formatoGravacao == "codigos":
+                gravador = GravadorComprimido(canais, metadados, compressao=compressaoCodigos, **politica)
+            else:
+                gravador = GravadorBinario(canais, metadados, **politica)
+        else:
+            gravador = GravadorIncremental(canais, **politica)
+
+        # Amostras aceitas ficam num buffer colunar (índice int64 + canais float32)
+        dados_coletados = BufferColunar(channelCount, taxa_por_canal, inicio_ns,
+                                        duracao_maxima=duracaoMaximaMemoria)
+
+        # Com gatilhos configurados só as janelas de evento são gravadas e guardadas
+        motor = None
+        gravar = gravador.escrever_bloco
+        if gatilhos:
+            motor = MotorGatilho(gatilhos, canais, taxa_por_canal, inicio_ns,
+                                 preGatilhoSegundos, posGatilhoSegundos)
+            nome_indice = hora_inicio_coleta.strftime("eventos_%Y-%m-%d_%H-%M-%S.csv")
+            gravador_eventos = GravadorEventos(gravador, os.path.join(diretorioSaida, nome_indice))
+            gravar = gravador_eventos.gravar
+
+        if envio_banco is not None:
+            gravar_arquivo = gravar
+
+            def gravar(processado):
+                posicao = gravar_arquivo(processado)
+                for bloco in ([janela for _, janela in processado] if motor is not None else [processado]):
+                    envio_banco.escrever_bloco(bloco)
+                return posicao
+
+        # Resumos mín/máx/média/RMS por janela, gravados ao lado dos dados brutos
+        resumo_multiescala = None
+        if escalasResumo:
+            resumo_multiescala = ResumoMultiescala(canais, taxa_por_canal, inicio_ns, escalasResumo,
+                                                   diretorio=diretorioSaida,
+                                                   metadados={"deviceDescription": deviceDescription})
+
+        # Conversão, filtro e timestamp rodam na thread de processamento do pipeline,
+        # vetorizados com NumPy (um array por bloco em vez de um objeto por amostra)
+        def processarBlocoBruto(bloco_bruto):
+            metricas.verificar_continuidade(bloco_bruto.indice_inicial,
+                                            bloco_bruto.returnedCount // channelCount)
+            bloco = processarBloco(bloco_bruto.data, bloco_bruto.returnedCount, channelCount,
+                                   bloco_bruto.indice_inicial, inicio_ns, taxa_por_canal,
+                                   limiar=float("-inf"))
+            # Leitura menor que um quadro (returnedCount < channelCount) não tem amostras
+            if bloco is None or len(bloco) == 0:
+                return None
+            # Os resumos cobrem a coleta inteira, antes de qualquer filtro
+            if resumo_multiescala is not None:
+                resumo_multiescala.acrescentar_bloco(bloco)
+            if motor is not None:
+                eventos = motor.processar(bloco)
+                for _, janela in eventos:
+                    dados_coletados.acrescentar_bloco(janela)
+                return eventos or None
+            if not blocoAtivo(bloco.valores, limiarAtividade):
+                return None
+            dados_coletados.acrescentar_bloco(bloco)
+            return bloco
+
+        # O tamanho do getData parte de USER_BUFFER_SIZE e segue a carga medida no pipeline
+        ajuste = None
+        if latenciaBloco is not None and aquisicao is None:
+            ajuste = AjusteBloco(channelCount, taxa_por_canal, USER_BUFFER_SIZE // channelCount,
+                                 latenciaBloco[0], latenciaBloco[1],
+                                 amostras_maximas=sectionLength * blocoMaximoSecoes)
+
+        # Tempos de cada etapa vão para as métricas e para o ajuste do bloco
+        def observar(etapa, returnedCount, segundos):
+            metricas.registrar(etapa, returnedCount, segundos)
+            if ajuste is not None:
+                ajuste.registrar(etapa, returnedCount, segundos)
+
+        # A thread de aquisição só lê o dispositivo e publica o bloco na fila;
+        # gravação em disco lenta não atrasa mais o próximo getData
+        pipeline = PipelineAquisicao(processarBlocoBruto, gravar, tamanho_fila=tamanhoFila,
+                                     observar=observar).iniciar()
+
+        metricas.fontes["pipeline"] = pipeline.contadores
+        if ajuste is not None:
+            metricas.fontes["bloco"] = ajuste.relatorio
+        if aquisicao is not None:
+            metricas.fontes["eventos"] = aquisicao.contadores
+        if exportador is not None:
+            exportador.iniciar()
+
+        def publicar(indice_inicial, returnedCount, data):
+            if anel is not None:
+                anel.publicar(indice_inicial, blocoParaMatriz(data, returnedCount, channelCount, "<f4"))
+            pipeline.publicar(indice_inicial, returnedCount, data)
+
+        if aquisicao is not None:
+            asyncio.run(coletarPorEventos(aquisicao, publicar, metricas))
+
+        while aquisicao is None and not kbhit():
             #time.sleep( 1 / 10)
-            result = wfAiCtrl.getData(USER_BUFFER_SIZE, -1)
+            tamanho = USER_BUFFER_SIZE if ajuste is None else ajuste.valores_por_bloco
+            antes = time.perf_counter()
+            result = wfAiCtrl.getData(tamanho, -1)
+            recebido = time.perf_counter()
             ret, returnedCount, data, = result[0], result[1], result[2]
+            metricas.registrar("getdata", returnedCount, recebido - antes)
+            if ret == ErrorCode.WarningCacheOverflow:
+                metricas.registrar_overrun()
             #print(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3])
             #print("Read: ",returnedCount)
             #print("data: ",data)
@@ -131,34 +352,66 @@ def AdvPollingStreamingAI():
             #print("Read: %10.6f, %10.6f" % (data[0], data[1]))
             #for i in range(channelCount):
                 #print("channel %d: %10.6f" % (i + startChannel, data[i]))
-            
-            # Processa o bloco de dados para adicionar o timestamp a cada leitura
-            if returnedCount > 0 and statistics.mean(data) > 0.01:
-                count = 0
-                for i in range(0, returnedCount, channelCount):
-                    count = count + 1
-                    amostras_da_leitura = data[i : i + channelCount]
-                    #print("amostras_da_leitura: ",amostras_da_leitura)
-                    #if (len(amostras_da_leitura) == channelCount) and (amostras_da_leitura[0] > 0.8):
-                    if (len(amostras_da_leitura) == channelCount):
-                        # --- CÁLCULO PRECISO DO TIMESTAMP ---
-                        # Pega o índice da amostra dentro do bloco atual (0, 1, 2, ...)
-                        indice_no_bloco = i // channelCount
-                        
-                        # Calcula o deslocamento de tempo desde o início da coleta
-                        deslocamento_total = (contador_amostras_processadas + indice_no_bloco) * intervalo_por_amostra
-                        timestamp_exato = hora_inicio_coleta + deslocamento_total
-                        # --- FIM DO CÁLCULO ---
-                        
-                        dados_coletados.append((timestamp_exato, amostras_da_leitura))
-                        
-
-                saveFile(dados_coletados)
-                # Atualiza o contador com o número de amostras (por canal) que acabamos de processar
+
+            if returnedCount > 0:
+                publicar(contador_amostras_processadas, returnedCount, data[:returnedCount])
+                # O custo na própria thread de aquisição também conta na carga
+                observar("aquisicao", returnedCount, time.perf_counter() - recebido)
+                # Atualiza o contador com o número de amostras (por canal) lidas do dispositivo,
+                # inclusive as de blocos filtrados, para o tempo não "encolher"
                 contador_amostras_processadas += (returnedCount // channelCount)
-            
+
         # Passo 6: Parar a operação
         ret = wfAiCtrl.stop()
+        if aquisicao is not None:
+            # Blocos que ficaram na fila (ou chegaram até o stop) depois da tecla
+            for bloco in aquisicao.restantes():
+                metricas.registrar("getdata", bloco.returnedCount, 0.0)
+                publicar(bloco.indice_inicial, bloco.returnedCount, bloco.data)
+            contador_amostras_processadas = aquisicao.amostras_lidas
+        pipeline.parar()
+        if anel is not None:
+            # Blocos descartados depois do último publicado também ficam marcados
+            anel.descartar_ate(contador_amostras_processadas)
+            anel.fechar()
+        if motor is not None:
+            # Evento ainda aberto quando a coleta parou
+            # (pelo mesmo gravar do pipeline, para chegar também ao banco)
+            for evento, janela in motor.finalizar():
+                dados_coletados.acrescentar_bloco(janela)
+                gravar([(evento, janela)])
+            gravador_eventos.fechar()
+        else:
+            gravador.fechar()
+        if resumo_multiescala is not None:
+            resumo_multiescala.fechar()
+        if envio_banco is not None:
+            print("Banco:", envio_banco.fechar())
+        print("Pipeline:", pipeline.contadores())
+        estado_metricas = exportador.parar() if exportador is not None else metricas.instantaneo()
+        print("Métricas: %.1f amostras/s, deriva %.3f s, %d lacunas, %d overruns" % (
+            estado_metricas["amostras_por_s"] or 0.0, estado_metricas["deriva_s"],
+            estado_metricas["lacunas"], estado_metricas["overruns"]))
+
+        resumo = {
+            "amostras_lidas": contador_amostras_processadas,
+            "linhas_gravadas": gravador.linhas_gravadas,
+            "arquivos": list(gravador.arquivos_gravados),
+            "bytes_buffer": dados_coletados.nbytes,
+            "latencias": list(pipeline.latencias),
+            "overruns": getattr(wfAiCtrl, "overruns", None),
+            "pipeline": pipeline.contadores(),
+            "metricas": estado_metricas,
+        }
+        if envio_banco is not None:
+            resumo["banco"] = envio_banco.contadores()
+        if ajuste is not None:
+            print("Bloco:", ajuste.relatorio())
+            resumo["bloco"] = ajuste.relatorio()
+        if aquisicao is not None:
+            print("Eventos:", aquisicao.contadores())
+            resumo["eventos"] = aquisicao.contadores()
+            resumo["overruns"] = aquisicao.overruns
 
     # --- Bloco de Salvamento ---
     '''
@@ -203,7 +456,7 @@ def AdvPollingStreamingAI():
         print("Some error occurred. And the last error code is %#x. [%s]" %
               (ret.value, enumStr))
         
-    return 0
+    return resumo
 
 if __name__ == '__main__':
     AdvPollingStreamingAI()
\ No newline at end of file
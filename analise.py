@@ -0,0 +1,328 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Extração de características em lote sobre as capturas dados_*.
+#
+# Cada arquivo é lido em pedaços (leitor.abrirArquivo: texto, .daq ou .daqz)
+# e cada canal é dividido em eventos: trechos em que |valor| passa do limiar.
+# Por evento saem pico, instante do pico, largura a meia altura, tempo de
+# subida 10-90 %, carga (integral), energia (integral do quadrado), duração e
+# duas características espectrais (frequência dominante e centroide). Os
+# arquivos são processados em paralelo num pool de processos.
+#
+# O resultado de cada arquivo fica num cache indexado pelo hash do conteúdo
+# (e pelos parâmetros), então rodar de novo só processa capturas novas ou
+# alteradas. Opcionalmente um modelo salvo (joblib/scikit-learn ou XGBoost)
+# pontua cada evento.
+#
+#   python analise.py "dados_*" --limiar 0.5 --saida caracteristicas.csv
+#   python analise.py "dados_*" --modelo classificador.joblib --processos 8
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from formato_binario import lerCabecalho
+from leitor import abrirArquivo
+
+VERSAO_CACHE = 1
+
+CARACTERISTICAS = ["pico", "largura_meia_altura_s", "tempo_subida_s", "carga", "energia",
+                   "duracao_s", "frequencia_dominante_hz", "centroide_espectral_hz"]
+
+
+def hashArquivo(caminho, tamanho_chunk=8 * 1024 * 1024):
+    h = hashlib.sha1()
+    with open(caminho, "rb") as f:
+        while True:
+            chunk = f.read(tamanho_chunk)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def caracteristicasEvento(ns, v):
+    # ns: int64 (ns), v: valores de um canal; o trecho inclui as amostras de
+    # pré-evento usadas no tempo de subida. Tudo vetorizado sobre o evento.
+    dt = float(np.median(np.diff(ns))) / 1e9 if len(ns) > 1 else 0.0
+    a = np.abs(v)
+    k_pico = int(np.argmax(a))
+    pico = float(v[k_pico])
+    altura = a[k_pico]
+
+    acima = np.flatnonzero(a >= altura / 2)
+    largura = (ns[acima[-1]] - ns[acima[0]]) / 1e9 + dt
+
+    # Subida: primeira passagem por 10 % e por 90 % do pico antes dele
+    subida = a[:k_pico + 1]
+    k10 = int(np.argmax(subida >= 0.1 * altura))
+    k90 = int(np.argmax(subida >= 0.9 * altura))
+    tempo_subida = (ns[k90] - ns[k10]) / 1e9
+
+    espectro = np.abs(np.fft.rfft(v - v.mean()))
+    frequencias = np.fft.rfftfreq(len(v), dt) if dt > 0 else np.zeros(len(espectro))
+    if len(espectro) > 1 and espectro[1:].sum() > 0:
+        dominante = float(frequencias[1 + np.argmax(espectro[1:])])
+        centroide = float((frequencias * espectro).sum() / espectro.sum())
+    else:
+        dominante = centroide = 0.0
+
+    return {
+        "pico": pico,
+        "tempo_pico": int(ns[k_pico]),
+        "largura_meia_altura_s": largura,
+        "tempo_subida_s": tempo_subida,
+        "carga": float(v.sum() * dt),
+        "energia": float((v.astype(np.float64) ** 2).sum() * dt),
+        "duracao_s": (ns[-1] - ns[0]) / 1e9 + dt,
+        "frequencia_dominante_hz": dominante,
+        "centroide_espectral_hz": centroide,
+    }
+
+
+class _DetectorEventos:
+
+    # Eventos de um canal ao longo dos pedaços: o evento aberto no fim de um
+    # pedaço (e as `pre` amostras antes dele) segue para o próximo
+
+    def __init__(self, limiar, pre, maximo):
+        self.limiar = limiar
+        self.pre = pre
+        self.maximo = maximo    # amostras; eventos mais longos são cortados
+        self.ns = np.empty(0, np.int64)
+        self.v = np.empty(0)
+
+    def acrescentar(self, ns, v, final=False):
+        ns = np.concatenate([self.ns, ns])
+        v = np.concatenate([self.v, v])
+        acima = np.abs(v) > self.limiar
+        bordas = np.diff(acima.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+        inicios = np.flatnonzero(bordas == 1)
+        fins = np.flatnonzero(bordas == -1)
+
+        eventos = []
+        fim_anterior = 0
+        guardar_de = max(0, len(v) - self.pre)
+        for a, b in zip(inicios, fins):
+            if b == len(v) and not final and b - a < self.maximo:
+                # Ainda aberto: volta inteiro (com o pré-evento) no próximo pedaço
+                guardar_de = max(fim_anterior, a - self.pre)
+                break
+            b = min(b, a + self.maximo)
+            ini = max(0, a - self.pre)
+            eventos.append(caracteristicasEvento(ns[ini:b], v[ini:b]))
+            fim_anterior = b
+            guardar_de = max(guardar_de, b)
+        self.ns, self.v = ns[guardar_de:], v[guardar_de:]
+        return eventos
+
+
+def analisarArquivo(caminho, parametros):
+    # Roda num processo do pool: devolve o dict que vai para o cache
+    arquivo = abrirArquivo(caminho)
+    canais = parametros.get("canais") or arquivo.canais
+    canais = [c for c in canais if c in arquivo.canais]
+    maximo = _maximoAmostras(arquivo, parametros["maximo_s"])
+    detectores = {c: _DetectorEventos(parametros["limiar"], parametros["pre"], maximo) for c in canais}
+    eventos = []
+    amostras = 0
+    for t, valores in arquivo.iterar(canais=canais, linhas_por_chunk=parametros["linhas_por_chunk"]):
+        ns = t.astype(np.int64)
+        amostras += len(ns)
+        for j, c in enumerate(canais):
+            for e in detectores[c].acrescentar(ns, valores[:, j]):
+                eventos.append(dict(e, canal=c))
+    for c, d in detectores.items():
+        for e in d.acrescentar(np.empty(0, np.int64), np.empty(0), final=True):
+            eventos.append(dict(e, canal=c))
+    eventos.sort(key=lambda e: (e["tempo_pico"], e["canal"]))
+    return {"amostras": amostras, "canais": canais, "eventos": eventos}
+
+
+class CacheAnalise:
+
+    # Uma pasta com um JSON por (hash do arquivo, parâmetros) e um manifesto
+    # caminho -> (tamanho, mtime, hash) para nem recalcular o hash de quem não mudou
+
+    def __init__(self, pasta=".analise_cache"):
+        self.pasta = pasta
+        os.makedirs(pasta, exist_ok=True)
+        self.caminho_manifesto = os.path.join(pasta, "manifesto.json")
+        try:
+            with open(self.caminho_manifesto) as f:
+                self.manifesto = json.load(f)
+        except (OSError, ValueError):
+            self.manifesto = {}
+
+    def hash(self, caminho):
+        info = os.stat(caminho)
+        chave = os.path.abspath(caminho)
+        registro = self.manifesto.get(chave)
+        if registro and registro["tamanho"] == info.st_size and registro["mtime"] == info.st_mtime:
+            return registro["hash"]
+        h = hashArquivo(caminho)
+        self.manifesto[chave] = {"tamanho": info.st_size, "mtime": info.st_mtime, "hash": h}
+        return h
+
+    def _caminho(self, h, parametros):
+        p = hashlib.sha1(json.dumps(parametros, sort_keys=True).encode()).hexdigest()[:12]
+        return os.path.join(self.pasta, f"{h}_{p}.json")
+
+    def ler(self, h, parametros):
+        try:
+            with open(self._caminho(h, parametros)) as f:
+                resultado = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return resultado if resultado.get("versao") == VERSAO_CACHE else None
+
+    def gravar(self, h, parametros, resultado):
+        caminho = self._caminho(h, parametros)
+        with open(caminho + ".tmp", "w") as f:
+            json.dump(dict(resultado, versao=VERSAO_CACHE), f)
+        os.replace(caminho + ".tmp", caminho)
+
+    def salvar_manifesto(self):
+        with open(self.caminho_manifesto + ".tmp", "w") as f:
+            json.dump(self.manifesto, f)
+        os.replace(self.caminho_manifesto + ".tmp", self.caminho_manifesto)
+
+
+def listarCapturas(origem):
+    # Mesmos critérios do leitor.Leitor: ignora índices, resumos e o que não for captura
+    caminhos = []
+    for padrao in ([origem] if isinstance(origem, str) else origem):
+        if os.path.isdir(padrao):
+            padrao = os.path.join(padrao, "dados_*")
+        caminhos.extend(glob.glob(padrao))
+    capturas = []
+    for caminho in sorted(set(caminhos)):
+        if caminho.endswith((".idx", ".tmp")):
+            continue
+        if caminho.endswith(".daq") and lerCabecalho(caminho).get("tipo") == "resumo":
+            continue
+        capturas.append(caminho)
+    return capturas
+
+
+def carregarModelo(caminho):
+    if caminho.endswith((".json", ".ubj")):
+        import xgboost
+        modelo = xgboost.Booster()
+        modelo.load_model(caminho)
+        return modelo
+    import joblib
+    return joblib.load(caminho)
+
+
+def pontuar(modelo, eventos):
+    # Acrescenta "pontuacao" (probabilidade da classe positiva, ou a predição) a cada evento
+    if not eventos:
+        return
+    x = np.array([[e[c] for c in CARACTERISTICAS] for e in eventos], dtype=np.float64)
+    if type(modelo).__name__ == "Booster":
+        import xgboost
+        y = modelo.predict(xgboost.DMatrix(x, feature_names=CARACTERISTICAS))
+    elif hasattr(modelo, "predict_proba"):
+        y = modelo.predict_proba(x)[:, -1]
+    else:
+        y = modelo.predict(x)
+    for e, p in zip(eventos, np.asarray(y, dtype=np.float64).tolist()):
+        e["pontuacao"] = p
+
+
+def analisarLote(origem, limiar=0.5, canais=None, pre=20, maximo_s=10.0, processos=None,
+                 pasta_cache=".analise_cache", modelo=None, linhas_por_chunk=100000):
+    # Retorna a lista de eventos (dicts) de todas as capturas, com "arquivo" e "canal"
+    capturas = listarCapturas(origem)
+    cache = CacheAnalise(pasta_cache)
+    parametros = {"limiar": limiar, "canais": canais, "pre": pre, "maximo_s": maximo_s,
+                  "linhas_por_chunk": linhas_por_chunk}
+
+    resultados = {}
+    pendentes = []
+    for caminho in capturas:
+        h = cache.hash(caminho)
+        resultado = cache.ler(h, parametros)
+        if resultado is None:
+            pendentes.append((caminho, h))
+        else:
+            resultados[caminho] = resultado
+
+    if pendentes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as pool:
+            futuros = {pool.submit(analisarArquivo, caminho, parametros): (caminho, h)
+                       for caminho, h in pendentes}
+            for futuro in concurrent.futures.as_completed(futuros):
+                caminho, h = futuros[futuro]
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    print(f"Erro em '{caminho}': {e!r}")
+                    continue
+                cache.gravar(h, parametros, resultado)
+                resultados[caminho] = resultado
+    cache.salvar_manifesto()
+
+    eventos = []
+    for caminho in capturas:
+        for e in resultados.get(caminho, {}).get("eventos", []):
+            eventos.append(dict(e, arquivo=os.path.basename(caminho)))
+    if modelo is not None:
+        pontuar(carregarModelo(modelo) if isinstance(modelo, str) else modelo, eventos)
+    print("%d capturas (%d processadas, %d do cache), %d eventos" % (
+        len(capturas), len(pendentes), len(capturas) - len(pendentes), len(eventos)))
+    return eventos
+
+
+def _maximoAmostras(arquivo, maximo_s):
+    # Duração máxima de um evento em amostras: taxa do cabeçalho nas capturas
+    # binárias; nos textos, estimada pelas linhas e pela duração do arquivo
+    metadados = getattr(arquivo, "metadados", None)
+    if metadados is not None:
+        taxa = metadados["clockRate"] / metadados["channelCount"]
+    elif arquivo.ultimo_ns is not None and arquivo.ultimo_ns > arquivo.primeiro_ns:
+        taxa = (arquivo.linhas - 1) * 1e9 / (arquivo.ultimo_ns - arquivo.primeiro_ns)
+    else:
+        taxa = 1000.0
+    return max(1, int(maximo_s * taxa))
+
+
+def gravarCsv(eventos, caminho):
+    colunas = ["arquivo", "canal", "tempo_pico"] + CARACTERISTICAS
+    if any("pontuacao" in e for e in eventos):
+        colunas.append("pontuacao")
+    with open(caminho, "w", newline="") as f:
+        escritor = csv.writer(f, lineterminator="\n")
+        escritor.writerow(colunas)
+        for e in eventos:
+            linha = dict(e, tempo_pico=np.datetime_as_string(np.datetime64(e["tempo_pico"], "ns"), unit="us")
+                         .replace("T", " "))
+            escritor.writerow([linha.get(c, "") for c in colunas])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Características por evento das capturas dados_*")
+    parser.add_argument("origem", nargs="*", default=["dados_*"], help="pastas, arquivos ou padrões glob")
+    parser.add_argument("--limiar", type=float, default=0.5, help="|valor| acima disto é evento")
+    parser.add_argument("--canais", default=None, help="ex.: 0,1 (padrão: todos)")
+    parser.add_argument("--pre", type=int, default=20, help="amostras antes do evento (tempo de subida)")
+    parser.add_argument("--maximo", type=float, default=10.0, help="duração máxima (s) de um evento")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--cache", default=".analise_cache")
+    parser.add_argument("--modelo", default=None, help="modelo joblib ou XGBoost (.json/.ubj) para pontuar")
+    parser.add_argument("--saida", default="caracteristicas.csv")
+    args = parser.parse_args()
+
+    canais = [int(c) for c in args.canais.split(",")] if args.canais else None
+    eventos = analisarLote(args.origem, args.limiar, canais, args.pre, args.maximo, args.processos,
+                           args.cache, args.modelo)
+    gravarCsv(eventos, args.saida)
+    print(f"Arquivo '{args.saida}' salvo com sucesso!")
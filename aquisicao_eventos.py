@@ -0,0 +1,206 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Aquisição dirigida pelos eventos do driver, em vez de getData(-1) em laço.
+#
+# O driver avisa quando há dados prontos (DataReady), quando o buffer circular
+# transbordou (Overrun / CacheOverflow) e quando a operação parou (Stopped).
+# No callback de DataReady os valores são lidos com getData(count, 0), que
+# nunca bloqueia, e o bloco é entregue a uma asyncio.Queue. O consumidor
+# espera com timeout (um dispositivo parado não trava mais o processo) e pode
+# cancelar a qualquer momento. Overruns viram contadores em vez de perda
+# silenciosa de dados. Blocos que ainda estavam na fila na saída do `async
+# with`, ou que chegaram depois dela, ficam guardados até restantes().
+#
+#   aquisicao = AquisicaoPorEventos(wfAiCtrl, channelCount,
+#                                   ao_overrun=metricas.registrar_overrun)   # antes do start()
+#   wfAiCtrl.start()
+#   async with aquisicao:
+#       async for bloco in aquisicao.blocos(timeout=0.5):
+#           ...   # bloco: pipeline.BlocoBruto, ou None quando o timeout expira
+#   wfAiCtrl.stop()
+#   for bloco in aquisicao.restantes():
+#       ...
+
+import asyncio
+import threading
+
+from dispositivo import BioFailed, instalarEventosDados
+from pipeline import BlocoBruto
+
+_FIM = object()
+
+
+class AquisicaoPorEventos:
+
+    def __init__(self, wfAiCtrl, channelCount, tamanho_fila=256, ao_overrun=None):
+        # Os handlers precisam estar registrados antes do start() do controlador.
+        # ao_overrun: chamado sem argumentos a cada evento Overrun do driver
+        # (na thread do driver), ex.: metricas.registrar_overrun
+        self.wfAiCtrl = wfAiCtrl
+        self.channelCount = channelCount
+        self.tamanho_fila = tamanho_fila
+        self.ao_overrun = ao_overrun
+
+        self._loop = None
+        self._fila = None
+        self._pendentes = []        # blocos que chegaram sem laço asyncio (antes ou depois do async with)
+        self._lock = threading.Lock()
+        self.amostras_lidas = 0     # amostras por canal já lidas (índice do próximo bloco)
+
+        # Contadores
+        self.eventos_dados = 0
+        self.blocos_recebidos = 0
+        self.blocos_descartados = 0
+        self.amostras_descartadas = 0
+        self.overruns = 0
+        self.cache_overflows = 0
+        self.timeouts = 0
+        self.erros = []
+        self.parado = False
+
+        instalarEventosDados(wfAiCtrl, self._ao_dados, self._ao_overrun,
+                             self._ao_cache_overflow, self._ao_parado)
+
+    # --- Callbacks (thread do driver) ---
+    def _ao_dados(self, count):
+        self.eventos_dados += 1
+        count -= count % self.channelCount
+        if count <= 0:
+            return
+        ret, returnedCount, data = self.wfAiCtrl.getData(count, 0)[:3]
+        if BioFailed(ret):
+            self.erros.append(ret)
+            return
+        returnedCount -= returnedCount % self.channelCount
+        if returnedCount <= 0:
+            return
+        # O índice avança mesmo se o bloco for descartado, para os timestamps
+        # dos blocos seguintes continuarem corretos
+        bloco = BlocoBruto(self.amostras_lidas, returnedCount, data[:returnedCount])
+        self.amostras_lidas += returnedCount // self.channelCount
+        self._entregar(bloco)
+
+    def _ao_overrun(self, count):
+        self.overruns += 1
+        if self.ao_overrun is not None:
+            self.ao_overrun()
+
+    def _ao_cache_overflow(self, count):
+        self.cache_overflows += 1
+
+    def _ao_parado(self, count):
+        self.parado = True
+        self._entregar(_FIM)
+
+    def _entregar(self, item):
+        # Agendado ainda com o lock: depois que __aexit__ tira o laço, nenhum
+        # bloco pode mais cair numa fila que ninguém vai ler
+        with self._lock:
+            if self._loop is None:
+                self._pendentes.append(item)
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._enfileirar, item)
+            except RuntimeError:
+                # Laço asyncio já fechado: ninguém mais vai consumir
+                if item is not _FIM:
+                    self._descartar(item)
+
+    # --- Laço asyncio ---
+    def _enfileirar(self, item):
+        if item is _FIM:
+            # O fim nunca é descartado: abre espaço tirando o bloco mais antigo
+            while self._fila.full():
+                self._descartar(self._fila.get_nowait())
+            self._fila.put_nowait(item)
+            return
+        try:
+            self._fila.put_nowait(item)
+            self.blocos_recebidos += 1
+        except asyncio.QueueFull:
+            self._descartar(item)
+
+    def _descartar(self, bloco):
+        if bloco is _FIM:
+            return
+        self.blocos_descartados += 1
+        self.amostras_descartadas += bloco.returnedCount // self.channelCount
+
+    async def __aenter__(self):
+        self._fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            pendentes, self._pendentes = self._pendentes, []
+        for item in pendentes:
+            self._enfileirar(item)
+        return self
+
+    async def __aexit__(self, *exc):
+        with self._lock:
+            self._loop = None
+        # Deixa rodar os _enfileirar já agendados e guarda o que não foi
+        # consumido, na frente do que chegar depois, para restantes()
+        await asyncio.sleep(0)
+        sobras = []
+        while not self._fila.empty():
+            item = self._fila.get_nowait()
+            if item is not _FIM:
+                sobras.append(item)
+        with self._lock:
+            self._pendentes[:0] = sobras
+        self.blocos_recebidos -= len(sobras)
+        return False
+
+    async def proximo(self, timeout=None):
+        # Próximo bloco; None quando a aquisição parou ou foi cancelada.
+        # Levanta asyncio.TimeoutError se nada chegar em `timeout` segundos.
+        try:
+            item = await asyncio.wait_for(self._fila.get(), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        if item is _FIM:
+            # Deixa o fim na fila para outras chamadas também encerrarem
+            self._fila.put_nowait(_FIM)
+            return None
+        return item
+
+    async def blocos(self, timeout=None):
+        # Itera sobre os blocos; com timeout, produz None a cada espera excedida
+        # para o consumidor poder checar teclado, prazo etc.
+        while True:
+            try:
+                bloco = await self.proximo(timeout)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if bloco is None:
+                return
+            yield bloco
+
+    def restantes(self):
+        # Blocos que chegaram e não foram consumidos pelo async with, em ordem.
+        # Chamar depois do stop() do controlador, para não vir mais nenhum.
+        with self._lock:
+            itens, self._pendentes = self._pendentes, []
+        blocos = [item for item in itens if item is not _FIM]
+        self.blocos_recebidos += len(blocos)
+        return blocos
+
+    def cancelar(self):
+        # Pode ser chamado de qualquer thread; encerra proximo()/blocos()
+        self._entregar(_FIM)
+
+    def contadores(self):
+        return {
+            "eventos_dados": self.eventos_dados,
+            "blocos_recebidos": self.blocos_recebidos,
+            "blocos_descartados": self.blocos_descartados,
+            "amostras_descartadas": self.amostras_descartadas,
+            "overruns": self.overruns,
+            "cache_overflows": self.cache_overflows,
+            "timeouts": self.timeouts,
+            "nao_consumidos": sum(item is not _FIM for item in self._pendentes),
+            "erros": len(self.erros),
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Ajuste automático do tamanho do bloco lido com getData.
+#
+# Cada bloco custa um tempo fixo (chamada ao driver, conversão da lista,
+# fila, escrita) mais um tempo proporcional ao número de amostras. A "carga"
+# de um bloco é esse custo dividido pela duração que ele representa
+# (amostras / taxa por canal): acima de 1 o pipeline não acompanha a placa.
+#
+# Blocos pequenos dão latência baixa mas carga alta (o custo fixo domina);
+# blocos grandes amortizam o custo fixo mas atrasam a entrega e aumentam os
+# picos de memória. O AjusteBloco mede a carga a cada N blocos e dobra o
+# bloco quando ela passa de carga_alvo[1], ou reduz à metade quando fica
+# abaixo de carga_alvo[0], sempre dentro dos limites de latência.
+
+import math
+import threading
+
+
+class AjusteBloco:
+
+    def __init__(self, channelCount, taxa_por_canal, amostras_iniciais,
+                 latencia_minima=0.01, latencia_maxima=0.2, amostras_maximas=None,
+                 carga_alvo=(0.1, 0.5), blocos_por_ajuste=10):
+        # amostras_*: por canal; latencia_*: duração (s) de um bloco
+        # amostras_maximas: teto imposto pelo buffer do driver (None = sem teto)
+        self.channelCount = channelCount
+        self.taxa_por_canal = taxa_por_canal
+        self.carga_alvo = carga_alvo
+        self.blocos_por_ajuste = blocos_por_ajuste
+
+        self.minimo = max(1, math.ceil(latencia_minima * taxa_por_canal))
+        self.maximo = max(1, math.floor(latencia_maxima * taxa_por_canal))
+        if amostras_maximas is not None:
+            self.maximo = min(self.maximo, amostras_maximas)
+        self.minimo = min(self.minimo, self.maximo)
+        self.amostras = min(max(amostras_iniciais, self.minimo), self.maximo)
+
+        self._lock = threading.Lock()
+        self._blocos = 0
+        self._amostras_medidas = 0
+        self._segundos = 0.0
+        self.carga = None
+        self.ajustes = []       # (amostras antes, amostras depois, carga medida)
+
+    @property
+    def valores_por_bloco(self):
+        # O "count" do getData: amostras x canais
+        return self.amostras * self.channelCount
+
+    def registrar(self, etapa, valores, segundos):
+        # Tempo gasto com um bloco de `valores` (amostras x canais) numa etapa
+        # do pipeline (assinatura do observar do PipelineAquisicao). Todo bloco
+        # passa uma vez pelo "processamento", então só ele conta amostras; as
+        # outras etapas só somam tempo. Pode ser chamado de várias threads.
+        with self._lock:
+            self._segundos += segundos
+            if etapa != "processamento":
+                return
+            self._blocos += 1
+            self._amostras_medidas += valores // self.channelCount
+            if self._blocos >= self.blocos_por_ajuste:
+                self._ajustar()
+
+    def _ajustar(self):
+        duracao = self._amostras_medidas / self.taxa_por_canal
+        if duracao > 0:
+            self.carga = self._segundos / duracao
+            anterior = self.amostras
+            if self.carga > self.carga_alvo[1]:
+                self.amostras = min(self.amostras * 2, self.maximo)
+            elif self.carga < self.carga_alvo[0]:
+                self.amostras = max(self.amostras // 2, self.minimo)
+            if self.amostras != anterior:
+                self.ajustes.append((anterior, self.amostras, round(self.carga, 4)))
+        self._blocos = 0
+        self._amostras_medidas = 0
+        self._segundos = 0.0
+
+    def relatorio(self):
+        return {
+            "amostras_por_bloco": self.amostras,
+            "valores_por_bloco": self.valores_por_bloco,
+            "latencia_bloco_s": self.amostras / self.taxa_por_canal,
+            "carga": self.carga,
+            # Fração do tempo de cada bloco ainda livre para o pipeline
+            "folga": None if self.carga is None else 1.0 - self.carga,
+            "limites_amostras": [self.minimo, self.maximo],
+            "ajustes": list(self.ajustes),
+        }
@@ -0,0 +1,374 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Envio das amostras para o MariaDB em lotes, fora da thread de aquisição.
+#
+# escrever_bloco() só coloca o bloco numa fila limitada e volta na hora.
+# Threads de envio (uma por conexão do pool) juntam blocos em lotes de até
+# `linhas_por_lote` linhas e inserem com executemany ou LOAD DATA LOCAL
+# INFILE, com novas tentativas e espera crescente. Se o banco estiver lento
+# ou fora do ar, a fila enche e os blocos vão para um arquivo local de
+# transbordo (CSV), que pode ser reenviado depois. Sem conexão já na abertura,
+# a coleta segue do mesmo jeito: as threads de envio tentam conectar de novo
+# e, enquanto o banco não volta, tudo vai para o transbordo:
+#
+#   python banco.py --host localhost --usuario daq --senha ... --banco daq --reenviar transbordo.csv
+#   python banco.py --host localhost --usuario daq --senha ... --banco daq --teste
+#
+# A tabela tem uma linha por amostra: sessão, índice, horário e um DOUBLE por
+# canal, com chave (sessao, indice). Os inserts usam IGNORE, então reenviar
+# um lote que já tinha entrado não duplica nada.
+#
+# Requer o pacote mariadb (requiremets.txt), importado só quando o envio é usado.
+
+import argparse
+import csv
+import os
+import queue
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+_FIM = object()
+
+
+def _mariadb():
+    try:
+        import mariadb
+    except ImportError:
+        raise ImportError("o envio para o banco precisa do pacote mariadb (pip install mariadb)")
+    return mariadb
+
+
+def criarTabela(conexao, tabela, canais):
+    colunas = ", ".join(f"Canal_{c} DOUBLE" for c in canais)
+    cursor = conexao.cursor()
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {tabela} ("
+                   f"sessao VARCHAR(64) NOT NULL, indice BIGINT NOT NULL, tempo DATETIME(6) NOT NULL, "
+                   f"{colunas}, PRIMARY KEY (sessao, indice))")
+    conexao.commit()
+    cursor.close()
+
+
+def linhasDoBloco(sessao, bloco):
+    # processamento.Bloco -> lista de tuplas (sessao, indice, datetime, v0, v1, ...)
+    tempos = bloco.timestamps.astype("datetime64[us]").tolist()
+    return [(sessao, i, t, *v) for i, t, v in
+            zip(bloco.indices.tolist(), tempos, np.asarray(bloco.valores, dtype=np.float64).tolist())]
+
+
+class EnvioBanco:
+
+    def __init__(self, conexao, tabela, canais, sessao, metodo="executemany",
+                 tamanho_pool=2, linhas_por_lote=5000, tamanho_fila=256,
+                 tentativas=5, espera_inicial=0.5, espera_maxima=10.0,
+                 caminho_transbordo="transbordo.csv"):
+        # conexao: parâmetros do mariadb.connect (host, port, user, password, database)
+        # metodo: "executemany" ou "load_data" (LOAD DATA LOCAL INFILE)
+        mariadb = _mariadb()
+        self.erro_banco = mariadb.Error
+        self.tabela = tabela
+        self.canais = list(canais)
+        self.sessao = sessao
+        self.metodo = metodo
+        self.linhas_por_lote = linhas_por_lote
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.espera_maxima = espera_maxima
+        self.caminho_transbordo = caminho_transbordo
+
+        # Contadores
+        self.linhas_inseridas = 0
+        self.lotes_inseridos = 0
+        self.novas_tentativas = 0
+        self.lotes_transbordados = 0
+        self.linhas_transbordadas = 0
+        self.erros = []
+        self._lock = threading.Lock()
+
+        conexao = dict(conexao)
+        if metodo == "load_data":
+            conexao["local_infile"] = True
+        self._conexao = conexao
+        self._tamanho_pool = tamanho_pool
+        self._tentativas_conexao = 0
+        self._proxima_conexao = 0.0
+        self._lock_conexao = threading.Lock()
+        self.pool = None
+        # Banco fora do ar: não impede a coleta; as threads de envio tentam de novo
+        # e, enquanto não conseguem, os lotes vão para o transbordo
+        self._conectar()
+
+        colunas = ", ".join(["sessao", "indice", "tempo"] + [f"Canal_{c}" for c in self.canais])
+        marcadores = ", ".join(["?"] * (3 + len(self.canais)))
+        self._sql_insert = f"INSERT IGNORE INTO {tabela} ({colunas}) VALUES ({marcadores})"
+        self._sql_load = (f"LOAD DATA LOCAL INFILE ? IGNORE INTO TABLE {tabela} "
+                          f"FIELDS TERMINATED BY ',' LINES TERMINATED BY '\\n' ({colunas})")
+
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self._lock_transbordo = threading.Lock()
+
+        self._threads = [threading.Thread(target=self._laco, name=f"banco{i}", daemon=True)
+                         for i in range(tamanho_pool)]
+        for t in self._threads:
+            t.start()
+
+    def _conectar(self):
+        # Cria o pool e a tabela; devolve False (e guarda o erro) se o banco não responde
+        mariadb = _mariadb()
+        self._tentativas_conexao += 1
+        pool = None
+        try:
+            # Cada tentativa tem um nome novo: o mariadb não aceita dois pools com o mesmo
+            pool = mariadb.ConnectionPool(
+                pool_name=f"daq_{os.getpid()}_{id(self)}_{self._tentativas_conexao}",
+                pool_size=self._tamanho_pool, **self._conexao)
+            c = pool.get_connection()
+            try:
+                criarTabela(c, self.tabela, self.canais)
+            finally:
+                c.close()
+        except mariadb.Error as e:
+            with self._lock:
+                self.erros.append(repr(e))
+            if pool is not None:
+                pool.close()
+            return False
+        self.pool = pool
+        return True
+
+    def _reconectar(self):
+        # Mesma espera crescente dos inserts; uma thread conecta de cada vez e,
+        # depois de esgotar as tentativas, os lotes seguintes vão direto para o
+        # transbordo até passar espera_maxima
+        with self._lock_conexao:
+            if self.pool is not None:
+                return True
+            if time.monotonic() < self._proxima_conexao:
+                return False
+            espera = self.espera_inicial
+            for tentativa in range(self.tentativas):
+                if self._conectar():
+                    return True
+                if tentativa + 1 < self.tentativas:
+                    with self._lock:
+                        self.novas_tentativas += 1
+                    time.sleep(espera)
+                    espera = min(espera * 2, self.espera_maxima)
+            self._proxima_conexao = time.monotonic() + self.espera_maxima
+            return False
+
+    # --- Lado do pipeline ---
+    def escrever_bloco(self, bloco):
+        # Nunca espera o banco: com a fila cheia o bloco vai direto para o transbordo
+        if len(bloco) == 0:
+            return
+        try:
+            self.fila.put_nowait(bloco)
+        except queue.Full:
+            self._transbordar(linhasDoBloco(self.sessao, bloco))
+
+    # --- Threads de envio ---
+    def _laco(self):
+        while True:
+            bloco = self.fila.get()
+            if bloco is _FIM:
+                return
+            linhas = linhasDoBloco(self.sessao, bloco)
+            # Junta o que já estiver esperando, até completar o lote
+            fim = False
+            while len(linhas) < self.linhas_por_lote:
+                try:
+                    proximo = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is _FIM:
+                    fim = True
+                    break
+                linhas.extend(linhasDoBloco(self.sessao, proximo))
+            self._enviar(linhas)
+            if fim:
+                return
+
+    def _enviar(self, linhas):
+        if self.pool is None and not self._reconectar():
+            self._transbordar(linhas)
+            return
+        espera = self.espera_inicial
+        for tentativa in range(self.tentativas):
+            try:
+                self._inserir(linhas)
+                with self._lock:
+                    self.linhas_inseridas += len(linhas)
+                    self.lotes_inseridos += 1
+                return
+            except self.erro_banco as e:
+                with self._lock:
+                    self.erros.append(repr(e))
+                    if tentativa + 1 < self.tentativas:
+                        self.novas_tentativas += 1
+                if tentativa + 1 < self.tentativas:
+                    time.sleep(espera)
+                    espera = min(espera * 2, self.espera_maxima)
+        self._transbordar(linhas)
+
+    def _inserir(self, linhas):
+        conexao = self.pool.get_connection()
+        try:
+            cursor = conexao.cursor()
+            try:
+                if self.metodo == "load_data":
+                    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as f:
+                        csv.writer(f, lineterminator="\n").writerows(linhas)
+                    try:
+                        cursor.execute(self._sql_load, (f.name,))
+                    finally:
+                        os.remove(f.name)
+                else:
+                    cursor.executemany(self._sql_insert, linhas)
+                conexao.commit()
+            except self.erro_banco:
+                conexao.rollback()
+                raise
+            finally:
+                cursor.close()
+        finally:
+            conexao.close()   # devolve ao pool
+
+    def _transbordar(self, linhas):
+        with self._lock_transbordo:
+            novo = not os.path.exists(self.caminho_transbordo)
+            with open(self.caminho_transbordo, "a", newline="") as f:
+                escritor = csv.writer(f, lineterminator="\n")
+                if novo:
+                    escritor.writerow(["sessao", "indice", "tempo"] + [f"Canal_{c}" for c in self.canais])
+                escritor.writerows(linhas)
+        with self._lock:
+            self.lotes_transbordados += 1
+            self.linhas_transbordadas += len(linhas)
+
+    def contadores(self):
+        with self._lock:
+            return {
+                "conectado": self.pool is not None,
+                "fila": self.fila.qsize(),
+                "linhas_inseridas": self.linhas_inseridas,
+                "lotes_inseridos": self.lotes_inseridos,
+                "novas_tentativas": self.novas_tentativas,
+                "lotes_transbordados": self.lotes_transbordados,
+                "linhas_transbordadas": self.linhas_transbordadas,
+                "erros": len(self.erros),
+            }
+
+    def fechar(self, timeout=30.0):
+        # Envia o que ainda está na fila; o que não couber no prazo vai para o transbordo.
+        # Com a fila cheia, até colocar o aviso de fim conta dentro do prazo.
+        prazo = time.monotonic() + timeout
+        avisos = 0
+        for _ in self._threads:
+            try:
+                self.fila.put(_FIM, timeout=max(0.0, prazo - time.monotonic()))
+            except queue.Full:
+                break
+            avisos += 1
+        for t in self._threads:
+            t.join(max(0.0, prazo - time.monotonic()))
+        while True:
+            try:
+                bloco = self.fila.get_nowait()
+            except queue.Empty:
+                break
+            if bloco is not _FIM:
+                self._transbordar(linhasDoBloco(self.sessao, bloco))
+        # Fila vazia: os avisos que não couberam fazem as threads pararem depois do lote atual
+        for _ in range(len(self._threads) - avisos):
+            try:
+                self.fila.put_nowait(_FIM)
+            except queue.Full:
+                break
+        if self.pool is not None and not any(t.is_alive() for t in self._threads):
+            self.pool.close()
+        return self.contadores()
+
+
+def reenviarTransbordo(conexao, tabela, caminho, linhas_por_lote=5000):
+    # Insere no banco as linhas de um arquivo de transbordo; devolve quantas foram lidas
+    mariadb = _mariadb()
+    with open(caminho, newline="") as f:
+        leitor = csv.reader(f)
+        colunas = next(leitor)
+        canais = [int(c.split("_")[1]) for c in colunas[3:]]
+        c = mariadb.connect(**conexao)
+        try:
+            criarTabela(c, tabela, canais)
+            cursor = c.cursor()
+            sql = (f"INSERT IGNORE INTO {tabela} ({', '.join(colunas)}) "
+                   f"VALUES ({', '.join(['?'] * len(colunas))})")
+            total = 0
+            lote = []
+            for linha in leitor:
+                lote.append((linha[0], int(linha[1]), linha[2], *map(float, linha[3:])))
+                if len(lote) >= linhas_por_lote:
+                    cursor.executemany(sql, lote)
+                    c.commit()
+                    total += len(lote)
+                    lote = []
+            if lote:
+                cursor.executemany(sql, lote)
+                c.commit()
+                total += len(lote)
+            cursor.close()
+        finally:
+            c.close()
+    return total
+
+
+def _teste(conexao, tabela, metodo):
+    # Envia uma sessão sintética ao banco local e confere a contagem de linhas
+    from processamento import Bloco, timestampsNs
+
+    sessao = time.strftime("teste_%Y-%m-%d_%H-%M-%S")
+    envio = EnvioBanco(conexao, tabela, [0, 1], sessao, metodo=metodo,
+                       caminho_transbordo=os.path.join(tempfile.gettempdir(), "transbordo_teste.csv"))
+    inicio_ns = time.time_ns()
+    blocos, amostras = 200, 100
+    for k in range(blocos):
+        ns = timestampsNs(inicio_ns, k * amostras, amostras, 1000.0)
+        envio.escrever_bloco(Bloco(k * amostras, ns.view("datetime64[ns]"), np.random.rand(amostras, 2)))
+    contadores = envio.fechar()
+
+    c = _mariadb().connect(**conexao)
+    cursor = c.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {tabela} WHERE sessao = ?", (sessao,))
+    no_banco = cursor.fetchone()[0]
+    cursor.execute(f"DELETE FROM {tabela} WHERE sessao = ?", (sessao,))
+    c.commit()
+    c.close()
+    print(contadores)
+    print("Linhas no banco: %d de %d (%d no transbordo)" % (
+        no_banco, blocos * amostras, contadores["linhas_transbordadas"]))
+    return no_banco + contadores["linhas_transbordadas"] == blocos * amostras
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Envio de capturas para o MariaDB")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--porta", type=int, default=3306)
+    parser.add_argument("--usuario", required=True)
+    parser.add_argument("--senha", default="")
+    parser.add_argument("--banco", required=True)
+    parser.add_argument("--tabela", default="amostras")
+    parser.add_argument("--metodo", default="executemany", choices=["executemany", "load_data"])
+    grupo = parser.add_mutually_exclusive_group(required=True)
+    grupo.add_argument("--reenviar", metavar="TRANSBORDO", help="reenvia um arquivo de transbordo")
+    grupo.add_argument("--teste", action="store_true", help="envia uma sessão sintética e confere")
+    args = parser.parse_args()
+
+    conexao = dict(host=args.host, port=args.porta, user=args.usuario,
+                   password=args.senha, database=args.banco)
+    if args.teste:
+        raise SystemExit(0 if _teste(conexao, args.tabela, args.metodo) else 1)
+    total = reenviarTransbordo(conexao, args.tabela, args.reenviar)
+    print(f"{total} linhas de '{args.reenviar}' enviadas para {args.tabela}")
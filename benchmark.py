@@ -0,0 +1,171 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Benchmark de vazão e latência do caminho aquisição -> disco.
+#
+# Roda o AdvPollingStreamingAI contra o dispositivo simulado numa varredura de
+# clockRate x channelCount x sectionLength x formato de gravação e grava um
+# JSON por linha com o resultado de cada ponto, para acompanhar regressões:
+#
+#   python benchmark.py --taxas 1000,10000,100000,250000 --canais 1,4,16 \
+#                       --secoes 100,1000 --formatos csv,binario --duracao 3 \
+#                       --saida benchmark.jsonl
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+os.environ["DAQ_BACKEND"] = "simulado"
+
+import PollingStreamingAI
+import simulador
+from formato_binario import lerCabecalho
+
+
+def rssAtual():
+    # Memória residente do processo em bytes (Linux); None onde /proc não existe
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _AmostradorMemoria(threading.Thread):
+
+    def __init__(self, intervalo=0.05):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.inicio = rssAtual()
+        self.pico = self.inicio
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            atual = rssAtual()
+            if atual is not None and atual > self.pico:
+                self.pico = atual
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+        return None if self.inicio is None else self.pico - self.inicio
+
+
+def executarPonto(clockRate, channelCount, sectionLength, formato, duracao, fonte="ruido",
+                  autoajuste=False):
+    diretorio = tempfile.mkdtemp(prefix="bench_daq_")
+    try:
+        PollingStreamingAI.clockRate = clockRate
+        PollingStreamingAI.channelCount = channelCount
+        PollingStreamingAI.sectionLength = sectionLength
+        PollingStreamingAI.USER_BUFFER_SIZE = channelCount * sectionLength
+        # Sem autoajuste cada ponto mede exatamente o sectionLength pedido
+        if not autoajuste:
+            PollingStreamingAI.latenciaBloco = None
+        elif PollingStreamingAI.latenciaBloco is None:
+            PollingStreamingAI.latenciaBloco = (0.01, 0.2)
+        PollingStreamingAI.formatoGravacao = formato
+        PollingStreamingAI.diretorioSaida = diretorio
+        PollingStreamingAI.limiarAtividade = float("-inf")  # grava todos os blocos
+        simulador.WaveformAiCtrl.fonte_padrao = simulador.FonteSintetica(fonte)
+
+        prazo = time.monotonic() + duracao
+        PollingStreamingAI.kbhit = lambda: time.monotonic() >= prazo
+
+        memoria = _AmostradorMemoria()
+        memoria.start()
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            resumo = PollingStreamingAI.AdvPollingStreamingAI()
+        decorrido = time.perf_counter() - inicio
+        crescimento_memoria = memoria.parar()
+
+        bytes_gravados = sum(os.path.getsize(a) for a in resumo.get("arquivos", []))
+        # Em "codigos" o tamanho só vale para os mesmos dados se a quantização não perdeu nada
+        quantizacao = [lerCabecalho(a) for a in resumo.get("arquivos", []) if a.endswith(".daqz")]
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    linhas = resumo.get("linhas_gravadas", 0)
+    valores = linhas * channelCount
+    latencias = np.asarray(resumo.get("latencias", []), dtype=np.float64) * 1000.0
+    pipeline = resumo.get("pipeline", {})
+    esperadas = duracao * clockRate / channelCount
+
+    def percentil(p):
+        return round(float(np.percentile(latencias, p)), 3) if len(latencias) else None
+
+    return {
+        "clockRate": clockRate,
+        "channelCount": channelCount,
+        "sectionLength": sectionLength,
+        "formato": formato,
+        "duracao_s": round(decorrido, 3),
+        "amostras_lidas": resumo.get("amostras_lidas", 0),
+        "amostras_esperadas": int(esperadas),
+        "valores_por_s": round(valores / decorrido, 1) if decorrido else None,
+        "latencia_ms_p50": percentil(50),
+        "latencia_ms_p95": percentil(95),
+        "latencia_ms_p99": percentil(99),
+        "latencia_ms_max": round(float(latencias.max()), 3) if len(latencias) else None,
+        "crescimento_memoria_bytes": crescimento_memoria,
+        "bytes_buffer": resumo.get("bytes_buffer"),
+        "bytes_gravados": bytes_gravados,
+        "bytes_por_valor": round(bytes_gravados / valores, 3) if valores else None,
+        "amostras_saturadas": (sum(sum(q["amostras_saturadas"] or []) for q in quantizacao)
+                               if quantizacao else None),
+        "erro_quantizacao_max_lsb": (max(max(q["erro_quantizacao_max_lsb"] or [0.0]) for q in quantizacao)
+                                     if quantizacao else None),
+        "overruns": resumo.get("overruns"),
+        "blocos_descartados": pipeline.get("blocos_descartados"),
+        "profundidade_maxima": pipeline.get("profundidade_maxima"),
+        "bloco": resumo.get("bloco"),
+        "sustentado": (not resumo.get("overruns") and not pipeline.get("blocos_descartados")
+                       and resumo.get("amostras_lidas", 0) >= 0.95 * esperadas),
+    }
+
+
+def _lista(texto, tipo=int):
+    return [tipo(x) for x in texto.split(",") if x]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark da aquisição com dispositivo simulado")
+    parser.add_argument("--taxas", default="1000,10000,50000,100000,250000")
+    parser.add_argument("--canais", default="1,2,4,8,16")
+    parser.add_argument("--secoes", default="100,1000")
+    parser.add_argument("--formatos", default="csv,binario")
+    parser.add_argument("--duracao", type=float, default=2.0, help="segundos por ponto")
+    parser.add_argument("--fonte", default="ruido", choices=["ruido", "seno", "pulsos"])
+    parser.add_argument("--saida", default="benchmark.jsonl")
+    parser.add_argument("--autoajuste", action="store_true",
+                        help="deixa o autoajuste.AjusteBloco escolher o tamanho do getData")
+    args = parser.parse_args()
+
+    ambiente = {"python": platform.python_version(), "numpy": np.__version__,
+                "plataforma": platform.platform(), "data": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    with open(args.saida, "a") as saida:
+        for formato in _lista(args.formatos, str):
+            for secao in _lista(args.secoes):
+                for canais in _lista(args.canais):
+                    for taxa in _lista(args.taxas):
+                        resultado = executarPonto(taxa, canais, secao, formato, args.duracao, args.fonte,
+                                                  args.autoajuste)
+                        resultado["ambiente"] = ambiente
+                        saida.write(json.dumps(resultado) + "\n")
+                        saida.flush()
+                        print("%-8s sec=%-5d ch=%-2d taxa=%-7d %12s val/s  p95=%8s ms  %6s B/val  %s" % (
+                            formato, secao, canais, taxa, resultado["valores_por_s"],
+                            resultado["latencia_ms_p95"], resultado["bytes_por_valor"],
+                            "ok" if resultado["sustentado"] else "NAO SUSTENTADO"))
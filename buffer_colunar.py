@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import threading
+
+import numpy as np
+
+from processamento import indicesParaNs
+
+
+# Um pedaço pré-alocado do buffer: índices int64 + matriz (linhas, canais)
+class _Chunk:
+    __slots__ = ("indices", "valores", "preenchido")
+
+    def __init__(self, tamanho, channelCount, dtype):
+        self.indices = np.empty(tamanho, dtype=np.int64)
+        self.valores = np.empty((tamanho, channelCount), dtype=dtype)
+        self.preenchido = 0
+
+
+# Armazenamento colunar em memória que substitui a lista de tuplas
+# dados_coletados. Guarda o índice da amostra (int64) e os valores dos canais
+# (float32 por padrão: 12 bytes por amostra em 2 canais, contra >100 bytes
+# por tupla). Cresce em chunks pré-alocados, sem copiar o que já foi gravado.
+#
+# Com duracao_maxima (segundos) o buffer funciona como anel: chunks inteiros
+# mais antigos são liberados quando a duração guardada passa do limite.
+class BufferColunar:
+
+    def __init__(self, channelCount, taxa_por_canal=None, inicio_ns=0,
+                 dtype=np.float32, tamanho_chunk=65536, duracao_maxima=None):
+        self.channelCount = channelCount
+        self.taxa_por_canal = taxa_por_canal
+        self.inicio_ns = inicio_ns
+        self.dtype = np.dtype(dtype)
+        self.tamanho_chunk = tamanho_chunk
+
+        self.capacidade = None
+        if duracao_maxima is not None:
+            if taxa_por_canal is None:
+                raise ValueError("duracao_maxima exige taxa_por_canal")
+            self.capacidade = int(duracao_maxima * taxa_por_canal)
+
+        self._chunks = []
+        self._total = 0
+        self.amostras_descartadas = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._total
+
+    @property
+    def nbytes(self):
+        return sum(c.indices.nbytes + c.valores.nbytes for c in self._chunks)
+
+    def acrescentar(self, indices, valores):
+        # indices: vetor int64 crescente; valores: matriz (len(indices), channelCount)
+        n = len(indices)
+        with self._lock:
+            pos = 0
+            while pos < n:
+                if not self._chunks or self._chunks[-1].preenchido == self.tamanho_chunk:
+                    self._chunks.append(_Chunk(self.tamanho_chunk, self.channelCount, self.dtype))
+                chunk = self._chunks[-1]
+                cabe = min(n - pos, self.tamanho_chunk - chunk.preenchido)
+                fim = chunk.preenchido + cabe
+                chunk.indices[chunk.preenchido:fim] = indices[pos:pos + cabe]
+                chunk.valores[chunk.preenchido:fim] = valores[pos:pos + cabe]
+                chunk.preenchido = fim
+                pos += cabe
+            self._total += n
+
+            # Modo anel: libera chunks antigos inteiros (nunca o que está sendo preenchido)
+            if self.capacidade is not None:
+                while (len(self._chunks) > 1
+                       and self._total - self._chunks[0].preenchido >= self.capacidade):
+                    descartado = self._chunks.pop(0)
+                    self._total -= descartado.preenchido
+                    self.amostras_descartadas += descartado.preenchido
+
+    def acrescentar_bloco(self, bloco):
+        # bloco: processamento.Bloco
+        self.acrescentar(bloco.indices, bloco.valores)
+
+    def fatias(self, indice_inicio=None, indice_fim=None):
+        # Lista de (indices, valores) como views dos chunks (sem cópia) cobrindo
+        # as amostras com indice_inicio <= índice < indice_fim
+        with self._lock:
+            chunks = [(c.indices[:c.preenchido], c.valores[:c.preenchido]) for c in self._chunks]
+        resultado = []
+        for indices, valores in chunks:
+            if len(indices) == 0:
+                continue
+            if indice_fim is not None and indices[0] >= indice_fim:
+                break
+            if indice_inicio is not None and indices[-1] < indice_inicio:
+                continue
+            a = 0 if indice_inicio is None else np.searchsorted(indices, indice_inicio, "left")
+            b = len(indices) if indice_fim is None else np.searchsorted(indices, indice_fim, "left")
+            if b > a:
+                resultado.append((indices[a:b], valores[a:b]))
+        return resultado
+
+    def ultimos(self, quantidade):
+        # Views das últimas `quantidade` amostras guardadas
+        with self._lock:
+            chunks = [(c.indices[:c.preenchido], c.valores[:c.preenchido]) for c in self._chunks]
+        resultado = []
+        faltam = quantidade
+        for indices, valores in reversed(chunks):
+            if faltam <= 0:
+                break
+            pegar = min(faltam, len(indices))
+            resultado.append((indices[len(indices) - pegar:], valores[len(valores) - pegar:]))
+            faltam -= pegar
+        resultado.reverse()
+        return resultado
+
+    def copiar(self, indice_inicio=None, indice_fim=None):
+        # Mesmo intervalo de fatias(), mas concatenado em arrays contíguos (com cópia)
+        partes = self.fatias(indice_inicio, indice_fim)
+        if not partes:
+            return (np.empty(0, dtype=np.int64),
+                    np.empty((0, self.channelCount), dtype=self.dtype))
+        return (np.concatenate([p[0] for p in partes]),
+                np.concatenate([p[1] for p in partes]))
+
+    def timestamps(self, indices):
+        # Índices de amostra -> datetime64[ns], pela mesma regra usada no processamento
+        if self.taxa_por_canal is None:
+            raise ValueError("timestamps exige taxa_por_canal")
+        return indicesParaNs(self.inicio_ns, indices, self.taxa_por_canal).view("datetime64[ns]")
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Compactação do arquivo de capturas texto antigas.
+#
+# O saveFile original regravava o buffer acumulado inteiro num arquivo novo a
+# cada bloco, então cada dados_*.txt/.csv é um prefixo (ou, com janela
+# deslizante, um trecho sobreposto) do seguinte. Aqui os arquivos são
+# levantados em paralelo (cabeçalho, primeiro/último timestamp e linhas, pelo
+# índice lateral do leitor), agrupados em cadeias de snapshots (mesmas
+# colunas e intervalos de tempo que se sobrepõem) e cada cadeia vira uma
+# única sessão .daq sem amostras repetidas:
+#
+#   <destino>/
+#       manifesto.json              cadeias: arquivos de origem, intervalo, amostras
+#       dados_AAAA-MM-DD_HH-MM-SS.daq   quadros: índice, tempo (ns), valores
+#
+# As cadeias são consolidadas em paralelo, cada uma lida em pedaços, então a
+# memória não depende do tamanho do arquivo. Os originais não são apagados.
+#
+#   python compactar.py . compactado --processos 4
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+
+import numpy as np
+
+from formato_binario import TAMANHO_CABECALHO, dtypeParaJson, montarCabecalho
+from leitor import ArquivoTexto
+
+
+def listarTextos(origem):
+    # Capturas texto de uma pasta (ou padrão glob); binários e índices ficam de fora
+    if os.path.isdir(origem):
+        origem = os.path.join(origem, "dados_*")
+    return sorted(c for c in glob.glob(origem)
+                  if not c.endswith((".daq", ".daqz", ".idx", ".tmp")) and os.path.isfile(c))
+
+
+def levantarArquivo(caminho):
+    # Roda num processo do pool: só o índice lateral (montado uma vez, em pedaços)
+    arquivo = ArquivoTexto(caminho)
+    return {
+        "caminho": caminho,
+        "canais": arquivo.canais,
+        "primeiro_ns": arquivo.primeiro_ns,
+        "ultimo_ns": arquivo.ultimo_ns,
+        "linhas": arquivo.linhas,
+        "tamanho": arquivo.tamanho,
+    }
+
+
+def agruparCadeias(levantamentos):
+    # Mesmas colunas e primeiro timestamp <= último da cadeia: é snapshot da mesma coleta.
+    # Retorna (cadeias, vazios); cada cadeia é uma lista em ordem de tempo.
+    vazios = [l["caminho"] for l in levantamentos if l["primeiro_ns"] is None]
+    validos = sorted((l for l in levantamentos if l["primeiro_ns"] is not None),
+                     key=lambda l: (tuple(l["canais"]), l["primeiro_ns"], l["ultimo_ns"], l["linhas"]))
+    cadeias = []
+    for l in validos:
+        atual = cadeias[-1] if cadeias else None
+        if (atual is not None and atual[0]["canais"] == l["canais"]
+                and l["primeiro_ns"] <= max(a["ultimo_ns"] for a in atual)):
+            atual.append(l)
+        else:
+            cadeias.append([l])
+    cadeias.sort(key=lambda c: c[0]["primeiro_ns"])
+    return cadeias, vazios
+
+
+def _nomeSessao(destino, primeiro_ns):
+    # Os timestamps do texto são o horário local sem fuso, guardado como se fosse UTC
+    base = "dados_" + str(np.datetime64(primeiro_ns, "ns").astype("datetime64[s]")).replace("T", "_").replace(":", "-")
+    caminho = os.path.join(destino, base + ".daq")
+    sufixo = 1
+    while os.path.exists(caminho):
+        caminho = os.path.join(destino, f"{base}_{sufixo}.daq")
+        sufixo += 1
+    return caminho
+
+
+def consolidarCadeia(cadeia, caminho, dtype_valores="<f4", linhas_por_chunk=100000):
+    # Roda num processo do pool. Os arquivos entram em ordem; de cada um só
+    # vai para a sessão o que passa do último instante já gravado. Os
+    # timestamps do texto têm resolução de 1 ms e podem repetir (mais de uma
+    # amostra por ms), então no instante da emenda são descartadas só as
+    # primeiras linhas, tantas quantas já foram gravadas com aquele tempo.
+    canais = cadeia[0]["canais"]
+    dtype = np.dtype([("indice", "<i8"), ("tempo_ns", "<i8"), ("valores", dtype_valores, (len(canais),))])
+    metadados = {
+        "tipo": "sessao",
+        "origem": "compactar",
+        "startChannel": canais[0] if canais else 0,
+        "channelCount": len(canais),
+        "canais": canais,
+        "campos": dtypeParaJson(dtype),
+        "inicio_ns": cadeia[0]["primeiro_ns"],
+        "arquivos_origem": len(cadeia),
+    }
+    gravadas = 0
+    ultimo_ns, repetidas = None, 0      # último tempo gravado e quantas linhas o têm
+    with open(caminho, "wb") as saida:
+        saida.write(montarCabecalho(metadados))
+        for item in cadeia:
+            corte, ja_gravadas = ultimo_ns, repetidas
+            vistas = 0
+            for t, valores in ArquivoTexto(item["caminho"]).iterar(linhas_por_chunk=linhas_por_chunk):
+                ns = t.astype(np.int64)
+                if corte is not None:
+                    manter = ns > corte
+                    iguais = np.flatnonzero(ns == corte)
+                    manter[iguais[max(0, ja_gravadas - vistas):]] = True
+                    vistas += len(iguais)
+                    ns, valores = ns[manter], valores[manter]
+                if len(ns) == 0:
+                    continue
+                quadros = np.empty(len(ns), dtype=dtype)
+                quadros["indice"] = np.arange(gravadas, gravadas + len(ns))
+                quadros["tempo_ns"] = ns
+                quadros["valores"] = valores
+                saida.write(quadros.tobytes())
+                gravadas += len(ns)
+                iguais_no_fim = int(np.count_nonzero(ns == ns[-1]))
+                if ns[-1] == ultimo_ns and iguais_no_fim == len(ns):
+                    repetidas += iguais_no_fim     # o pedaço inteiro continua o mesmo ms
+                else:
+                    repetidas = iguais_no_fim
+                ultimo_ns = int(ns[-1])
+
+        # Cabeçalho final, com o que só se sabe no fim (mesmo tamanho fixo)
+        metadados["amostras"] = gravadas
+        metadados["ultimo_ns"] = ultimo_ns
+        if gravadas > 1 and ultimo_ns > metadados["inicio_ns"]:
+            # Taxa média medida pelos timestamps (os textos não guardavam o clockRate)
+            taxa = (gravadas - 1) * 1e9 / (ultimo_ns - metadados["inicio_ns"])
+            metadados["clockRate"] = taxa * len(canais)
+        saida.seek(0)
+        saida.write(montarCabecalho(metadados))
+
+    return {
+        "sessao": caminho,
+        "arquivos": [item["caminho"] for item in cadeia],
+        "canais": canais,
+        "primeiro_ns": cadeia[0]["primeiro_ns"],
+        "ultimo_ns": ultimo_ns,
+        "amostras": gravadas,
+        "linhas_origem": sum(item["linhas"] for item in cadeia),
+        "bytes_origem": sum(item["tamanho"] for item in cadeia),
+        "bytes_sessao": TAMANHO_CABECALHO + gravadas * dtype.itemsize,
+    }
+
+
+def compactar(origem, destino, processos=None, dtype_valores="<f4", linhas_por_chunk=100000):
+    caminhos = listarTextos(origem)
+    os.makedirs(destino, exist_ok=True)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as pool:
+        levantamentos = list(pool.map(levantarArquivo, caminhos, chunksize=8))
+        cadeias, vazios = agruparCadeias(levantamentos)
+        # Nomes escolhidos aqui, antes de distribuir, para não colidirem entre processos
+        caminhos_sessao = []
+        for cadeia in cadeias:
+            caminho = _nomeSessao(destino, cadeia[0]["primeiro_ns"])
+            open(caminho, "wb").close()
+            caminhos_sessao.append(caminho)
+        futuros = [pool.submit(consolidarCadeia, cadeia, caminho, dtype_valores, linhas_por_chunk)
+                   for cadeia, caminho in zip(cadeias, caminhos_sessao)]
+        sessoes = [f.result() for f in futuros]
+
+    manifesto = {"origem": origem, "sessoes": sessoes, "vazios": vazios}
+    with open(os.path.join(destino, "manifesto.json"), "w") as f:
+        json.dump(manifesto, f, indent=2)
+    return manifesto
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Junta os snapshots dados_* sobrepostos em sessões .daq sem repetição")
+    parser.add_argument("origem", help="pasta ou padrão glob das capturas texto")
+    parser.add_argument("destino", help="pasta das sessões compactadas")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--dtype", default="<f4", help="tipo dos valores gravados (<f4 ou <f8)")
+    parser.add_argument("--linhas-por-chunk", type=int, default=100000)
+    args = parser.parse_args()
+
+    manifesto = compactar(args.origem, args.destino, args.processos, args.dtype, args.linhas_por_chunk)
+    sessoes = manifesto["sessoes"]
+    origem = sum(s["bytes_origem"] for s in sessoes)
+    compactado = sum(s["bytes_sessao"] for s in sessoes)
+    for s in sessoes:
+        print("%s: %d arquivos, %d linhas -> %d amostras" % (
+            os.path.basename(s["sessao"]), len(s["arquivos"]), s["linhas_origem"], s["amostras"]))
+    print("%d arquivos em %d sessões (%d vazios); %.1f MB -> %.1f MB" % (
+        sum(len(s["arquivos"]) for s in sessoes), len(sessoes), len(manifesto["vazios"]),
+        origem / 1e6, compactado / 1e6))
@@ -0,0 +1,72 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Camada de dispositivo: escolhe entre a placa real (Automation.BDaq) e o
+# simulador em software, expondo os mesmos nomes para o script de aquisição.
+#
+#   DAQ_BACKEND=bdaq      (padrão) driver Advantech DAQNavi
+#   DAQ_BACKEND=simulado  simulador.WaveformAiCtrl
+#       DAQ_SIMULADO_FONTE     "pulsos", "seno", "ruido" ou arquivo/padrão glob de capturas (ex.: "dados_*.csv")
+#       DAQ_SIMULADO_DURACAO   segundos até encerrar sozinho (kbhit)
+
+import os
+import sys
+
+BACKEND = os.environ.get("DAQ_BACKEND", "bdaq")
+
+if BACKEND == "simulado":
+    import simulador
+    from simulador import WaveformAiCtrl, ErrorCode, BioFailed, AdxEnumToString, kbhit
+
+    _fonte = os.environ.get("DAQ_SIMULADO_FONTE", "pulsos")
+    if _fonte in ("pulsos", "seno", "ruido"):
+        WaveformAiCtrl.fonte_padrao = simulador.FonteSintetica(_fonte)
+    else:
+        WaveformAiCtrl.fonte_padrao = simulador.FonteArquivo(_fonte)
+
+    def instalarAvisoBurnout(wfAiCtrl):
+        pass
+
+    def instalarEventosDados(wfAiCtrl, ao_dados, ao_overrun, ao_cache_overflow, ao_parado):
+        # Cada callback recebe o Count do evento (valores = amostras x canais)
+        wfAiCtrl.addDataReadyHandler(lambda sender, args, param: ao_dados(args.Count))
+        wfAiCtrl.addOverrunHandler(lambda sender, args, param: ao_overrun(args.Count))
+        wfAiCtrl.addCacheOverflowHandler(lambda sender, args, param: ao_cache_overflow(args.Count))
+        wfAiCtrl.addStoppedHandler(lambda sender, args, param: ao_parado(args.Count))
+
+else:
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                                 os.path.pardir)))
+    from CommonUtils import kbhit
+
+    from Automation.BDaq import *
+    from Automation.BDaq.WaveformAiCtrl import WaveformAiCtrl
+    from Automation.BDaq.BDaqApi import AdxEnumToString, BioFailed
+
+    userParam = DaqEventParam()
+
+    @DaqEventCallback(None, c_void_p, POINTER(BfdAiEventArgs), c_void_p)
+    def OnBurnoutEvent(sender, args, userParam):
+        status  = cast(args, POINTER(BfdAiEventArgs))[0]
+        channel = status.Offset
+        print("AI Channel%d is burntout!" % (channel))
+
+    def instalarAvisoBurnout(wfAiCtrl):
+        wfAiCtrl.addBurnOutHandler(OnBurnoutEvent, userParam)
+
+    # Os ponteiros de função do ctypes precisam continuar vivos enquanto o driver puder chamá-los
+    _callbacks_eventos = []
+
+    def instalarEventosDados(wfAiCtrl, ao_dados, ao_overrun, ao_cache_overflow, ao_parado):
+        # Cada callback recebe o Count do evento (valores = amostras x canais)
+        def embrulhar(funcao):
+            @DaqEventCallback(None, c_void_p, POINTER(BfdAiEventArgs), c_void_p)
+            def callback(sender, args, userParam):
+                funcao(cast(args, POINTER(BfdAiEventArgs))[0].Count)
+            _callbacks_eventos.append(callback)
+            return callback
+
+        wfAiCtrl.addDataReadyHandler(embrulhar(ao_dados), userParam)
+        wfAiCtrl.addOverrunHandler(embrulhar(ao_overrun), userParam)
+        wfAiCtrl.addCacheOverflowHandler(embrulhar(ao_cache_overflow), userParam)
+        wfAiCtrl.addStoppedHandler(embrulhar(ao_parado), userParam)
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Converte capturas .daq para o CSV legado "Timestamp, Canal_N" sob demanda.
+#
+#   python exportar_csv.py dados_2025-08-28_13-41-09.daq [saida.csv]
+#   python exportar_csv.py dados_2025-08-28_13-41-09.daqz [saida.csv]
+
+import argparse
+import os
+
+from formato_binario import abrirCaptura, timestampsCaptura
+from formato_comprimido import CapturaComprimida
+from gravador import formatarLinhas
+
+
+def _timestamps(metadados, trecho):
+    # Sessões do compactar.py e do multidispositivo.py gravam o tempo de cada
+    # quadro (como em leitor.ArquivoDaq); só sem ele o tempo é refeito pelo
+    # clockRate/inicio_ns do cabeçalho
+    if "tempo_ns" in (trecho.dtype.names or ()):
+        return trecho["tempo_ns"].view("datetime64[ns]")
+    return timestampsCaptura(metadados, trecho["indice"] if trecho.dtype.names else trecho)
+
+
+def exportarCsv(caminho_daq, caminho_csv=None, linhas_por_chunk=100000):
+    if caminho_csv is None:
+        caminho_csv = os.path.splitext(caminho_daq)[0] + ".csv"
+
+    if caminho_daq.endswith(".daqz"):
+        # Códigos comprimidos: um registro descomprimido e escalado por vez
+        captura = CapturaComprimida(caminho_daq)
+        with open(caminho_csv, "w") as f:
+            f.write("Timestamp, " + ", ".join([f"Canal_{i}" for i in captura.metadados["canais"]]) + "\n")
+            for indices, valores in captura.iterar():
+                f.write(formatarLinhas(_timestamps(captura.metadados, indices), valores))
+        return caminho_csv
+
+    metadados, quadros = abrirCaptura(caminho_daq)
+    canais = metadados.get("canais") or list(range(metadados["startChannel"],
+                                                   metadados["startChannel"] + metadados["channelCount"]))
+
+    with open(caminho_csv, "w") as f:
+        f.write("Timestamp, " + ", ".join([f"Canal_{i}" for i in canais]) + "\n")
+        # Converte em pedaços: o memmap só carrega do disco o trecho em uso
+        for inicio in range(0, len(quadros), linhas_por_chunk):
+            trecho = quadros[inicio:inicio + linhas_por_chunk]
+            f.write(formatarLinhas(_timestamps(metadados, trecho), trecho["valores"]))
+
+    return caminho_csv
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exporta uma captura .daq ou .daqz para CSV")
+    parser.add_argument("captura")
+    parser.add_argument("saida", nargs="?")
+    parser.add_argument("--linhas-por-chunk", type=int, default=100000)
+    args = parser.parse_args()
+
+    nome_do_arquivo = exportarCsv(args.captura, args.saida, args.linhas_por_chunk)
+    print(f"Arquivo '{nome_do_arquivo}' salvo com sucesso!")
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import json
+import struct
+
+import numpy as np
+
+from gravador import GravadorIncremental
+from processamento import indicesParaNs
+
+
+# Formato nativo de captura (.daq)
+#
+#   [0:8]     assinatura b"MOURADAQ"
+#   [8:12]    versão (uint32 little-endian)
+#   [12:16]   tamanho do JSON de metadados (uint32 little-endian)
+#   [16:...]  JSON de metadados (utf-8), completado com zeros até TAMANHO_CABECALHO
+#   [TAMANHO_CABECALHO:...] quadros brutos: int64 índice da amostra + channelCount valores
+#
+# Os quadros têm tamanho fixo, então o arquivo é lido direto com numpy.memmap,
+# sem parsing. O horário de cada amostra é inicio_ns + indice / taxa_por_canal,
+# com resolução de nanossegundos (o CSV perdia tudo abaixo de 1 ms).
+
+ASSINATURA = b"MOURADAQ"
+VERSAO = 1
+TAMANHO_CABECALHO = 4096
+
+
+def dtypeQuadro(channelCount, dtype_valores="<f4"):
+    return np.dtype([("indice", "<i8"), ("valores", dtype_valores, (channelCount,))])
+
+
+def dtypeParaJson(dtype):
+    # Descrição de um dtype estruturado que cabe no JSON do cabeçalho
+    return [[nome, dtype.fields[nome][0].base.str, list(dtype.fields[nome][0].shape)]
+            for nome in dtype.names]
+
+
+def dtypeDosMetadados(metadados):
+    # Arquivos com quadros próprios (ex.: resumos) trazem "campos" no cabeçalho;
+    # capturas comuns usam índice + valores
+    if "campos" in metadados:
+        return np.dtype([(nome, tipo, tuple(forma)) for nome, tipo, forma in metadados["campos"]])
+    return dtypeQuadro(metadados["channelCount"], metadados["dtype"])
+
+
+def montarCabecalho(metadados):
+    corpo = json.dumps(metadados, sort_keys=True).encode("utf-8")
+    if 16 + len(corpo) > TAMANHO_CABECALHO:
+        raise ValueError("metadados grandes demais para o cabeçalho")
+    cabecalho = ASSINATURA + struct.pack("<II", VERSAO, len(corpo)) + corpo
+    return cabecalho + b"\0" * (TAMANHO_CABECALHO - len(cabecalho))
+
+
+def lerCabecalho(caminho):
+    with open(caminho, "rb") as f:
+        inicio = f.read(16)
+        if len(inicio) < 16 or inicio[:8] != ASSINATURA:
+            raise ValueError(f"'{caminho}' não é uma captura .daq")
+        versao, tamanho = struct.unpack("<II", inicio[8:16])
+        if versao != VERSAO:
+            raise ValueError(f"versão de captura não suportada: {versao}")
+        return json.loads(f.read(tamanho).decode("utf-8"))
+
+
+def abrirCaptura(caminho):
+    # Retorna (metadados, quadros) onde quadros é um memmap estruturado somente
+    # leitura com os campos "indice" e "valores". Um quadro incompleto no fim
+    # (gravação interrompida) é ignorado.
+    metadados = lerCabecalho(caminho)
+    dtype = dtypeDosMetadados(metadados)
+    with open(caminho, "rb") as f:
+        f.seek(0, 2)
+        tamanho = f.tell()
+    quantidade = (tamanho - TAMANHO_CABECALHO) // dtype.itemsize
+    if quantidade <= 0:
+        return metadados, np.empty(0, dtype=dtype)
+    quadros = np.memmap(caminho, dtype=dtype, mode="r",
+                        offset=TAMANHO_CABECALHO, shape=(quantidade,))
+    return metadados, quadros
+
+
+def timestampsCaptura(metadados, indices):
+    # Índices de amostra -> datetime64[ns] a partir dos metadados do cabeçalho
+    taxa_por_canal = metadados["clockRate"] / metadados["channelCount"]
+    return indicesParaNs(metadados["inicio_ns"], indices, taxa_por_canal).view("datetime64[ns]")
+
+
+# Gravador incremental no formato .daq: mesma política de flush/rotação do
+# CSV, cada rotação gera um arquivo completo com seu próprio cabeçalho.
+class GravadorBinario(GravadorIncremental):
+
+    extensao = ".daq"
+    modo = "wb"
+
+    def __init__(self, canais, metadados, dtype_valores="<f4", **kwargs):
+        # metadados: deviceDescription, clockRate, inicio_ns, valueRange, ...
+        super().__init__(canais, **kwargs)
+        self.dtype = dtypeQuadro(len(self.canais), dtype_valores)
+        self.metadados = dict(metadados)
+        self.metadados.update({
+            "startChannel": self.canais[0] if self.canais else 0,
+            "channelCount": len(self.canais),
+            "canais": self.canais,
+            "dtype": dtype_valores,
+        })
+
+    def _cabecalho(self):
+        return montarCabecalho(self.metadados)
+
+    def _serializar(self, bloco):
+        quadros = np.empty(len(bloco), dtype=self.dtype)
+        quadros["indice"] = bloco.indices
+        quadros["valores"] = bloco.valores
+        return quadros.tobytes()
@@ -0,0 +1,286 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Captura em códigos do ADC, comprimida (.daqz)
+#
+# O USB-4716 converte com 16 bits: cada amostra cabe num uint16 e o valor
+# físico é deslocamento + ganho * código, com ganho e deslocamento tirados da
+# faixa (valueRange) do canal. Gravar os códigos em vez de floats com 6
+# casas em texto já reduz de 4 a 11 vezes o tamanho; a compressão em blocos
+# (delta por canal + separação dos bytes alto/baixo + zlib ou lzma) leva o
+# ruído de fundo a bem menos de 2 bytes por amostra.
+#
+# A compressão dos códigos é exata, mas a volta de float para código só é
+# exata se os valores vieram do ADC com essa mesma faixa. Fora disso cada
+# valor é arredondado (até meio LSB) e o que passa da faixa é saturado; as
+# duas coisas são medidas em cada bloco e somadas no cabeçalho do arquivo.
+#
+#   [0:TAMANHO_CABECALHO]  mesmo cabeçalho do formato_binario, com "tipo": "codigos",
+#                          "bits", "ganho", "deslocamento", "compressao" e, ao
+#                          fechar, "amostras_saturadas" e "erro_quantizacao_max_lsb"
+#                          (um por canal; null se a gravação foi interrompida)
+#   registros, um por bloco:
+#       int64 índice da primeira amostra, uint32 amostras, uint32 bytes comprimidos
+#       payload comprimido
+#
+# Cada registro é independente: a leitura descomprime um bloco por vez e só
+# converte para valores físicos (vetorizado) o que for pedido.
+
+import lzma
+import re
+import struct
+import zlib
+
+import numpy as np
+
+from formato_binario import TAMANHO_CABECALHO, lerCabecalho, montarCabecalho
+from gravador import GravadorIncremental
+
+REGISTRO = struct.Struct("<qII")
+
+_FAIXA = re.compile(r"^(m?)([VA])_(Neg)?([0-9pt]+)To([0-9pt]+)$")
+
+
+def faixaDoValueRange(valueRange):
+    # "V_Neg10To10", "ValueRange.V_0To5", "mV_Neg625To625", "mA_4To20" -> (mínimo, máximo)
+    nome = str(valueRange).split(".")[-1]
+    m = _FAIXA.match(nome)
+    if m is None:
+        raise ValueError(f"faixa de entrada desconhecida: {valueRange}")
+    escala = 1e-3 if m.group(1) else 1.0
+    minimo = float(m.group(4).replace("pt", ".")) * escala
+    maximo = float(m.group(5).replace("pt", ".")) * escala
+    return (-minimo if m.group(3) else minimo), maximo
+
+
+def coeficientesEscala(valueRange, bits=16):
+    # valor = deslocamento + ganho * código, código em [0, 2**bits - 1]
+    minimo, maximo = faixaDoValueRange(valueRange)
+    return (maximo - minimo) / 2 ** bits, minimo
+
+
+def quantizar(valores, ganho, deslocamento, bits=16):
+    # Valores físicos -> (códigos do ADC, saturadas, erro máximo), os dois
+    # últimos por canal: quantos valores ficaram fora da faixa e foram
+    # saturados, e o maior arredondamento (em LSB) entre os que couberam.
+    # Valores que vieram do próprio ADC dão 0 saturadas e erro ~0.
+    exatos = (np.asarray(valores, dtype=np.float64) - deslocamento) / ganho
+    codigos = np.rint(exatos)
+    fora = (codigos < 0) | (codigos > 2 ** bits - 1)
+    saturadas = np.count_nonzero(fora, axis=0)
+    erro = np.where(fora, 0.0, np.abs(exatos - codigos)).max(axis=0, initial=0.0)
+    return np.clip(codigos, 0, 2 ** bits - 1).astype(np.uint16), saturadas, erro
+
+
+def escalar(codigos, ganho, deslocamento, dtype=np.float32):
+    # Códigos (amostras, canais) -> valores físicos, vetorizado por canal
+    ganho = np.asarray(ganho, dtype=np.float64)
+    deslocamento = np.asarray(deslocamento, dtype=np.float64)
+    return (deslocamento + ganho * codigos).astype(dtype)
+
+
+def _compressor(metodo, nivel):
+    if metodo == "zlib":
+        return lambda dados: zlib.compress(dados, nivel)
+    if metodo == "lzma":
+        return lambda dados: lzma.compress(dados, preset=nivel)
+    raise ValueError(f"compressão desconhecida: {metodo}")
+
+
+def _descompressor(metodo):
+    return zlib.decompress if metodo == "zlib" else lzma.decompress
+
+
+def comprimirBloco(codigos, comprimir):
+    # codigos: (amostras, canais) uint16 contíguos no tempo.
+    # Por canal, a primeira amostra e depois as diferenças (aritmética módulo
+    # 2**16, então volta exatamente); os bytes altos, quase sempre 0x00/0xFF,
+    # vão juntos e os baixos depois, o que o zlib/lzma comprime muito melhor.
+    por_canal = np.ascontiguousarray(codigos.T, dtype=np.uint16)
+    delta = np.diff(por_canal, axis=1, prepend=np.uint16(0))
+    planos = delta.astype("<u2").view(np.uint8).reshape(delta.shape + (2,))
+    return comprimir(np.ascontiguousarray(planos.transpose(2, 0, 1)).tobytes())
+
+
+def descomprimirBloco(payload, amostras, canais, descomprimir):
+    planos = np.frombuffer(descomprimir(payload), dtype=np.uint8).reshape(2, canais, amostras)
+    delta = np.ascontiguousarray(planos.transpose(1, 2, 0)).view("<u2")[..., 0]
+    return np.cumsum(delta, axis=1, dtype=np.uint16).T
+
+
+# Gravador incremental .daqz: mesma política de flush/rotação dos outros formatos.
+# Os blocos do pipeline (100 amostras a 1 kHz) são pequenos demais para
+# comprimir bem, então os códigos se acumulam até amostras_por_bloco, até uma
+# descontinuidade de índice ou até o próximo flush.
+class GravadorComprimido(GravadorIncremental):
+
+    extensao = ".daqz"
+    modo = "wb"
+    # Os códigos ficam pendentes até fechar um registro comprimido: a posição
+    # devolvida por escrever_bloco não aponta para onde o bloco vai parar
+    posicao_em_bytes = False
+
+    def __init__(self, canais, metadados, compressao="zlib", nivel=6, amostras_por_bloco=8192,
+                 bits=16, **kwargs):
+        # metadados: deviceDescription, clockRate, inicio_ns, valueRange (um por canal), ...
+        super().__init__(canais, **kwargs)
+        self.amostras_por_bloco = amostras_por_bloco
+        self.bits = bits
+        self._comprimir = _compressor(compressao, nivel)
+        coeficientes = [coeficientesEscala(faixa, bits) for faixa in metadados["valueRange"]]
+        self.ganho = np.array([c[0] for c in coeficientes])
+        self.deslocamento = np.array([c[1] for c in coeficientes])
+        self.metadados = dict(metadados)
+        self.metadados.update({
+            "tipo": "codigos",
+            "startChannel": self.canais[0] if self.canais else 0,
+            "channelCount": len(self.canais),
+            "canais": self.canais,
+            "bits": bits,
+            "ganho": self.ganho.tolist(),
+            "deslocamento": self.deslocamento.tolist(),
+            "compressao": compressao,
+        })
+        self._pendentes = []
+        self._indice_pendente = None
+        self._proximo_indice = None
+        self._amostras_pendentes = 0
+        # Perda na quantização do arquivo atual (por canal)
+        self.amostras_saturadas = np.zeros(len(self.canais), dtype=np.int64)
+        self.erro_quantizacao_max = np.zeros(len(self.canais))
+
+    def _cabecalho(self, final=False):
+        metadados = dict(self.metadados)
+        metadados["amostras_saturadas"] = self.amostras_saturadas.tolist() if final else None
+        metadados["erro_quantizacao_max_lsb"] = self.erro_quantizacao_max.tolist() if final else None
+        return montarCabecalho(metadados)
+
+    def _serializar(self, bloco):
+        codigos, saturadas, erro = quantizar(bloco.valores, self.ganho, self.deslocamento, self.bits)
+        self.amostras_saturadas += saturadas
+        np.maximum(self.erro_quantizacao_max, erro, out=self.erro_quantizacao_max)
+        indices = bloco.indices
+        # Janelas de evento podem pular amostras: cada trecho contínuo vira seu próprio registro
+        cortes = np.flatnonzero(np.diff(indices) != 1) + 1
+        saida = []
+        for trecho, idx in zip(np.split(codigos, cortes), np.split(indices, cortes)):
+            if self._proximo_indice is not None and idx[0] != self._proximo_indice:
+                saida.append(self._registro())
+            if self._indice_pendente is None:
+                self._indice_pendente = int(idx[0])
+            self._pendentes.append(trecho)
+            self._amostras_pendentes += len(trecho)
+            self._proximo_indice = int(idx[-1]) + 1
+            if self._amostras_pendentes >= self.amostras_por_bloco:
+                saida.append(self._registro())
+        return b"".join(saida)
+
+    def _registro(self):
+        if not self._pendentes:
+            return b""
+        codigos = np.concatenate(self._pendentes)
+        payload = comprimirBloco(codigos, self._comprimir)
+        registro = REGISTRO.pack(self._indice_pendente, len(codigos), len(payload)) + payload
+        self._pendentes = []
+        self._indice_pendente = None
+        self._proximo_indice = None
+        self._amostras_pendentes = 0
+        return registro
+
+    def _esvaziar(self):
+        # Grava o bloco em acúmulo como um registro (mais curto) no arquivo atual
+        if self.arquivo is None or not self._pendentes:
+            return
+        registro = self._registro()
+        self.arquivo.write(registro)
+        self._bytes_no_arquivo += len(registro)
+        self._bytes_pendentes += len(registro)
+
+    def flush(self):
+        self._esvaziar()
+        super().flush()
+
+    def fechar(self):
+        self._esvaziar()
+        if self.arquivo is not None:
+            # Cabeçalho final com a perda medida (mesmo tamanho fixo)
+            self.arquivo.seek(0)
+            self.arquivo.write(self._cabecalho(final=True))
+            self.arquivo.seek(0, 2)
+            if self.amostras_saturadas.any():
+                print(f"'{self.nome_do_arquivo}': {int(self.amostras_saturadas.sum())} amostras "
+                      f"fora da faixa saturadas")
+        super().fechar()
+        self.amostras_saturadas[:] = 0
+        self.erro_quantizacao_max[:] = 0.0
+
+
+class CapturaComprimida:
+
+    # Leitura de um .daqz: o índice dos registros sai só dos cabeçalhos de
+    # 16 bytes (seek sobre os payloads), sem descomprimir nada.
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.metadados = lerCabecalho(caminho)
+        if self.metadados.get("tipo") != "codigos":
+            raise ValueError(f"'{caminho}' não é uma captura de códigos")
+        self.channelCount = self.metadados["channelCount"]
+        self.ganho = np.array(self.metadados["ganho"])
+        self.deslocamento = np.array(self.metadados["deslocamento"])
+        self._descomprimir = _descompressor(self.metadados["compressao"])
+
+        posicoes, inicios, amostras, tamanhos = [], [], [], []
+        with open(caminho, "rb") as f:
+            f.seek(0, 2)
+            fim = f.tell()
+            posicao = TAMANHO_CABECALHO
+            while posicao + REGISTRO.size <= fim:
+                f.seek(posicao)
+                indice, n, tamanho = REGISTRO.unpack(f.read(REGISTRO.size))
+                if posicao + REGISTRO.size + tamanho > fim:
+                    break   # registro incompleto (gravação interrompida)
+                posicoes.append(posicao + REGISTRO.size)
+                inicios.append(indice)
+                amostras.append(n)
+                tamanhos.append(tamanho)
+                posicao += REGISTRO.size + tamanho
+        self.posicoes = np.array(posicoes, dtype=np.int64)
+        self.inicios = np.array(inicios, dtype=np.int64)
+        self.amostras = np.array(amostras, dtype=np.int64)
+        self.tamanhos = np.array(tamanhos, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.amostras.sum())
+
+    def registros(self, indice_inicio=None, indice_fim=None):
+        # Números dos registros com alguma amostra em [indice_inicio, indice_fim)
+        selecionados = np.ones(len(self.inicios), dtype=bool)
+        if indice_inicio is not None:
+            selecionados &= self.inicios + self.amostras > indice_inicio
+        if indice_fim is not None:
+            selecionados &= self.inicios < indice_fim
+        return np.flatnonzero(selecionados)
+
+    def codigos(self, registro):
+        # (índices, códigos uint16 (amostras, canais)) de um registro
+        with open(self.caminho, "rb") as f:
+            f.seek(self.posicoes[registro])
+            payload = f.read(self.tamanhos[registro])
+        n = int(self.amostras[registro])
+        codigos = descomprimirBloco(payload, n, self.channelCount, self._descomprimir)
+        inicio = int(self.inicios[registro])
+        return np.arange(inicio, inicio + n, dtype=np.int64), codigos
+
+    def iterar(self, indice_inicio=None, indice_fim=None, escalados=True):
+        # Gera (índices, valores) registro a registro; escalados=False devolve os códigos
+        for r in self.registros(indice_inicio, indice_fim):
+            indices, codigos = self.codigos(r)
+            dentro = np.ones(len(indices), dtype=bool)
+            if indice_inicio is not None:
+                dentro &= indices >= indice_inicio
+            if indice_fim is not None:
+                dentro &= indices < indice_fim
+            if not dentro.all():
+                indices, codigos = indices[dentro], codigos[dentro]
+            yield indices, (escalar(codigos, self.ganho, self.deslocamento) if escalados else codigos)
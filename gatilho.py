@@ -0,0 +1,214 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Captura por evento: em vez de aceitar ou descartar blocos inteiros pela
+# média, procura o gatilho amostra a amostra e guarda só a janela
+# [gatilho - pré, gatilho + pós] de cada evento. Disco e memória passam a
+# crescer com o número de eventos, não com o tempo de coleta.
+
+import numpy as np
+
+from processamento import Bloco, indicesParaNs
+
+
+class CondicaoGatilho:
+
+    TIPOS = ("nivel", "borda_subida", "borda_descida", "inclinacao")
+
+    def __init__(self, canal, tipo="borda_subida", limiar=0.5, histerese=0.0):
+        # canal:     número do canal (o mesmo N de Canal_N)
+        # tipo:      "nivel"         dispara quando o valor está acima do limiar (inclusive no início)
+        #            "borda_subida"  dispara quando o valor cruza o limiar subindo
+        #            "borda_descida" dispara quando o valor cruza o limiar descendo
+        #            "inclinacao"    dispara quando a derivada (unidades/s) passa do limiar
+        # histerese: o gatilho só é rearmado depois que o sinal volta além de limiar -/+ histerese
+        if tipo not in self.TIPOS:
+            raise ValueError(f"tipo de gatilho desconhecido: {tipo}")
+        self.canal = canal
+        self.tipo = tipo
+        self.limiar = limiar
+        self.histerese = histerese
+
+        # Estado entre blocos
+        self.armado = tipo in ("nivel", "inclinacao")
+        self.ultimo_valor = None
+
+    def detectar(self, coluna, taxa_por_canal):
+        # Posições (no bloco) onde o gatilho disparou. As comparações são
+        # vetorizadas; o laço Python só percorre os cruzamentos encontrados.
+        if self.tipo == "inclinacao":
+            anterior = coluna[0] if self.ultimo_valor is None else self.ultimo_valor
+            sinal = np.diff(coluna, prepend=anterior) * taxa_por_canal
+            limiar = self.limiar
+        elif self.tipo == "borda_descida":
+            sinal, limiar = -coluna, -self.limiar
+        else:
+            sinal, limiar = coluna, self.limiar
+        if len(coluna):
+            self.ultimo_valor = coluna[-1]
+
+        acima = np.flatnonzero(sinal >= limiar)
+        abaixo = np.flatnonzero(sinal <= limiar - self.histerese)
+
+        disparos = []
+        pos = 0
+        while True:
+            if self.armado:
+                k = np.searchsorted(acima, pos)
+                if k == len(acima):
+                    break
+                pos = acima[k]
+                disparos.append(pos)
+                self.armado = False
+            else:
+                k = np.searchsorted(abaixo, pos)
+                if k == len(abaixo):
+                    break
+                pos = abaixo[k]
+                self.armado = True
+        return disparos
+
+
+class Evento:
+    __slots__ = ("numero", "indice_gatilho", "canal", "tipo", "inicio", "fim",
+                 "coletado_ate", "partes_indices", "partes_valores")
+
+    def __init__(self, numero, indice_gatilho, canal, tipo, inicio, fim):
+        self.numero = numero
+        self.indice_gatilho = indice_gatilho
+        self.canal = canal
+        self.tipo = tipo
+        self.inicio = inicio
+        self.fim = fim
+        self.coletado_ate = inicio
+        self.partes_indices = []
+        self.partes_valores = []
+
+    def indices(self):
+        return np.concatenate(self.partes_indices) if self.partes_indices else np.empty(0, np.int64)
+
+    def valores(self):
+        return np.concatenate(self.partes_valores) if self.partes_valores else np.empty((0, 0))
+
+
+class MotorGatilho:
+
+    def __init__(self, condicoes, canais, taxa_por_canal, inicio_ns,
+                 pre_gatilho=0.05, pos_gatilho=0.2):
+        # condicoes: lista de CondicaoGatilho (qualquer uma dispara)
+        # canais:    números dos canais na ordem das colunas do bloco
+        # pre_gatilho / pos_gatilho: segundos guardados antes e depois do gatilho
+        self.condicoes = list(condicoes)
+        self.canais = list(canais)
+        self.taxa_por_canal = taxa_por_canal
+        self.inicio_ns = inicio_ns
+        self.pre = int(round(pre_gatilho * taxa_por_canal))
+        self.pos = max(1, int(round(pos_gatilho * taxa_por_canal)))
+
+        self._colunas = [self.canais.index(c.canal) for c in self.condicoes]
+        self._hist_indices = np.empty(0, dtype=np.int64)
+        self._hist_valores = np.empty((0, len(self.canais)))
+        self._aberto = None
+        self._ultimo_fim = None
+        self.eventos = 0
+
+    def _coletar(self, evento, indices, valores):
+        a = np.searchsorted(indices, evento.coletado_ate, "left")
+        b = np.searchsorted(indices, evento.fim, "left")
+        if b > a:
+            evento.partes_indices.append(indices[a:b])
+            evento.partes_valores.append(valores[a:b])
+            evento.coletado_ate = int(indices[b - 1]) + 1
+
+    def _fechar(self):
+        evento, self._aberto = self._aberto, None
+        self._ultimo_fim = evento.fim
+        indices = evento.indices()
+        ns = indicesParaNs(self.inicio_ns, indices, self.taxa_por_canal)
+        bloco = Bloco(int(indices[0]) if len(indices) else evento.inicio,
+                      ns.view("datetime64[ns]"), evento.valores(), indices)
+        return evento, bloco
+
+    def processar(self, bloco):
+        # Retorna a lista de (Evento, Bloco) dos eventos concluídos neste bloco
+        indices = bloco.indices
+        valores = bloco.valores
+
+        gatilhos = []
+        for condicao, coluna in zip(self.condicoes, self._colunas):
+            for pos in condicao.detectar(valores[:, coluna], self.taxa_por_canal):
+                gatilhos.append((int(indices[pos]), condicao))
+        gatilhos.sort(key=lambda g: g[0])
+
+        # Amostras visíveis: as últimas `pre` do histórico + o bloco atual
+        todos_indices = np.concatenate([self._hist_indices, indices])
+        todos_valores = np.concatenate([self._hist_valores, valores])
+
+        concluidos = []
+        for indice, condicao in gatilhos:
+            if self._aberto is not None:
+                if indice < self._aberto.fim:
+                    # Novo gatilho dentro da janela: estende o pós-gatilho
+                    self._aberto.fim = max(self._aberto.fim, indice + self.pos)
+                    continue
+                self._coletar(self._aberto, todos_indices, todos_valores)
+                concluidos.append(self._fechar())
+            inicio = indice - self.pre
+            if self._ultimo_fim is not None:
+                inicio = max(inicio, self._ultimo_fim)  # janelas nunca repetem amostras
+            self.eventos += 1
+            self._aberto = Evento(self.eventos, indice, condicao.canal, condicao.tipo,
+                                  inicio, indice + self.pos)
+
+        if self._aberto is not None:
+            self._coletar(self._aberto, todos_indices, todos_valores)
+            if len(indices) and self._aberto.fim <= indices[-1] + 1:
+                concluidos.append(self._fechar())
+
+        # Mantém só o necessário para o pré-gatilho do próximo bloco
+        if self.pre > 0:
+            self._hist_indices = todos_indices[-self.pre:].copy()
+            self._hist_valores = todos_valores[-self.pre:].copy()
+        return concluidos
+
+    def finalizar(self):
+        # Fecha um evento ainda aberto no fim da coleta (pós-gatilho incompleto)
+        if self._aberto is None:
+            return []
+        return [self._fechar()]
+
+
+# Grava as janelas de evento com um gravador comum (CSV ou .daq) e mantém um
+# índice por evento: arquivo e posição em bytes onde a janela começa.
+class GravadorEventos:
+
+    def __init__(self, gravador, caminho_indice):
+        if not getattr(gravador, "posicao_em_bytes", True):
+            raise ValueError(f"captura por evento não suporta gravador '{gravador.extensao}': "
+                             "a posição em bytes de cada janela não é conhecida ao gravá-la")
+        self.gravador = gravador
+        self.caminho_indice = caminho_indice
+        self.indice = open(caminho_indice, "w")
+        self.indice.write("Evento, Canal, Tipo, Timestamp_Gatilho, Indice_Gatilho, "
+                          "Indice_Inicio, Indice_Fim, Amostras, Arquivo, Posicao\n")
+        self.eventos_gravados = 0
+
+    def gravar(self, eventos):
+        for evento, bloco in eventos:
+            posicao = self.gravador.escrever_bloco(bloco)
+            if posicao is None:
+                continue
+            arquivo, offset = posicao
+            k = min(np.searchsorted(bloco.indices, evento.indice_gatilho), len(bloco) - 1)
+            gatilho = bloco.timestamps[k]
+            self.indice.write("%d, %d, %s, %s, %d, %d, %d, %d, %s, %d\n" % (
+                evento.numero, evento.canal, evento.tipo,
+                str(np.datetime_as_string(gatilho, unit="us")).replace("T", " "),
+                evento.indice_gatilho, bloco.indices[0], bloco.indices[-1] + 1, len(bloco),
+                arquivo, offset))
+            self.eventos_gravados += 1
+        self.indice.flush()
+
+    def fechar(self):
+        self.gravador.fechar()
+        self.indice.close()
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import datetime
+import os
+import time
+
+import numpy as np
+
+
+def formatarLinhas(timestamps, valores):
+    # timestamps: vetor datetime64; valores: matriz (amostras, canais)
+    # Produz o texto CSV legado: "AAAA-MM-DD HH:MM:SS.mmm, v0, v1, ..." com 6 casas decimais
+    if len(valores) == 0:
+        return ""
+    # Trunca para milissegundos, como o antigo strftime(...)[:-3]
+    ts_str = np.char.replace(np.datetime_as_string(timestamps, unit="ms"), "T", " ")
+    formato = "%s, " + ", ".join(["%.6f"] * valores.shape[1]) + "\n"
+    return "".join([formato % (t, *v) for t, v in zip(ts_str.tolist(), valores.tolist())])
+
+
+# Gravador incremental: abre o arquivo uma única vez por sessão de aquisição
+# e acrescenta apenas as linhas do bloco novo. O custo de cada bloco fica
+# constante, não importa quanto tempo a coleta dure.
+#
+# Subclasses trocam o formato redefinindo extensao, modo, _cabecalho e _serializar.
+class GravadorIncremental:
+
+    extensao = ".csv"
+    modo = "w"
+
+    def __init__(self, canais, diretorio=".", prefixo="dados",
+                 flush_bytes=64 * 1024, flush_segundos=1.0,
+                 rotacao_bytes=None, rotacao_segundos=None):
+        # canais: números dos canais gravados (ex.: range(startChannel, startChannel + channelCount))
+        # flush_bytes / flush_segundos: política de descarga para o disco (o que ocorrer primeiro)
+        # rotacao_bytes / rotacao_segundos: abre um novo arquivo ao atingir o tamanho ou a duração (None = sem rotação)
+        self.canais = list(canais)
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.flush_bytes = flush_bytes
+        self.flush_segundos = flush_segundos
+        self.rotacao_bytes = rotacao_bytes
+        self.rotacao_segundos = rotacao_segundos
+
+        self.arquivo = None
+        self.nome_do_arquivo = None
+        self.arquivos_gravados = []
+        self.linhas_gravadas = 0
+
+        self._bytes_no_arquivo = 0
+        self._bytes_pendentes = 0
+        self._inicio_arquivo = 0.0
+        self._ultimo_flush = 0.0
+
+    def _cabecalho(self):
+        return "Timestamp, " + ", ".join([f"Canal_{i}" for i in self.canais]) + "\n"
+
+    def _serializar(self, bloco):
+        return formatarLinhas(bloco.timestamps, bloco.valores)
+
+    def _abrir(self):
+        agora = datetime.datetime.now()
+        base = agora.strftime(f"{self.prefixo}_%Y-%m-%d_%H-%M-%S")
+        nome_do_arquivo = os.path.join(self.diretorio, base + self.extensao)
+        # Rotações dentro do mesmo segundo recebem um sufixo para não sobrescrever
+        sufixo = 1
+        while os.path.exists(nome_do_arquivo):
+            nome_do_arquivo = os.path.join(self.diretorio, f"{base}_{sufixo}{self.extensao}")
+            sufixo += 1
+
+        if "b" in self.modo:
+            self.arquivo = open(nome_do_arquivo, self.modo)
+        else:
+            # Sem tradução de "\n" (no Windows viraria "\r\n") e só ASCII: cada
+            # caractere escrito é um byte, então _bytes_no_arquivo é a posição
+            # real no arquivo (usada pelo índice de eventos do gatilho.py)
+            self.arquivo = open(nome_do_arquivo, self.modo, newline="", encoding="ascii")
+        self.nome_do_arquivo = nome_do_arquivo
+        self.arquivos_gravados.append(nome_do_arquivo)
+
+        cabecalho = self._cabecalho()
+        self.arquivo.write(cabecalho)
+        self._bytes_no_arquivo = len(cabecalho)
+        self._bytes_pendentes = len(cabecalho)
+        self._inicio_arquivo = time.monotonic()
+        self._ultimo_flush = self._inicio_arquivo
+
+    def _precisa_rotacionar(self, agora):
+        if self.rotacao_bytes is not None and self._bytes_no_arquivo >= self.rotacao_bytes:
+            return True
+        if self.rotacao_segundos is not None and agora - self._inicio_arquivo >= self.rotacao_segundos:
+            return True
+        return False
+
+    def escrever_bloco(self, bloco):
+        # bloco: processamento.Bloco com apenas as amostras novas
+        # Retorna (arquivo, posição em bytes) onde o bloco começou a ser gravado
+        if len(bloco) == 0:
+            return None
+
+        agora = time.monotonic()
+        if self.arquivo is None:
+            self._abrir()
+        elif self._precisa_rotacionar(agora):
+            self.fechar()
+            self._abrir()
+
+        conteudo = self._serializar(bloco)
+        posicao = (self.nome_do_arquivo, self._bytes_no_arquivo)
+
+        self.arquivo.write(conteudo)
+        self.linhas_gravadas += len(bloco)
+        self._bytes_no_arquivo += len(conteudo)
+        self._bytes_pendentes += len(conteudo)
+
+        if (self._bytes_pendentes >= self.flush_bytes
+                or agora - self._ultimo_flush >= self.flush_segundos):
+            self.flush()
+        return posicao
+
+    def flush(self):
+        if self.arquivo is not None:
+            self.arquivo.flush()
+            self._bytes_pendentes = 0
+            self._ultimo_flush = time.monotonic()
+
+    def fechar(self):
+        if self.arquivo is not None:
+            self.arquivo.close()
+            self.arquivo = None
+            print(f"Arquivo '{self.nome_do_arquivo}' salvo com sucesso!")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
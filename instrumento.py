@@ -0,0 +1,167 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Leitura do registro texto do segundo instrumento e junção com a coleta do DAQ.
+#
+# Cada registro tem a forma
+#
+#   1ms,*, 1.66kA, 0.31V\r\n
+#
+# tempo desde o início do registro, uma marca ("*") e grandezas com unidade.
+# O "\r\n" vem escrito literalmente (quatro caracteres), às vezes seguido de
+# espaços e de uma quebra de linha de verdade. O arquivo é lido em pedaços de
+# bytes; em cada pedaço os números e as unidades são separados com np.char e
+# convertidos de uma vez (kA/A/mA, kV/V/mV, s/ms/us/ns), sem laço por linha.
+# Linhas que não são registros (anotações, lixo no fim) são descartadas.
+#
+# juntarAsof() alinha esses registros com o fluxo de amostras do DAQ (leitor.py):
+# cada amostra recebe o último registro do instrumento até aquele instante,
+# como um merge_asof, também em pedaços e sem carregar nenhum dos dois inteiro.
+#
+#   python instrumento.py dados.csv --daq "dados_2025-08-29_*" \
+#       --inicio "2025-08-29 14:27:10.302" --saida juntos.csv
+
+import argparse
+import re
+
+import numpy as np
+
+from gravador import formatarLinhas
+from leitor import CursorAsof, Leitor, paraNs
+
+# Fator para a unidade base (s, A, V)
+UNIDADES = {
+    b"s": 1.0, b"ms": 1e-3, b"us": 1e-6, "µs".encode(): 1e-6, b"ns": 1e-9,
+    b"A": 1.0, b"kA": 1e3, b"mA": 1e-3,
+    b"V": 1.0, b"kV": 1e3, b"mV": 1e-3,
+}
+GRANDEZAS = {b"A": "corrente_A", b"V": "tensao_V", b"s": "tempo_s"}
+
+_NUMERO = b"0123456789.+-eE"
+_LETRAS = b"abcdfghijklmnopqrstuvwxyzABCDFGHIJKLMNOPQRSTUVWXYZ" + "µ".encode()
+_REGISTRO = re.compile(rb"^\s*[-+]?[\d.]+\s*[a-zA-Z\xc2\xb5]+\s*,[^,]*"
+                       rb"(,\s*[-+]?[\d.]+(?:[eE][-+]?\d+)?\s*[a-zA-Z\xc2\xb5]+\s*)+$")
+
+
+def _separarUnidades(coluna):
+    # Coluna de bytes " 1.66kA" -> (valores na unidade base, unidades distintas)
+    coluna = np.char.strip(coluna)
+    numeros = np.char.rstrip(coluna, _LETRAS).astype(np.float64)
+    unidades = np.char.lstrip(coluna, _NUMERO)
+    distintas, inversa = np.unique(unidades, return_inverse=True)
+    try:
+        fatores = np.array([UNIDADES[u] for u in distintas.tolist()])
+    except KeyError as e:
+        raise ValueError(f"unidade desconhecida no registro do instrumento: {e.args[0]!r}")
+    return numeros * fatores[inversa], distintas
+
+
+def _parsearCampos(campos):
+    # Matriz de bytes (registros, campos) -> (tempo_ns, valores, nomes)
+    segundos, _ = _separarUnidades(campos[:, 0])
+    tempo_ns = np.rint(segundos * 1e9).astype(np.int64)
+    colunas = [(np.char.strip(campos[:, 1]) == b"*").astype(np.float64)]
+    nomes = ["marca"]
+    for j in range(2, campos.shape[1]):
+        valores, unidades = _separarUnidades(campos[:, j])
+        colunas.append(valores)
+        base = unidades[0].lstrip(b"kmun" + "µ".encode())
+        nomes.append(GRANDEZAS.get(base, f"campo_{j}"))
+    return tempo_ns, np.column_stack(colunas), nomes
+
+
+def parsearRegistros(linhas):
+    # Lista de linhas (bytes) -> (tempo_ns int64, valores (n, 1 + grandezas), nomes das colunas).
+    # A primeira coluna de valores é a marca (1.0 quando "*").
+    linhas = [l for l in linhas if l.strip()]
+    if linhas:
+        try:
+            return _parsearCampos(np.array([l.split(b",") for l in linhas]))
+        except ValueError:
+            # Há linhas fora do formato: só aí a validação linha a linha
+            linhas = [l for l in linhas if _REGISTRO.match(l)]
+    if not linhas:
+        return np.empty(0, np.int64), np.empty((0, 0)), []
+    contagens = [l.count(b",") for l in linhas]
+    largura = max(set(contagens), key=contagens.count)
+    return _parsearCampos(np.array([l.split(b",") for l, n in zip(linhas, contagens) if n == largura]))
+
+
+class RegistroInstrumento:
+
+    def __init__(self, caminho, tamanho_chunk=8 * 1024 * 1024):
+        self.caminho = caminho
+        self.tamanho_chunk = tamanho_chunk
+        self.colunas = None
+        self.registros = 0
+
+    def iterar(self):
+        # Gera (tempo_ns relativo ao início do registro, valores) pedaço a pedaço
+        pendente = b""
+        with open(self.caminho, "rb") as f:
+            while True:
+                chunk = f.read(self.tamanho_chunk)
+                # O "\r\n" literal vira quebra de linha; um marcador cortado no
+                # fim do pedaço fica no pendente e é trocado na próxima volta
+                dados = (pendente + chunk).replace(b"\\r\\n", b"\n")
+                if chunk:
+                    corte = dados.rfind(b"\n") + 1
+                    pendente, dados = dados[corte:], dados[:corte]
+                linhas = dados.split(b"\n")
+                tempo_ns, valores, nomes = parsearRegistros(linhas)
+                if len(tempo_ns):
+                    if self.colunas is None:
+                        self.colunas = nomes
+                    self.registros += len(tempo_ns)
+                    yield tempo_ns, valores
+                if not chunk:
+                    break
+
+    def ler(self):
+        partes = list(self.iterar())
+        if not partes:
+            return np.empty(0, np.int64), np.empty((0, len(self.colunas or [])))
+        return np.concatenate([p[0] for p in partes]), np.concatenate([p[1] for p in partes])
+
+
+def juntarAsof(amostras, registros, inicio_ns, tolerancia_ns=None):
+    # amostras: iterável de (timestamps datetime64[ns], valores) do DAQ, em ordem de tempo
+    # registros: iterável de (tempo_ns relativo, valores) do instrumento, em ordem de tempo
+    # inicio_ns: instante absoluto do tempo zero do instrumento
+    # Gera (timestamps, valores do DAQ, valores do instrumento); sem registro
+    # anterior (ou mais velho que a tolerância) a linha do instrumento fica NaN.
+    cursor = CursorAsof((r_t + inicio_ns, r_v) for r_t, r_v in registros)
+    for t, v in amostras:
+        yield t, v, cursor.em(t.astype(np.int64), tolerancia_ns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Lê o registro do instrumento e junta com a coleta do DAQ")
+    parser.add_argument("registro", help="arquivo texto do instrumento (1ms,*, 1.66kA, 0.31V\\r\\n)")
+    parser.add_argument("--daq", default="dados_*", help="pasta ou padrão das capturas do DAQ")
+    parser.add_argument("--inicio", help="horário do tempo zero do instrumento (padrão: início da coleta)")
+    parser.add_argument("--tolerancia-ms", type=float, default=None,
+                        help="idade máxima do registro associado a uma amostra")
+    parser.add_argument("--saida", default="juntos.csv")
+    args = parser.parse_args()
+
+    instrumento = RegistroInstrumento(args.registro)
+    leitor = Leitor(args.daq)
+    if not leitor.arquivos:
+        raise SystemExit(f"nenhuma captura em '{args.daq}'")
+    inicio_ns = paraNs(args.inicio) if args.inicio else leitor.arquivos[0].primeiro_ns
+    tolerancia_ns = None if args.tolerancia_ms is None else int(args.tolerancia_ms * 1e6)
+
+    canais = leitor.arquivos[0].canais
+    amostras = 0
+    with open(args.saida, "w") as f:
+        cabecalho_escrito = False
+        for t, v, juntos in juntarAsof(leitor.iterar(), instrumento.iterar(), inicio_ns, tolerancia_ns):
+            if not cabecalho_escrito:
+                f.write("Timestamp, " + ", ".join([f"Canal_{c}" for c in canais] + (instrumento.colunas or []))
+                        + "\n")
+                cabecalho_escrito = True
+            f.write(formatarLinhas(t, np.column_stack([v, juntos])))
+            amostras += len(t)
+    print(f"{amostras} amostras, {instrumento.registros} registros do instrumento")
+    print(f"Arquivo '{args.saida}' salvo com sucesso!")
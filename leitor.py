@@ -0,0 +1,502 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Leitura rápida por intervalo de tempo das capturas dados_*.
+#
+# Para cada arquivo texto ("Timestamp, Canal_0, ...") é montado uma única vez
+# um índice lateral (<arquivo>.idx, JSON) com o primeiro/último timestamp e a
+# posição em bytes de uma linha a cada `passo` linhas. Pedir um intervalo de
+# tempo vira um seek direto para o trecho certo, sem parsear o arquivo todo.
+# Capturas .daq são lidas pelo memmap, que já é indexável pelo índice da amostra;
+# capturas .daqz (códigos comprimidos) descomprimem só os registros do intervalo.
+#
+#   leitor = Leitor("dados_2025-08-28_*")
+#   t, v = leitor.intervalo("2025-08-28 13:40:00", "2025-08-28 13:41:00", canais=[0])
+#   for t, v in leitor.iterar(inicio, fim):   # em pedaços, para sessões maiores que a RAM
+#       ...
+
+import glob
+import json
+import os
+
+import numpy as np
+
+from formato_binario import abrirCaptura, lerCabecalho, timestampsCaptura
+from formato_comprimido import CapturaComprimida
+
+PASSO_PADRAO = 1000
+VERSAO_INDICE = 2
+
+
+def paraNs(t):
+    # datetime, string "AAAA-MM-DD HH:MM:SS.mmm", datetime64 ou inteiro -> int64 ns
+    if t is None:
+        return None
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    if isinstance(t, str):
+        t = t.strip().replace(" ", "T")
+    return int(np.datetime64(t, "ns").astype(np.int64))
+
+
+def _parsearLinhas(texto, colunas):
+    # Bloco de linhas CSV -> (ns int64, matriz de valores com as colunas pedidas)
+    linhas = [linha for linha in texto.splitlines() if linha.strip()]
+    if not linhas:
+        return np.empty(0, np.int64), np.empty((0, len(colunas)))
+    tempos = []
+    valores = []
+    for linha in linhas:
+        ts, _, resto = linha.partition(",")
+        tempos.append(ts)
+        valores.append(resto)
+    try:
+        ns = np.array(tempos, dtype="datetime64[ns]").astype(np.int64)
+        matriz = np.fromstring(",".join(valores), sep=",").reshape(len(linhas), -1)
+    except ValueError:
+        # Alguma linha anotada à mão ou truncada: linha a linha, descartando as que não parseiam
+        ns, matriz = _parsearLinhasUmaAUma(tempos, valores)
+    return ns, matriz[:, colunas]
+
+
+def _parsearLinhasUmaAUma(tempos, valores):
+    # Número de colunas da maioria das linhas
+    contagens = [v.count(",") + 1 for v in valores]
+    largura = max(set(contagens), key=contagens.count)
+    bons_ns, bons_valores = [], []
+    for ts, resto in zip(tempos, valores):
+        try:
+            ns = np.datetime64(ts.strip().replace(" ", "T"), "ns").astype(np.int64)
+            linha = [float(x) for x in resto.split(",")]
+        except ValueError:
+            continue
+        if len(linha) == largura:
+            bons_ns.append(ns)
+            bons_valores.append(linha)
+    return np.array(bons_ns, dtype=np.int64), np.array(bons_valores, dtype=np.float64).reshape(-1, largura)
+
+
+class ArquivoTexto:
+
+    def __init__(self, caminho, passo=PASSO_PADRAO, usar_cache=True):
+        self.caminho = caminho
+        self.passo = passo
+        info = os.stat(caminho)
+        indice = self._carregarIndice(info) if usar_cache else None
+        if indice is None:
+            indice = self._montarIndice(info)
+            if usar_cache:
+                self._salvarIndice(indice)
+        self.canais = indice["canais"]
+        self.inicio_dados = indice["inicio_dados"]
+        self.linhas = indice["linhas"]
+        self.primeiro_ns = indice["primeiro_ns"]
+        self.ultimo_ns = indice["ultimo_ns"]
+        self.offsets = np.asarray(indice["offsets"], dtype=np.int64)
+        self.tempos = np.asarray(indice["tempos"], dtype=np.int64)
+        self.tamanho = info.st_size
+
+    @property
+    def caminho_indice(self):
+        return self.caminho + ".idx"
+
+    def _carregarIndice(self, info):
+        try:
+            with open(self.caminho_indice) as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Índice velho (arquivo mudou ou ainda crescia quando foi indexado)
+        if (indice.get("versao") != VERSAO_INDICE or indice.get("tamanho") != info.st_size
+                or indice.get("mtime") != info.st_mtime or indice.get("passo") != self.passo):
+            return None
+        return indice
+
+    def _salvarIndice(self, indice):
+        try:
+            with open(self.caminho_indice, "w") as f:
+                json.dump(indice, f)
+        except OSError:
+            pass  # pasta só leitura: o índice fica só em memória
+
+    def _montarIndice(self, info, tamanho_chunk=8 * 1024 * 1024):
+        # Percorre o arquivo em pedaços guardando a posição de cada `passo`-ésima linha
+        offsets, tempos = [], []
+        linhas = 0
+        ultima_linha = b""
+        with open(self.caminho, "rb") as f:
+            cabecalho = f.readline()
+            inicio_dados = f.tell()
+            posicao = inicio_dados  # posição absoluta do início de `pendente`
+            pendente = b""
+            while True:
+                chunk = f.read(tamanho_chunk)
+                if not chunk:
+                    break
+                dados = pendente + chunk
+                quebras = np.flatnonzero(np.frombuffer(dados, dtype=np.uint8) == 10)
+                if len(quebras) == 0:
+                    pendente = dados
+                    continue
+                inicios = np.concatenate([[0], quebras[:-1] + 1])
+                # Linhas deste trecho cujo número (no arquivo) é múltiplo do passo
+                for k in range((-linhas) % self.passo, len(inicios), self.passo):
+                    offsets.append(posicao + int(inicios[k]))
+                    # Linha em branco: o tempo é o da próxima linha com dados
+                    j = k
+                    while j + 1 < len(inicios) and not dados[inicios[j]:quebras[j]].strip():
+                        j += 1
+                    tempos.append(dados[inicios[j]:quebras[j]].split(b",", 1)[0].decode())
+                linhas += len(quebras)
+                # Última linha não vazia do trecho (há capturas com linhas em branco)
+                trecho = dados[:quebras[-1]].rstrip()
+                if trecho:
+                    ultima_linha = trecho[trecho.rfind(b"\n") + 1:]
+                posicao += int(quebras[-1]) + 1
+                # Linha incompleta no fim do pedaço segue para o próximo
+                pendente = dados[quebras[-1] + 1:]
+            if pendente.strip():
+                # Última linha sem '\n'
+                if linhas % self.passo == 0:
+                    offsets.append(posicao)
+                    tempos.append(pendente.split(b",", 1)[0].decode())
+                linhas += 1
+                ultima_linha = pendente
+
+        colunas = [c.strip() for c in cabecalho.decode().split(",")[1:]]
+        canais = [int(c.split("_")[-1]) for c in colunas if c]
+        ultimo_ns = None
+        if ultima_linha.strip():
+            ultimo_ns = paraNs(ultima_linha.split(b",", 1)[0].decode())
+        tempos = np.array(tempos, dtype="datetime64[ns]")
+        vazias = np.isnat(tempos)
+        if vazias.any():
+            # Só linhas em branco até o fim do trecho: vale o tempo da próxima linha indexada
+            validas = np.flatnonzero(~vazias)
+            proxima = np.searchsorted(validas, np.flatnonzero(vazias))
+            substitutos = np.full(len(proxima), ultimo_ns if ultimo_ns is not None else 0, dtype=np.int64)
+            dentro = proxima < len(validas)
+            substitutos[dentro] = tempos[validas[proxima[dentro]]].astype(np.int64)
+            tempos = tempos.astype(np.int64)
+            tempos[vazias] = substitutos
+        tempos_ns = [int(x) for x in tempos.astype(np.int64)]
+        return {
+            "versao": VERSAO_INDICE,
+            "tamanho": info.st_size,
+            "mtime": info.st_mtime,
+            "passo": self.passo,
+            "canais": canais,
+            "inicio_dados": inicio_dados,
+            "linhas": linhas,
+            "primeiro_ns": tempos_ns[0] if tempos_ns and ultimo_ns is not None else None,
+            "ultimo_ns": ultimo_ns,
+            "offsets": offsets,
+            "tempos": tempos_ns,
+        }
+
+    def _colunas(self, canais):
+        if canais is None:
+            return list(range(len(self.canais)))
+        return [self.canais.index(c) for c in canais]
+
+    def iterar(self, inicio=None, fim=None, canais=None, linhas_por_chunk=100000):
+        # Gera (timestamps datetime64[ns], valores) com inicio <= t < fim
+        if self.primeiro_ns is None:
+            return
+        inicio_ns, fim_ns = paraNs(inicio), paraNs(fim)
+        colunas = self._colunas(canais)
+
+        # Trecho de linhas indexadas que cobre o intervalo
+        # (a linha indexada anterior à primeira com tempo >= inicio: as linhas do
+        # mesmo ms que ficam antes da indexada também entram)
+        a = 0 if inicio_ns is None else max(0, np.searchsorted(self.tempos, inicio_ns, "left") - 1)
+        b = len(self.offsets) if fim_ns is None else np.searchsorted(self.tempos, fim_ns, "left")
+        if b <= a:
+            b = a + 1
+        pos_fim = self.offsets[b] if b < len(self.offsets) else self.tamanho
+
+        # Lê em pedaços de ~linhas_por_chunk linhas, alinhados com o índice
+        passos_por_chunk = max(1, linhas_por_chunk // self.passo)
+        with open(self.caminho, "rb") as f:
+            k = a
+            while k < b:
+                k_fim = min(b, k + passos_por_chunk)
+                p0 = self.offsets[k]
+                p1 = self.offsets[k_fim] if k_fim < len(self.offsets) else pos_fim
+                f.seek(p0)
+                ns, valores = _parsearLinhas(f.read(p1 - p0).decode(), colunas)
+                if inicio_ns is not None or fim_ns is not None:
+                    dentro = np.ones(len(ns), dtype=bool)
+                    if inicio_ns is not None:
+                        dentro &= ns >= inicio_ns
+                    if fim_ns is not None:
+                        dentro &= ns < fim_ns
+                    ns, valores = ns[dentro], valores[dentro]
+                if len(ns):
+                    yield ns.view("datetime64[ns]"), valores
+                k = k_fim
+
+    def ler(self, inicio=None, fim=None, canais=None):
+        return _juntar(self.iterar(inicio, fim, canais), len(self._colunas(canais)))
+
+
+class ArquivoDaq:
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.metadados, self.quadros = abrirCaptura(caminho)
+        self.canais = self.metadados.get("canais") or list(range(
+            self.metadados["startChannel"], self.metadados["startChannel"] + self.metadados["channelCount"]))
+        # Sessões de várias placas (multidispositivo.py) já trazem o tempo comum de cada quadro
+        self.tempo_gravado = "tempo_ns" in self.quadros.dtype.names
+        self.primeiro_ns = self.ultimo_ns = None
+        if len(self.quadros):
+            extremos = self._tempos(self.quadros[[0, -1]]).astype(np.int64)
+            self.primeiro_ns, self.ultimo_ns = int(extremos[0]), int(extremos[1])
+
+    def _tempos(self, trecho):
+        if self.tempo_gravado:
+            return trecho["tempo_ns"].view("datetime64[ns]")
+        return timestampsCaptura(self.metadados, trecho["indice"])
+
+    def _posicao(self, t):
+        # Primeiro quadro com tempo >= t (o tempo cresce com o índice: busca binária no memmap)
+        if self.tempo_gravado:
+            return np.searchsorted(self.quadros["tempo_ns"], paraNs(t), "left")
+        taxa = self.metadados["clockRate"] / self.metadados["channelCount"]
+        alvo = int(np.ceil((paraNs(t) - self.metadados["inicio_ns"]) * taxa / 1e9))
+        return np.searchsorted(self.quadros["indice"], alvo, "left")
+
+    def iterar(self, inicio=None, fim=None, canais=None, linhas_por_chunk=100000):
+        if self.primeiro_ns is None:
+            return
+        colunas = list(range(len(self.canais))) if canais is None else [self.canais.index(c) for c in canais]
+        a = 0 if inicio is None else self._posicao(inicio)
+        b = len(self.quadros) if fim is None else self._posicao(fim)
+        for k in range(a, b, linhas_por_chunk):
+            trecho = self.quadros[k:min(b, k + linhas_por_chunk)]
+            yield self._tempos(trecho), trecho["valores"][:, colunas]
+
+    def ler(self, inicio=None, fim=None, canais=None):
+        largura = len(self.canais) if canais is None else len(canais)
+        return _juntar(self.iterar(inicio, fim, canais), largura)
+
+
+class ArquivoComprimido:
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.captura = CapturaComprimida(caminho)
+        self.metadados = self.captura.metadados
+        self.canais = self.metadados["canais"]
+        self.primeiro_ns = self.ultimo_ns = None
+        if len(self.captura.inicios):
+            extremos = [self.captura.inicios[0], self.captura.inicios[-1] + self.captura.amostras[-1] - 1]
+            ns = timestampsCaptura(self.metadados, extremos).astype(np.int64)
+            self.primeiro_ns, self.ultimo_ns = int(ns[0]), int(ns[1])
+
+    def _indice(self, t):
+        # Primeiro índice de amostra com tempo >= t
+        taxa = self.metadados["clockRate"] / self.metadados["channelCount"]
+        return int(np.ceil((paraNs(t) - self.metadados["inicio_ns"]) * taxa / 1e9))
+
+    def iterar(self, inicio=None, fim=None, canais=None, linhas_por_chunk=100000):
+        # Um pedaço por registro comprimido (linhas_por_chunk não se aplica)
+        if self.primeiro_ns is None:
+            return
+        colunas = list(range(len(self.canais))) if canais is None else [self.canais.index(c) for c in canais]
+        a = None if inicio is None else self._indice(inicio)
+        b = None if fim is None else self._indice(fim)
+        for indices, valores in self.captura.iterar(a, b):
+            if len(indices):
+                yield timestampsCaptura(self.metadados, indices), valores[:, colunas]
+
+    def ler(self, inicio=None, fim=None, canais=None):
+        largura = len(self.canais) if canais is None else len(canais)
+        return _juntar(self.iterar(inicio, fim, canais), largura)
+
+
+def _juntar(partes, largura):
+    partes = list(partes)
+    if not partes:
+        return np.empty(0, dtype="datetime64[ns]"), np.empty((0, largura))
+    return np.concatenate([p[0] for p in partes]), np.concatenate([p[1] for p in partes])
+
+
+def abrirArquivo(caminho, passo=PASSO_PADRAO, usar_cache=True):
+    if caminho.endswith(".daq"):
+        return ArquivoDaq(caminho)
+    if caminho.endswith(".daqz"):
+        return ArquivoComprimido(caminho)
+    return ArquivoTexto(caminho, passo, usar_cache)
+
+
+class Leitor:
+
+    def __init__(self, origem="dados_*", passo=PASSO_PADRAO, usar_cache=True):
+        # origem: pasta, padrão glob ou lista de arquivos de uma sessão
+        if isinstance(origem, str):
+            if os.path.isdir(origem):
+                if os.path.exists(os.path.join(origem, "manifesto.json")) and not glob.glob(
+                        os.path.join(origem, "dados_*")):
+                    raise ValueError(f"'{origem}' é uma sessão de várias placas: use LeitorSessao")
+                origem = os.path.join(origem, "dados_*")
+            caminhos = glob.glob(origem)
+        else:
+            caminhos = list(origem)
+
+        self.arquivos = []
+        for caminho in caminhos:
+            if caminho.endswith(".idx"):
+                continue
+            if caminho.endswith(".daq") and lerCabecalho(caminho).get("tipo") == "resumo":
+                continue
+            arquivo = abrirArquivo(caminho, passo, usar_cache)
+            if arquivo.primeiro_ns is not None:
+                self.arquivos.append(arquivo)
+        self.arquivos.sort(key=lambda a: (a.primeiro_ns, a.ultimo_ns))
+
+    def cobertura(self):
+        # Lista de (arquivo, primeiro, último) com os timestamps em datetime64
+        return [(a.caminho, np.datetime64(a.primeiro_ns, "ns"), np.datetime64(a.ultimo_ns, "ns"))
+                for a in self.arquivos]
+
+    def iterar(self, inicio=None, fim=None, canais=None, linhas_por_chunk=100000):
+        # Percorre os arquivos em ordem de tempo. Arquivos que se sobrepõem
+        # (snapshots regravados, rotações) só contribuem com o que vem depois
+        # do último instante já entregue, então nada sai repetido. Como em
+        # compactar.py, o texto tem resolução de 1 ms e o mesmo tempo pode
+        # aparecer em várias linhas: no instante da emenda só são puladas as
+        # primeiras, tantas quantas já foram entregues com aquele tempo.
+        inicio_ns, fim_ns = paraNs(inicio), paraNs(fim)
+        entregue_ate, repetidas = None, 0     # último tempo entregue e quantas linhas o têm
+        for arquivo in self.arquivos:
+            if fim_ns is not None and arquivo.primeiro_ns >= fim_ns:
+                break
+            if inicio_ns is not None and arquivo.ultimo_ns < inicio_ns:
+                continue
+            if entregue_ate is not None and arquivo.ultimo_ns < entregue_ate:
+                continue
+            corte, ja_entregues = entregue_ate, repetidas
+            a = inicio_ns
+            if corte is not None:
+                a = corte if a is None else max(a, corte)
+            vistas = 0
+            for t, v in arquivo.iterar(a, fim_ns, canais, linhas_por_chunk):
+                ns = t.astype(np.int64)
+                if corte is not None:
+                    manter = ns > corte
+                    iguais = np.flatnonzero(ns == corte)
+                    manter[iguais[max(0, ja_entregues - vistas):]] = True
+                    vistas += len(iguais)
+                    if not manter.all():
+                        t, v, ns = t[manter], v[manter], ns[manter]
+                if len(ns) == 0:
+                    continue
+                iguais_no_fim = int(np.count_nonzero(ns == ns[-1]))
+                if ns[-1] == entregue_ate and iguais_no_fim == len(ns):
+                    repetidas += iguais_no_fim     # o pedaço inteiro continua o mesmo ms
+                else:
+                    repetidas = iguais_no_fim
+                entregue_ate = int(ns[-1])
+                yield t, v
+
+    def intervalo(self, inicio=None, fim=None, canais=None):
+        largura = len(canais) if canais is not None else (len(self.arquivos[0].canais) if self.arquivos else 0)
+        return _juntar(self.iterar(inicio, fim, canais), largura)
+
+
+class CursorAsof:
+
+    # Percorre os pedaços (tempos, valores) de uma fonte em ordem de tempo e
+    # devolve, para cada instante pedido, o último valor até ele (merge_asof),
+    # sem carregar a fonte inteira. Usado pelo LeitorSessao (placas entre si)
+    # e pelo instrumento.juntarAsof (registro do instrumento x DAQ).
+
+    def __init__(self, partes, largura=None):
+        # largura: colunas da fonte; None = a do primeiro pedaço (0 se não houver nenhum)
+        self.partes = iter(partes)
+        self.largura = largura
+        self.tempos = np.empty(0, np.int64)
+        self.valores = None
+        self.esgotado = False
+
+    def em(self, t_ns, tolerancia_ns=None):
+        # t_ns: int64 crescentes; sem valor anterior (ou mais velho que a tolerância) sai NaN
+        while len(t_ns) and not self.esgotado and (len(self.tempos) == 0 or self.tempos[-1] <= t_ns[-1]):
+            try:
+                t, v = next(self.partes)
+            except StopIteration:
+                self.esgotado = True
+                break
+            self.tempos = np.concatenate([self.tempos, t.astype(np.int64)])
+            self.valores = v if self.valores is None else np.concatenate([self.valores, v])
+        if self.valores is not None:
+            largura = self.valores.shape[1]
+        else:
+            largura = self.largura or 0
+        saida = np.full((len(t_ns), largura), np.nan)
+        if len(self.tempos) and len(t_ns):
+            k = np.searchsorted(self.tempos, t_ns, "right") - 1
+            validos = k >= 0
+            if tolerancia_ns is not None:
+                validos &= t_ns - self.tempos[np.maximum(k, 0)] <= tolerancia_ns
+            saida[validos] = self.valores[k[validos]]
+            # Só o último valor usado ainda pode valer para os próximos instantes
+            manter = max(0, int(k[-1]))
+            self.tempos, self.valores = self.tempos[manter:], self.valores[manter:]
+        return saida
+
+
+class LeitorSessao:
+
+    # Sessão de várias placas (multidispositivo.py): um .daq por placa, todos
+    # com o tempo de cada amostra no relógio comum (tempo_ns). As placas têm
+    # taxas e canais diferentes, então a leitura usa o eixo de tempo de uma
+    # placa de referência (padrão: a de maior taxa) e cada uma das outras
+    # entra com o seu valor mais recente até cada instante, nas suas próprias
+    # colunas ("<placa>/Canal_N").
+    #
+    #   sessao = LeitorSessao("sessao_2025-08-28_13-40-00")
+    #   t, v = sessao.intervalo("2025-08-28 13:40:00", "2025-08-28 13:41:00")
+
+    def __init__(self, diretorio):
+        with open(os.path.join(diretorio, "manifesto.json")) as f:
+            manifesto = json.load(f)
+        self.diretorio = diretorio
+        self.placas = {}
+        for nome, estado in manifesto["dispositivos"].items():
+            caminho = os.path.join(diretorio, estado["arquivo"])
+            if os.path.exists(caminho):
+                arquivo = ArquivoDaq(caminho)
+                if arquivo.primeiro_ns is not None:
+                    self.placas[nome] = arquivo
+        self.colunas = [f"{nome}/Canal_{c}" for nome, a in self.placas.items() for c in a.canais]
+
+    def _taxa(self, nome):
+        metadados = self.placas[nome].metadados
+        return metadados["clockRate"] / metadados["channelCount"]
+
+    def iterar(self, inicio=None, fim=None, referencia=None, tolerancia_ns=None, linhas_por_chunk=100000):
+        # Gera (timestamps da referência, valores com as colunas de todas as placas)
+        if not self.placas:
+            return
+        if referencia is None:
+            referencia = max(self.placas, key=self._taxa)
+        inicio_ns = paraNs(inicio)
+        cursores = {}
+        for nome, arquivo in self.placas.items():
+            if nome == referencia:
+                continue
+            # Começa um pouco antes, para ter a amostra anterior ao início
+            a = None if inicio_ns is None else inicio_ns - int(2e9 / self._taxa(nome))
+            cursores[nome] = CursorAsof(arquivo.iterar(a, fim, linhas_por_chunk=linhas_por_chunk),
+                                         len(arquivo.canais))
+        for t, v in self.placas[referencia].iterar(inicio, fim, linhas_por_chunk=linhas_por_chunk):
+            t_ns = t.astype(np.int64)
+            partes = [v if nome == referencia else cursores[nome].em(t_ns, tolerancia_ns)
+                      for nome in self.placas]
+            yield t, np.column_stack(partes)
+
+    def intervalo(self, inicio=None, fim=None, referencia=None, tolerancia_ns=None):
+        return _juntar(self.iterar(inicio, fim, referencia, tolerancia_ns), len(self.colunas))
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Anel de amostras em multiprocessing.shared_memory, para vários processos
+# consumirem a coleta ao vivo (gráfico, classificador, gravador...) sem cópia
+# nem pickle.
+#
+# A aquisição é o único escritor: copia cada bloco para o anel e só então
+# avança o contador "escrito" (número de sequência = índice da amostra por
+# canal desde o início da coleta). Leitores não usam trava nenhuma: leem o
+# contador, acessam as amostras por views NumPy direto na memória
+# compartilhada e, depois de usá-las, conferem se o escritor não passou por
+# cima delas. Quem fica mais de `capacidade` amostras para trás pula para a
+# amostra mais antiga ainda no anel e registra a perda. Nenhum leitor
+# consegue atrasar o escritor.
+#
+# Blocos que a aquisição descartou antes de chegar ao anel (fila cheia no
+# modo por eventos) aparecem como salto no índice do bloco seguinte: o trecho
+# que falta é preenchido com NaN e somado em "descartadas" no controle, para
+# o leitor não confundir a lacuna com dados antigos do anel.
+#
+#   # processo da aquisição (PollingStreamingAI.py, memoriaCompartilhada = "daq_ao_vivo")
+#   anel = AnelCompartilhado("daq_ao_vivo", channelCount, capacidade, taxa_por_canal)  # antes do start()
+#   anel.iniciar(inicio_ns)                                                         # depois do start()
+#   anel.publicar(indice_inicial, matriz)
+#   anel.descartar_ate(amostras_lidas)                                              # no fim, blocos descartados
+#
+#   # outro processo
+#   leitor = LeitorAnel("daq_ao_vivo")
+#   while leitor.esperar(1.0):
+#       fatia = leitor.proximo()
+#       ...usa fatia.valores (view, sem cópia)...
+#       if not leitor.valida(fatia): ...foi sobrescrita durante o uso...
+#
+# Um anel que sobrou de uma coleta que caiu sem fechar (o escritor gravou o
+# próprio pid no controle e ele não existe mais) é removido e criado de novo.
+
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+ASSINATURA = 0x4D4F555241414E45     # "MOURAANE"
+VERSAO = 2
+TAMANHO_CONTROLE = 128
+
+# Posições (int64) no bloco de controle
+(_ASSINATURA, _VERSAO, _CANAIS, _CAPACIDADE, _INICIO_NS, _ESCRITO, _TAXA, _FECHADO, _RESERVADO,
+ _PID, _DESCARTADAS, _LACUNAS) = range(12)
+
+# Anéis criados por este processo: o leitor no mesmo processo não mexe no registro deles
+_criados = set()
+
+
+def _mapear(shm):
+    controle = np.ndarray((16,), dtype=np.int64, buffer=shm.buf)
+    canais, capacidade = int(controle[_CANAIS]), int(controle[_CAPACIDADE])
+    valores = np.ndarray((capacidade, canais), dtype=np.float32, buffer=shm.buf, offset=TAMANHO_CONTROLE)
+    return controle, valores
+
+
+def _abrirSemRegistro(nome):
+    # Só quem criou o anel o remove; sem isto o resource_tracker de quem apenas
+    # abriu apagaria a memória ao fim do processo (Python < 3.13)
+    try:
+        return shared_memory.SharedMemory(name=nome, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=nome)
+        if os.name != "nt" and shm.name not in _criados:
+            resource_tracker.unregister("/" + shm.name, "shared_memory")
+        return shm
+
+
+def _abandonado(nome):
+    # True se o anel existente é de um escritor que já fechou ou não existe mais.
+    # No Windows a memória some com o último processo, então quem existe está vivo.
+    if os.name == "nt":
+        return False
+    shm = _abrirSemRegistro(nome)
+    try:
+        if shm.size < TAMANHO_CONTROLE:
+            return False
+        controle = np.ndarray((16,), dtype=np.int64, buffer=shm.buf)
+        fechado, pid = bool(controle[_FECHADO]), int(controle[_PID])
+        del controle
+    finally:
+        shm.close()
+    if pid <= 0 or pid == os.getpid():
+        return False
+    if fechado:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class AnelCompartilhado:
+
+    def __init__(self, nome, channelCount, capacidade, taxa_por_canal, inicio_ns=None):
+        # capacidade: amostras por canal guardadas (ex.: 10 s * taxa_por_canal)
+        # inicio_ns: None = os leitores só aceitam o anel depois de iniciar(inicio_ns);
+        # assim ele pode ser criado antes do start() da placa
+        tamanho = TAMANHO_CONTROLE + capacidade * channelCount * 4
+        try:
+            self.shm = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+        except FileExistsError:
+            if not _abandonado(nome):
+                raise FileExistsError(f"o anel '{nome}' está em uso por outra coleta")
+            antigo = shared_memory.SharedMemory(name=nome)
+            antigo.close()
+            antigo.unlink()
+            self.shm = shared_memory.SharedMemory(name=nome, create=True, size=tamanho)
+        self.nome = self.shm.name
+        _criados.add(self.nome)
+        controle = np.ndarray((16,), dtype=np.int64, buffer=self.shm.buf)
+        controle[:] = 0
+        controle[_PID] = os.getpid()
+        controle[_VERSAO] = VERSAO
+        controle[_CANAIS] = channelCount
+        controle[_CAPACIDADE] = capacidade
+        controle[_TAXA:_TAXA + 1].view(np.float64)[0] = taxa_por_canal
+        del controle
+        self.controle, self.valores = _mapear(self.shm)
+        self.capacidade = capacidade
+        self.channelCount = channelCount
+        if inicio_ns is not None:
+            self.iniciar(inicio_ns)
+
+    def iniciar(self, inicio_ns):
+        # Horário da amostra 0; a assinatura por último: leitores só aceitam o anel depois dela
+        self.controle[_INICIO_NS] = inicio_ns
+        self.controle[_ASSINATURA] = ASSINATURA
+
+    @property
+    def escrito(self):
+        return int(self.controle[_ESCRITO])
+
+    def publicar(self, indice_inicial, matriz):
+        # matriz: (amostras, channelCount); indice_inicial segue o último publicado
+        # ou salta os blocos descartados antes do anel
+        n = len(matriz)
+        if n == 0:
+            return
+        self.descartar_ate(indice_inicial)
+        if n > self.capacidade:
+            indice_inicial += n - self.capacidade
+            matriz = matriz[-self.capacidade:]
+            n = self.capacidade
+        # Antes de sobrescrever, avisa até onde vai escrever (ver LeitorAnel.valida)
+        self.controle[_RESERVADO] = indice_inicial + n
+        a = indice_inicial % self.capacidade
+        primeira = min(n, self.capacidade - a)
+        self.valores[a:a + primeira] = matriz[:primeira]
+        if primeira < n:
+            self.valores[:n - primeira] = matriz[primeira:]
+        # Publicação: o contador só avança depois dos dados estarem no lugar
+        self.controle[_ESCRITO] = indice_inicial + n
+
+    def descartar_ate(self, fim):
+        # Amostras de "escrito" até fim nunca chegaram ao anel: contadas e marcadas
+        # com NaN. Também serve para o fim da coleta, quando não há bloco seguinte.
+        inicio = self.escrito
+        if fim <= inicio:
+            return
+        self.controle[_DESCARTADAS] += fim - inicio
+        self.controle[_LACUNAS] += 1
+        inicio = max(inicio, fim - self.capacidade)
+        self.controle[_RESERVADO] = fim
+        a = inicio % self.capacidade
+        n = fim - inicio
+        primeira = min(n, self.capacidade - a)
+        self.valores[a:a + primeira] = np.nan
+        if primeira < n:
+            self.valores[:n - primeira] = np.nan
+        self.controle[_ESCRITO] = fim
+
+    def fechar(self):
+        self.controle[_FECHADO] = 1
+        del self.controle, self.valores
+        self.shm.close()
+        self.shm.unlink()
+        _criados.discard(self.nome)
+
+
+class Fatia:
+    __slots__ = ("indice_inicial", "valores")
+
+    def __init__(self, indice_inicial, valores):
+        self.indice_inicial = indice_inicial
+        self.valores = valores
+
+    def __len__(self):
+        return len(self.valores)
+
+
+class LeitorAnel:
+
+    def __init__(self, nome, desde_o_inicio=False, intervalo_espera=0.001):
+        # desde_o_inicio: começa pela amostra mais antiga ainda no anel, em vez das novas
+        self.shm = _abrirSemRegistro(nome)
+        controle = np.ndarray((16,), dtype=np.int64, buffer=self.shm.buf)
+        if controle[_ASSINATURA] != ASSINATURA or controle[_VERSAO] != VERSAO:
+            del controle
+            self.shm.close()
+            raise ValueError(f"'{nome}' não é um anel de aquisição compatível (ou ainda não foi iniciado)")
+        self.controle, self.valores = _mapear(self.shm)
+        self.channelCount = int(self.controle[_CANAIS])
+        self.capacidade = int(self.controle[_CAPACIDADE])
+        self.inicio_ns = int(self.controle[_INICIO_NS])
+        self.taxa_por_canal = float(self.controle[_TAXA:_TAXA + 1].view(np.float64)[0])
+        self.intervalo_espera = intervalo_espera
+
+        escrito = self.escrito
+        self.posicao = max(0, escrito - self.capacidade) if desde_o_inicio else escrito
+        self.atrasos = 0
+        self.amostras_perdidas = 0
+
+    @property
+    def escrito(self):
+        return int(self.controle[_ESCRITO])
+
+    @property
+    def fechado(self):
+        return bool(self.controle[_FECHADO])
+
+    @property
+    def descartadas(self):
+        # Amostras por canal que a aquisição descartou antes do anel (ficam como NaN)
+        return int(self.controle[_DESCARTADAS])
+
+    @property
+    def lacunas(self):
+        return int(self.controle[_LACUNAS])
+
+    def disponiveis(self):
+        return self.escrito - self.posicao
+
+    def esperar(self, timeout=None):
+        # Espera haver amostras novas; False no timeout ou quando o escritor fechou o anel
+        prazo = None if timeout is None else time.monotonic() + timeout
+        while self.disponiveis() <= 0:
+            if self.fechado or (prazo is not None and time.monotonic() >= prazo):
+                return False
+            time.sleep(self.intervalo_espera)
+        return True
+
+    def proximo(self, maximo=None):
+        # Próximo trecho contíguo (pode parar na volta do anel) como view sem cópia
+        escrito = self.escrito
+        mais_antiga = escrito - self.capacidade
+        if self.posicao < mais_antiga:
+            # Ficou para trás: as amostras que faltam já foram sobrescritas
+            self.atrasos += 1
+            self.amostras_perdidas += mais_antiga - self.posicao
+            self.posicao = mais_antiga
+        n = escrito - self.posicao
+        if maximo is not None:
+            n = min(n, maximo)
+        a = self.posicao % self.capacidade
+        n = min(n, self.capacidade - a)
+        fatia = Fatia(self.posicao, self.valores[a:a + n])
+        self.posicao += n
+        return fatia
+
+    def valida(self, fatia):
+        # True se nenhuma amostra da fatia foi (ou está sendo) sobrescrita desde que
+        # foi obtida. Conferir depois de usar a view (ou copiar) garante que o que
+        # foi lido é consistente.
+        if int(self.controle[_RESERVADO]) - self.capacidade > fatia.indice_inicial:
+            self.atrasos += 1
+            return False
+        return True
+
+    def timestamps(self, fatia):
+        # datetime64[ns] de cada amostra da fatia
+        from processamento import timestampsNs
+        return timestampsNs(self.inicio_ns, fatia.indice_inicial, len(fatia),
+                            self.taxa_por_canal).view("datetime64[ns]")
+
+    def fechar(self):
+        del self.controle, self.valores
+        self.shm.close()
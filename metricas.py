@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Métricas do pipeline de aquisição.
+#
+# Histogramas de tempo por etapa (espera no getData, processamento,
+# gravação), amostras/s, deriva entre o contador de amostras e o relógio
+# monotônico, lacunas na sequência de índices e overruns. O caminho quente só
+# faz um bisect numa lista de 27 limites e alguns incrementos; o resto
+# (percentis, JSON, HTTP) roda na thread do exportador.
+#
+#   metricas = Metricas(taxa_por_canal, channelCount)
+#   exportador = ExportadorMetricas(metricas, "metricas.jsonl", porta=8765)   # a porta já fica reservada
+#   wfAiCtrl.start()
+#   metricas.iniciar()                                       # a deriva conta a partir do start()
+#   exportador.iniciar()
+#   metricas.registrar("getdata", returnedCount, segundos)   # mesma assinatura do observar do pipeline
+#   curl http://127.0.0.1:8765/metricas
+
+import bisect
+import http.server
+import json
+import threading
+import time
+
+# Limites superiores (s) dos baldes: 1 µs, 2 µs, 4 µs ... ~67 s
+LIMITES_HISTOGRAMA = [1e-6 * 2 ** k for k in range(27)]
+
+
+class Histograma:
+
+    def __init__(self, limites=LIMITES_HISTOGRAMA):
+        self.limites = limites
+        self.baldes = [0] * (len(limites) + 1)   # o último recebe o que passar do maior limite
+        self.contagem = 0
+        self.soma = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos):
+        self.baldes[bisect.bisect_left(self.limites, segundos)] += 1
+        self.contagem += 1
+        self.soma += segundos
+        if segundos > self.maximo:
+            self.maximo = segundos
+
+    def percentil(self, p):
+        # Limite superior do balde onde o percentil cai (estimativa por cima)
+        if self.contagem == 0:
+            return None
+        alvo = p / 100.0 * self.contagem
+        acumulado = 0
+        for i, n in enumerate(self.baldes):
+            acumulado += n
+            if acumulado >= alvo:
+                return self.limites[i] if i < len(self.limites) else self.maximo
+        return self.maximo
+
+    def resumo(self):
+        return {
+            "contagem": self.contagem,
+            "media_s": self.soma / self.contagem if self.contagem else None,
+            "p50_s": self.percentil(50),
+            "p95_s": self.percentil(95),
+            "p99_s": self.percentil(99),
+            "max_s": self.maximo,
+            # Só os baldes ocupados: {limite superior (s): contagem}
+            "baldes": {("%g" % self.limites[i] if i < len(self.limites) else "inf"): n
+                       for i, n in enumerate(self.baldes) if n},
+        }
+
+
+class Metricas:
+
+    def __init__(self, taxa_por_canal, channelCount, fontes=None):
+        # fontes: {nome: função sem argumentos que devolve um dict}, lidas a cada
+        # instantâneo (ex.: {"pipeline": pipeline.contadores})
+        self.taxa_por_canal = taxa_por_canal
+        self.channelCount = channelCount
+        self.fontes = dict(fontes or {})
+        self.histogramas = {}
+        self._lock = threading.Lock()
+
+        self.inicio = time.monotonic()
+        self.amostras = 0               # amostras por canal entregues pelo dispositivo
+        self.deriva_min = None
+        self.deriva_max = None
+        self.proximo_indice = None
+        self.lacunas = 0
+        self.amostras_faltando = 0
+        self.overruns = 0
+        self._anterior = (self.inicio, 0)
+
+    def iniciar(self):
+        # Marca o start() do dispositivo: deriva e amostras/s contam a partir daqui,
+        # não da criação das métricas
+        with self._lock:
+            self.inicio = time.monotonic()
+            self._anterior = (self.inicio, self.amostras)
+
+    def registrar(self, etapa, valores, segundos):
+        # Tempo de um bloco de `valores` (amostras x canais) numa etapa. A etapa
+        # "getdata" (leitura do dispositivo) também avança o contador de amostras.
+        with self._lock:
+            h = self.histogramas.get(etapa)
+            if h is None:
+                h = self.histogramas[etapa] = Histograma()
+            h.registrar(segundos)
+            if etapa == "getdata":
+                self.amostras += valores // self.channelCount
+
+    def verificar_continuidade(self, indice_inicial, amostras):
+        # Chamado com o índice e o tamanho (por canal) de cada bloco que chega ao
+        # processamento; blocos descartados ou perdidos aparecem como lacunas
+        with self._lock:
+            if self.proximo_indice is not None and indice_inicial != self.proximo_indice:
+                self.lacunas += 1
+                self.amostras_faltando += indice_inicial - self.proximo_indice
+            self.proximo_indice = indice_inicial + amostras
+
+    def registrar_overrun(self):
+        with self._lock:
+            self.overruns += 1
+
+    def instantaneo(self):
+        agora = time.monotonic()
+        with self._lock:
+            amostras = self.amostras
+            # > 0: o contador está à frente do relógio; < 0: a leitura está atrasada
+            # (ou o relógio da placa é mais lento que o do computador)
+            deriva = amostras / self.taxa_por_canal - (agora - self.inicio)
+            self.deriva_min = deriva if self.deriva_min is None else min(self.deriva_min, deriva)
+            self.deriva_max = deriva if self.deriva_max is None else max(self.deriva_max, deriva)
+            histogramas = {etapa: h.resumo() for etapa, h in self.histogramas.items()}
+            t_anterior, amostras_anterior = self._anterior
+            self._anterior = (agora, amostras)
+            estado = {
+                "tempo": time.time(),
+                "decorrido_s": agora - self.inicio,
+                "amostras": amostras,
+                "amostras_por_s": amostras / (agora - self.inicio) if agora > self.inicio else None,
+                "amostras_por_s_intervalo": ((amostras - amostras_anterior) / (agora - t_anterior)
+                                             if agora > t_anterior else None),
+                "deriva_s": deriva,
+                "deriva_min_s": self.deriva_min,
+                "deriva_max_s": self.deriva_max,
+                "lacunas": self.lacunas,
+                "amostras_faltando": self.amostras_faltando,
+                "overruns": self.overruns,
+                "etapas": histogramas,
+            }
+        for nome, fonte in self.fontes.items():
+            try:
+                estado[nome] = fonte()
+            except Exception as e:
+                estado[nome] = {"erro": repr(e)}
+        return estado
+
+
+class ExportadorMetricas:
+
+    # A cada `intervalo` segundos acrescenta um instantâneo em JSON (uma linha)
+    # ao arquivo e o deixa disponível em http://127.0.0.1:<porta>/metricas
+
+    def __init__(self, metricas, caminho=None, porta=None, intervalo=5.0, host="127.0.0.1"):
+        self.metricas = metricas
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.ultimo = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="metricas", daemon=True)
+        self._servidor = None
+        if porta is not None:
+            self._servidor = http.server.ThreadingHTTPServer((host, porta), self._manipulador())
+            self._servidor.daemon_threads = True
+
+    def _manipulador(self):
+        exportador = self
+
+        class Manipulador(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metricas"):
+                    self.send_error(404)
+                    return
+                corpo = json.dumps(exportador.ultimo or exportador.metricas.instantaneo()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        return Manipulador
+
+    def iniciar(self):
+        self._thread.start()
+        if self._servidor is not None:
+            threading.Thread(target=self._servidor.serve_forever, name="metricas_http",
+                             daemon=True).start()
+        return self
+
+    def _exportar(self):
+        self.ultimo = self.metricas.instantaneo()
+        if self.caminho is not None:
+            with open(self.caminho, "a") as f:
+                f.write(json.dumps(self.ultimo) + "\n")
+
+    def _laco(self):
+        while not self._parar.wait(self.intervalo):
+            self._exportar()
+
+    def parar(self):
+        # Grava um último instantâneo e desliga o servidor. Sem iniciar() (a
+        # coleta não chegou a começar) só libera a porta.
+        iniciado = self._thread.ident is not None
+        self._parar.set()
+        if iniciado:
+            self._thread.join()
+            self._exportar()
+        if self._servidor is not None:
+            if iniciado:
+                self._servidor.shutdown()
+            self._servidor.server_close()
+        return self.ultimo
@@ -0,0 +1,381 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Aquisição sincronizada de várias placas, uma por processo.
+#
+# Cada dispositivo ganha um processo próprio (fora do GIL do supervisor) que
+# só faz getData e envia os blocos para o supervisor. O supervisor estima,
+# para cada placa, o deslocamento e a deriva do relógio de amostragem em
+# relação ao relógio do computador, coloca todas as amostras numa base de
+# tempo comum (ns do relógio do host) e grava tudo numa única sessão:
+#
+#   sessao_AAAA-MM-DD_HH-MM-SS/
+#       manifesto.json          dispositivos, configurações, estimativas de relógio e perdas
+#                               (overruns da placa e blocos descartados, com as lacunas no índice)
+#       <nome>.daq              quadros: índice da placa, tempo comum (ns), valores
+#       <nome>_relogio.npy      chegadas brutas (índice, ns do host) usadas no ajuste
+#
+# Leitura no tempo comum, com as colunas de cada placa: leitor.LeitorSessao(diretorio).
+#
+#   python multidispositivo.py placas.json [--duracao 60]
+#
+# placas.json:
+#   [{"nome": "bancada1", "deviceDescription": "USB-4716,BID#1", "startChannel": 0,
+#     "channelCount": 2, "clockRate": 2000, "sectionLength": 100}, ...]
+
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from formato_binario import TAMANHO_CABECALHO, dtypeParaJson, montarCabecalho
+
+_FIM = "fim"
+_MAX_LACUNAS = 1000     # lacunas listadas uma a uma no manifesto; as demais só somam
+
+
+def _trabalhador(config, fila, parar):
+    # Roda no processo filho: abre a placa, configura e só lê blocos. O getData
+    # nunca espera o supervisor: com a fila cheia o bloco é descartado e
+    # contado. Blocos descartados e overruns do buffer da placa viram lacunas
+    # no índice (o índice avança pelo que se perdeu) e vão na mensagem "fim".
+    from dispositivo import WaveformAiCtrl, BioFailed, AdxEnumToString, ErrorCode, instalarAvisoBurnout
+
+    nome = config["nome"]
+    channelCount = config["channelCount"]
+    sectionLength = config.get("sectionLength", 100)
+
+    wfAiCtrl = WaveformAiCtrl(config["deviceDescription"])
+    instalarAvisoBurnout(wfAiCtrl)
+    if config.get("profilePath"):
+        wfAiCtrl.loadProfile = config["profilePath"]
+    wfAiCtrl.conversion.channelStart = config.get("startChannel", 0)
+    wfAiCtrl.conversion.channelCount = channelCount
+    wfAiCtrl.conversion.clockRate = config["clockRate"]
+    wfAiCtrl.record.sectionCount = 0
+    wfAiCtrl.record.sectionLength = sectionLength
+
+    ret = wfAiCtrl.prepare()
+    if not BioFailed(ret):
+        ret = wfAiCtrl.start()
+    if BioFailed(ret):
+        fila.put((nome, "erro", AdxEnumToString("ErrorCode", ret.value, 256)))
+        fila.put((nome, _FIM, None))
+        return
+
+    inicio_ns = time.time_ns()
+    fila.put((nome, "inicio", inicio_ns))
+    tamanho = channelCount * sectionLength
+    taxa_por_canal = config["clockRate"] / channelCount
+    # Tempo máximo de espera por bloco, para o processo perceber o pedido de parada
+    timeout_ms = max(100, int(2000 * sectionLength * channelCount / config["clockRate"]))
+    indice = 0
+    perdas = {"overruns": 0, "amostras_perdidas": 0, "blocos_descartados": 0,
+              "amostras_descartadas": 0, "lacunas": []}
+    perdidas_placa = getattr(wfAiCtrl, "amostras_perdidas", None)
+
+    def lacuna(indice, amostras, motivo):
+        if len(perdas["lacunas"]) < _MAX_LACUNAS:
+            perdas["lacunas"].append([indice, amostras, motivo])
+
+    while not parar.is_set():
+        ret, returnedCount, data = wfAiCtrl.getData(tamanho, timeout_ms)[:3]
+        recebido_ns = time.time_ns()
+        if BioFailed(ret):
+            fila.put((nome, "erro", AdxEnumToString("ErrorCode", ret.value, 256)))
+            break
+        completos = (returnedCount // channelCount) * channelCount
+        n = completos // channelCount
+        if ret == ErrorCode.WarningCacheOverflow:
+            # O buffer da placa foi sobrescrito: o bloco começa depois do que se
+            # perdeu. Quanto se perdeu vem do dispositivo quando ele informa
+            # (simulador); senão, do relógio do host desde o start()
+            perdas["overruns"] += 1
+            if perdidas_placa is not None:
+                perdidas = wfAiCtrl.amostras_perdidas - perdidas_placa
+                perdidas_placa = wfAiCtrl.amostras_perdidas
+            else:
+                perdidas = int((recebido_ns - inicio_ns) * taxa_por_canal / 1e9) - n - indice
+            if perdidas > 0:
+                lacuna(indice, perdidas, "overrun")
+                perdas["amostras_perdidas"] += perdidas
+                indice += perdidas
+        if completos == 0:
+            continue
+        valores = np.asarray(data[:completos], dtype=np.float32)
+        try:
+            fila.put_nowait((nome, "bloco", (indice, recebido_ns, valores.tobytes())))
+        except queue.Full:
+            # Supervisor atrasado: perde este bloco, não a leitura da placa
+            perdas["blocos_descartados"] += 1
+            perdas["amostras_descartadas"] += n
+            lacuna(indice, n, "fila")
+        indice += n
+
+    wfAiCtrl.stop()
+    wfAiCtrl.release()
+    wfAiCtrl.dispose()
+    fila.put((nome, _FIM, perdas))
+
+
+class EstimadorRelogio:
+
+    # Relaciona o índice de amostra da placa com o relógio do host.
+    # Cada bloco chega depois da última amostra ter sido convertida, com um
+    # atraso sempre positivo e variável. Todas as chegadas (índice, ns) ficam
+    # guardadas e o ajuste é feito uma vez só, no fim: a reta abaixo de todos
+    # os pontos (fronteira inferior do fecho convexo) que fica, em média, mais
+    # perto deles dá o deslocamento e a deriva (ppm) da placa. Como é uma reta
+    # única, o tempo de cada amostra cresce estritamente com o índice.
+
+    def __init__(self, taxa_por_canal):
+        self.periodo_ns = 1e9 / taxa_por_canal
+        self.indices = []
+        self.chegadas = []
+        self._deslocamento = None
+        self.deriva = 0.0
+
+    @property
+    def referencia_ns(self):
+        # Os ajustes são feitos em relação à primeira chegada, para não perder
+        # precisão de float64 com nanossegundos desde 1970
+        return self.chegadas[0] if self.chegadas else None
+
+    @property
+    def deslocamento_ns(self):
+        if self._deslocamento is None:
+            return None
+        return self.referencia_ns + int(round(self._deslocamento))
+
+    def observar(self, indice_fim, recebido_ns):
+        self.indices.append(indice_fim)
+        self.chegadas.append(recebido_ns)
+
+    def ajustar(self):
+        if not self.chegadas:
+            return
+        x = np.array(self.indices, dtype=np.float64)
+        y = (np.array(self.chegadas, dtype=np.int64) - self.referencia_ns) - x * self.periodo_ns
+        # Fronteira inferior do fecho convexo dos resíduos (cadeia monótona)
+        ordem = np.lexsort((y, x))
+        fronteira = []
+        for k in ordem:
+            while len(fronteira) >= 2:
+                a, b = fronteira[-2], fronteira[-1]
+                if (x[b] - x[a]) * (y[k] - y[a]) - (y[b] - y[a]) * (x[k] - x[a]) <= 0:
+                    fronteira.pop()
+                else:
+                    break
+            fronteira.append(k)
+        # Entre as arestas da fronteira, a reta com a menor distância média aos pontos
+        # (um ponto só, ou todos no mesmo índice: sem deriva, pela menor chegada)
+        melhor = (float(y[fronteira[0]]), 0.0)
+        menor = None
+        for a, b in zip(fronteira[:-1], fronteira[1:]):
+            if x[b] == x[a]:
+                continue
+            inclinacao = (y[b] - y[a]) / (x[b] - x[a])
+            corte = y[a] - inclinacao * x[a]
+            soma = float(np.sum(y - (corte + inclinacao * x)))
+            if menor is None or soma < menor:
+                melhor, menor = (float(corte), float(inclinacao)), soma
+        self._deslocamento, inclinacao = melhor
+        self.deriva = inclinacao / self.periodo_ns
+
+    def tempos(self, indices):
+        # Índices da placa -> ns no relógio do host (depois de ajustar)
+        relativo = self._deslocamento + np.asarray(indices, dtype=np.float64) * self.periodo_ns * (1.0 + self.deriva)
+        return self.referencia_ns + np.round(relativo).astype(np.int64)
+
+
+class _Dispositivo:
+
+    # Durante a coleta o tempo_ns gravado é o nominal (início + índice x
+    # período), só para o arquivo já ser legível se o processo cair. No
+    # fechar() o relógio é ajustado com todas as chegadas e a coluna tempo_ns
+    # é reescrita no lugar, em pedaços; as chegadas brutas ficam em
+    # <nome>_relogio.npy para refazer o ajuste depois, se preciso.
+
+    def __init__(self, config, diretorio):
+        self.config = config
+        self.nome = config["nome"]
+        self.channelCount = config["channelCount"]
+        taxa_por_canal = config["clockRate"] / self.channelCount
+        self.relogio = EstimadorRelogio(taxa_por_canal)
+        self.dtype = np.dtype([("indice", "<i8"), ("tempo_ns", "<i8"),
+                               ("valores", "<f4", (self.channelCount,))])
+        self.caminho = os.path.join(diretorio, self.nome + ".daq")
+        self.arquivo = None
+        self.cabecalho = None
+        self.inicio_ns = None
+        self.amostras = 0
+        self.blocos = 0
+        self.erros = []
+        self.perdas = None      # overruns, descartes e lacunas, da mensagem "fim" do trabalhador
+        self.encerrado = False
+
+    def abrir(self, inicio_ns):
+        self.inicio_ns = inicio_ns
+        cabecalho = dict(self.config)
+        start = self.config.get("startChannel", 0)
+        cabecalho.update({
+            "tipo": "sessao",
+            "inicio_ns": inicio_ns,
+            "startChannel": start,
+            "canais": list(range(start, start + self.channelCount)),
+            "campos": dtypeParaJson(self.dtype),
+            "relogio": "nominal",
+        })
+        self.cabecalho = cabecalho
+        self.arquivo = open(self.caminho, "wb")
+        self.arquivo.write(montarCabecalho(cabecalho))
+
+    def gravar(self, indice_inicial, recebido_ns, dados):
+        valores = np.frombuffer(dados, dtype=np.float32).reshape(-1, self.channelCount)
+        n = len(valores)
+        indices = np.arange(indice_inicial, indice_inicial + n, dtype=np.int64)
+        self.relogio.observar(indice_inicial + n, recebido_ns)
+        quadros = np.empty(n, dtype=self.dtype)
+        quadros["indice"] = indices
+        quadros["tempo_ns"] = self.inicio_ns + np.round(indices * self.relogio.periodo_ns).astype(np.int64)
+        quadros["valores"] = valores
+        self.arquivo.write(quadros.tobytes())
+        self.amostras += n
+        self.blocos += 1
+
+    def fechar(self, linhas_por_chunk=100000):
+        if self.arquivo is None:
+            return
+        self.arquivo.close()
+        self.arquivo = None
+        if not self.relogio.chegadas:
+            return
+        self.relogio.ajustar()
+        np.save(os.path.join(os.path.dirname(self.caminho), self.nome + "_relogio.npy"),
+                np.column_stack([self.relogio.indices, self.relogio.chegadas]).astype(np.int64))
+        if self.amostras:
+            quadros = np.memmap(self.caminho, dtype=self.dtype, mode="r+",
+                                offset=TAMANHO_CABECALHO, shape=(self.amostras,))
+            for k in range(0, self.amostras, linhas_por_chunk):
+                trecho = quadros[k:k + linhas_por_chunk]
+                trecho["tempo_ns"] = self.relogio.tempos(trecho["indice"])
+            quadros.flush()
+            del quadros
+        self.cabecalho.update({
+            "relogio": "ajustado",
+            "deslocamento_ns": self.relogio.deslocamento_ns,
+            "deriva_ppm": self.relogio.deriva * 1e6,
+        })
+        with open(self.caminho, "r+b") as f:
+            f.write(montarCabecalho(self.cabecalho))
+
+    def estado(self):
+        return {
+            "config": self.config,
+            "arquivo": os.path.basename(self.caminho),
+            "amostras": self.amostras,
+            "blocos": self.blocos,
+            "deslocamento_ns": None if self.relogio.deslocamento_ns is None else int(self.relogio.deslocamento_ns),
+            "deriva_ppm": self.relogio.deriva * 1e6,
+            "erros": self.erros,
+            "perdas": self.perdas,
+        }
+
+
+class Supervisor:
+
+    def __init__(self, configs, diretorio=".", tamanho_fila=1024):
+        agora = datetime.datetime.now()
+        self.diretorio = os.path.join(diretorio, agora.strftime("sessao_%Y-%m-%d_%H-%M-%S"))
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        self.dispositivos = {}
+        for i, config in enumerate(configs):
+            config = dict(config)
+            config.setdefault("nome", f"dispositivo{i}")
+            self.dispositivos[config["nome"]] = _Dispositivo(config, self.diretorio)
+
+        contexto = multiprocessing.get_context()
+        self.fila = contexto.Queue(maxsize=tamanho_fila)
+        self.parar_evento = contexto.Event()
+        self.processos = [contexto.Process(target=_trabalhador, name=nome,
+                                           args=(d.config, self.fila, self.parar_evento), daemon=True)
+                          for nome, d in self.dispositivos.items()]
+        self._thread = threading.Thread(target=self._laco, name="supervisor", daemon=True)
+
+    def iniciar(self):
+        for p in self.processos:
+            p.start()
+        self._thread.start()
+        return self
+
+    def _laco(self):
+        while not all(d.encerrado for d in self.dispositivos.values()):
+            try:
+                nome, tipo, carga = self.fila.get(timeout=0.5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in self.processos):
+                    break
+                continue
+            d = self.dispositivos[nome]
+            if tipo == "bloco":
+                d.gravar(*carga)
+            elif tipo == "inicio":
+                d.abrir(carga)
+            elif tipo == "erro":
+                d.erros.append(carga)
+            elif tipo == _FIM:
+                d.perdas = carga
+                d.encerrado = True
+
+    def rodando(self):
+        return self._thread.is_alive()
+
+    def parar(self):
+        self.parar_evento.set()
+        self._thread.join()
+        for p in self.processos:
+            p.join(timeout=5)
+        for d in self.dispositivos.values():
+            d.fechar()
+        manifesto = {
+            "dispositivos": {nome: d.estado() for nome, d in self.dispositivos.items()},
+            "base_de_tempo": "ns do relógio do host (time.time_ns)",
+        }
+        with open(os.path.join(self.diretorio, "manifesto.json"), "w") as f:
+            json.dump(manifesto, f, indent=2)
+        return manifesto
+
+
+if __name__ == '__main__':
+    from dispositivo import kbhit
+
+    parser = argparse.ArgumentParser(description="Aquisição com várias placas em processos separados")
+    parser.add_argument("configuracao", help="JSON com a lista de placas")
+    parser.add_argument("--duracao", type=float, default=None, help="segundos (padrão: até uma tecla)")
+    parser.add_argument("--diretorio", default=".")
+    args = parser.parse_args()
+
+    with open(args.configuracao) as f:
+        configs = json.load(f)
+
+    supervisor = Supervisor(configs, args.diretorio).iniciar()
+    print("Coleta de dados em progresso... Pressione qualquer tecla para parar e salvar.")
+    prazo = None if args.duracao is None else time.monotonic() + args.duracao
+    while supervisor.rodando() and not kbhit() and (prazo is None or time.monotonic() < prazo):
+        time.sleep(0.1)
+    manifesto = supervisor.parar()
+    for nome, estado in manifesto["dispositivos"].items():
+        perdas = estado["perdas"] or {}
+        print("%s: %d amostras, deslocamento %s ns, deriva %.2f ppm, %d overruns, %d amostras perdidas, "
+              "%d descartadas %s" % (
+                  nome, estado["amostras"], estado["deslocamento_ns"], estado["deriva_ppm"],
+                  perdas.get("overruns", 0), perdas.get("amostras_perdidas", 0),
+                  perdas.get("amostras_descartadas", 0), estado["erros"] or ""))
+    print(f"Sessão '{supervisor.diretorio}' salva com sucesso!")
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Painel ao vivo (Dash) da coleta em andamento.
+#
+# Lê o anel em memória compartilhada publicado pela aquisição
+# (memoriaCompartilhada = "daq_ao_vivo" no PollingStreamingAI.py), reduz cada
+# canal a pares mín/máx por balde de amostras (os picos nunca somem, como
+# somem numa média ou num "pega 1 a cada N") e guarda só os últimos `pontos`
+# pontos por canal. O navegador recebe a cada atualização apenas os pontos
+# novos (extendData), então o custo não depende do clockRate nem da duração.
+#
+#   python painel.py --anel daq_ao_vivo --janela 60 --pontos 2000
+#   abra http://127.0.0.1:8050
+
+import argparse
+import math
+import threading
+import time
+
+import numpy as np
+
+from memoria_compartilhada import LeitorAnel
+from processamento import indicesParaNs
+
+
+class DecimadorMinMax:
+
+    # Cada balde de `amostras_por_balde` amostras vira dois pontos por canal:
+    # o mínimo e o máximo, na ordem em que aconteceram. O balde incompleto
+    # fica guardado para o próximo bloco.
+
+    def __init__(self, channelCount, amostras_por_balde):
+        self.channelCount = channelCount
+        self.w = amostras_por_balde
+        self._indice = None
+        self._resto = np.empty((0, channelCount), dtype=np.float32)
+
+    def acrescentar(self, indice_inicial, valores):
+        # Retorna (indices, pontos), ambos (2 * baldes, canais)
+        if self._indice is None or indice_inicial != self._indice + len(self._resto):
+            # Primeiro bloco ou salto na sequência: recomeça os baldes aqui
+            self._indice = indice_inicial
+            self._resto = self._resto[:0]
+        if len(self._resto):
+            valores = np.concatenate([self._resto, valores])
+        baldes = len(valores) // self.w
+        usados = baldes * self.w
+        inicio = self._indice
+        self._resto = np.array(valores[usados:], dtype=np.float32)
+        self._indice = inicio + usados
+        if baldes == 0:
+            vazio = np.empty((0, self.channelCount))
+            return vazio.astype(np.int64), vazio
+        cubo = np.asarray(valores[:usados]).reshape(baldes, self.w, self.channelCount)
+        i_min, i_max = cubo.argmin(axis=1), cubo.argmax(axis=1)
+        base = inicio + np.arange(baldes, dtype=np.int64)[:, None] * self.w
+        primeiro, segundo = np.minimum(i_min, i_max), np.maximum(i_min, i_max)
+        indices = np.stack([base + primeiro, base + segundo], axis=1).reshape(-1, self.channelCount)
+        pontos = np.stack([np.take_along_axis(cubo, primeiro[:, None, :], 1)[:, 0],
+                           np.take_along_axis(cubo, segundo[:, None, :], 1)[:, 0]],
+                          axis=1).reshape(-1, self.channelCount)
+        return indices, pontos
+
+
+class SerieAoVivo:
+
+    # Anel de pontos já decimados, com número de sequência, para entregar a
+    # cada cliente só o que ele ainda não tem
+
+    def __init__(self, channelCount, pontos):
+        self.capacidade = pontos
+        self.tempos = np.zeros((pontos, channelCount), dtype=np.int64)
+        self.valores = np.zeros((pontos, channelCount), dtype=np.float32)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def acrescentar(self, tempos, valores):
+        n = len(tempos)
+        if n == 0:
+            return
+        if n > self.capacidade:
+            tempos, valores = tempos[-self.capacidade:], valores[-self.capacidade:]
+            pulo, n = n - self.capacidade, self.capacidade
+        else:
+            pulo = 0
+        with self._lock:
+            inicio = self.total + pulo
+            posicoes = (inicio + np.arange(n)) % self.capacidade
+            self.tempos[posicoes] = tempos
+            self.valores[posicoes] = valores
+            self.total = inicio + n
+
+    def novos(self, desde):
+        # (tempos, valores, total): pontos com sequência >= desde (no máximo os que ainda estão no anel)
+        with self._lock:
+            desde = max(desde, self.total - self.capacidade, 0)
+            posicoes = np.arange(desde, self.total) % self.capacidade
+            return self.tempos[posicoes], self.valores[posicoes], self.total
+
+
+class FonteAnel(threading.Thread):
+
+    # Lê o anel da aquisição numa thread e alimenta a SerieAoVivo. Se a coleta
+    # terminar e outra começar com o mesmo nome, reconecta sozinha.
+
+    def __init__(self, nome, pontos, janela):
+        super().__init__(name="painel_anel", daemon=True)
+        self.nome = nome
+        self.pontos = pontos
+        self.janela = janela
+        self.serie = None
+        self.canais = 0
+        self.sessao = 0
+
+    def _conectar(self):
+        while True:
+            try:
+                return LeitorAnel(self.nome, desde_o_inicio=True)
+            except (FileNotFoundError, ValueError):
+                time.sleep(1.0)
+
+    def run(self):
+        while True:
+            leitor = self._conectar()
+            # Dois pontos por balde: baldes suficientes para `pontos` cobrirem a janela
+            w = max(1, math.ceil(self.janela * leitor.taxa_por_canal / (self.pontos / 2)))
+            decimador = DecimadorMinMax(leitor.channelCount, w)
+            self.serie = SerieAoVivo(leitor.channelCount, self.pontos)
+            self.canais = leitor.channelCount
+            self.sessao += 1
+            while leitor.esperar(1.0) or not leitor.fechado:
+                if leitor.disponiveis() <= 0:
+                    continue
+                fatia = leitor.proximo()
+                # Copia e só então confere: se o escritor passou por cima durante a
+                # cópia, o trecho é descartado (o decimador recomeça no salto)
+                valores = np.array(fatia.valores)
+                indice_inicial = fatia.indice_inicial
+                valida = leitor.valida(fatia)
+                del fatia
+                if not valida:
+                    continue
+                indices, pontos = decimador.acrescentar(indice_inicial, valores)
+                if len(indices):
+                    tempos = indicesParaNs(leitor.inicio_ns, indices, leitor.taxa_por_canal)
+                    self.serie.acrescentar(tempos, pontos)
+            leitor.fechar()
+
+
+def criarApp(fonte, intervalo_ms=250):
+    from dash import Dash, Input, Output, State, dcc, html, no_update
+
+    app = Dash(__name__, title="Aquisição ao vivo")
+    app.layout = html.Div([
+        dcc.Graph(id="grafico", figure={"data": [], "layout": {"uirevision": "fixo"}}),
+        dcc.Interval(id="intervalo", interval=intervalo_ms),
+        # Sessão do anel e sequência do último ponto que este navegador já recebeu
+        dcc.Store(id="estado", data={"sessao": 0, "visto": 0}),
+    ])
+
+    def traco(canal):
+        return {"type": "scattergl", "mode": "lines", "name": f"Canal_{canal}", "x": [], "y": []}
+
+    @app.callback(Output("grafico", "figure"), Output("grafico", "extendData"), Output("estado", "data"),
+                  Input("intervalo", "n_intervals"), State("estado", "data"))
+    def atualizar(_, estado):
+        serie = fonte.serie
+        if serie is None:
+            return no_update, no_update, no_update
+        nova_figura = no_update
+        if estado["sessao"] != fonte.sessao:
+            # Primeira atualização ou coleta nova: recomeça o gráfico
+            nova_figura = {"data": [traco(c) for c in range(fonte.canais)],
+                           "layout": {"uirevision": fonte.sessao, "xaxis": {"type": "date"}}}
+            estado = {"sessao": fonte.sessao, "visto": 0}
+        tempos, valores, total = serie.novos(estado["visto"])
+        estado = {"sessao": estado["sessao"], "visto": total}
+        if len(tempos) == 0:
+            return nova_figura, no_update, estado
+        x = [np.datetime_as_string(tempos[:, c].view("datetime64[ns]"), unit="us").tolist()
+             for c in range(fonte.canais)]
+        y = [valores[:, c].tolist() for c in range(fonte.canais)]
+        extensao = ({"x": x, "y": y}, list(range(fonte.canais)), serie.capacidade)
+        if nova_figura is not no_update:
+            # Na figura nova os pontos já vão direto, sem extendData
+            for c, t in enumerate(nova_figura["data"]):
+                t["x"], t["y"] = x[c], y[c]
+            return nova_figura, no_update, estado
+        return no_update, extensao, estado
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Painel ao vivo da aquisição (Dash)")
+    parser.add_argument("--anel", default="daq_ao_vivo", help="nome do anel em memória compartilhada")
+    parser.add_argument("--janela", type=float, default=60.0, help="segundos visíveis")
+    parser.add_argument("--pontos", type=int, default=2000, help="pontos por canal no gráfico")
+    parser.add_argument("--intervalo", type=int, default=250, help="ms entre atualizações")
+    parser.add_argument("--porta", type=int, default=8050)
+    args = parser.parse_args()
+
+    fonte = FonteAnel(args.anel, args.pontos, args.janela)
+    fonte.start()
+    print(f"Aguardando o anel '{args.anel}'... painel em http://127.0.0.1:{args.porta}")
+    criarApp(fonte, args.intervalo).run(host="127.0.0.1", port=args.porta, debug=False)
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import collections
+import queue
+import threading
+import time
+
+
+# Bloco bruto como saiu do getData, com o índice (por canal) da primeira amostra.
+# O índice é atribuído na thread de aquisição, então os timestamps continuam
+# corretos mesmo quando um bloco é descartado por fila cheia.
+class BlocoBruto:
+    __slots__ = ("indice_inicial", "returnedCount", "data", "publicado_em")
+
+    def __init__(self, indice_inicial, returnedCount, data):
+        self.indice_inicial = indice_inicial
+        self.returnedCount = returnedCount
+        self.data = data
+        self.publicado_em = time.perf_counter()
+
+
+_FIM = object()
+
+
+# Pipeline produtor/consumidor:
+#   thread de aquisição -> fila_blocos -> thread de processamento -> fila_gravacao -> thread de gravação
+# A thread de aquisição só chama publicar(), que nunca bloqueia: se a fila
+# estiver cheia o bloco é descartado e contado em blocos_descartados.
+class PipelineAquisicao:
+
+    def __init__(self, processar, gravar, tamanho_fila=64, tamanho_fila_gravacao=64, observar=None):
+        # processar(bloco_bruto) -> bloco processado, ou None para não gravar (filtro)
+        # gravar(bloco_processado) -> persiste o bloco
+        # observar(etapa, returnedCount, segundos) -> opcional, recebe o tempo gasto em cada
+        #     etapa ("processamento" para todos os blocos, "gravacao" para os gravados)
+        self.processar = processar
+        self.gravar = gravar
+        self.observar = observar
+
+        self.fila_blocos = queue.Queue(maxsize=tamanho_fila)
+        self.fila_gravacao = queue.Queue(maxsize=tamanho_fila_gravacao)
+
+        # Contadores
+        self.blocos_recebidos = 0
+        self.blocos_descartados = 0
+        self.blocos_filtrados = 0
+        self.blocos_gravados = 0
+        self.profundidade_maxima = 0
+        self.erros = []
+        # Latência (s) de cada bloco gravado, da publicação até o fim da gravação
+        self.latencias = collections.deque(maxlen=100000)
+
+        self._threads = [
+            threading.Thread(target=self._laco_processamento, name="processamento", daemon=True),
+            threading.Thread(target=self._laco_gravacao, name="gravacao", daemon=True),
+        ]
+
+    def iniciar(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def publicar(self, indice_inicial, returnedCount, data):
+        # Chamado pela thread de aquisição logo após o getData
+        self.blocos_recebidos += 1
+        try:
+            self.fila_blocos.put_nowait(BlocoBruto(indice_inicial, returnedCount, data))
+        except queue.Full:
+            self.blocos_descartados += 1
+            return False
+        profundidade = self.fila_blocos.qsize()
+        if profundidade > self.profundidade_maxima:
+            self.profundidade_maxima = profundidade
+        return True
+
+    def _laco_processamento(self):
+        while True:
+            bloco = self.fila_blocos.get()
+            if bloco is _FIM:
+                self.fila_gravacao.put(_FIM)
+                return
+            inicio = time.perf_counter()
+            try:
+                processado = self.processar(bloco)
+            except Exception as e:
+                self.erros.append(e)
+                continue
+            if self.observar is not None:
+                self.observar("processamento", bloco.returnedCount, time.perf_counter() - inicio)
+            if processado is None:
+                self.blocos_filtrados += 1
+                continue
+            # A gravação pode esperar: aqui o bloqueio só atrasa o processamento,
+            # nunca a aquisição
+            self.fila_gravacao.put((processado, bloco.returnedCount, bloco.publicado_em))
+
+    def _laco_gravacao(self):
+        while True:
+            item = self.fila_gravacao.get()
+            if item is _FIM:
+                return
+            processado, returnedCount, publicado_em = item
+            inicio = time.perf_counter()
+            try:
+                self.gravar(processado)
+                self.blocos_gravados += 1
+                fim = time.perf_counter()
+                self.latencias.append(fim - publicado_em)
+            except Exception as e:
+                self.erros.append(e)
+                continue
+            if self.observar is not None:
+                self.observar("gravacao", returnedCount, fim - inicio)
+
+    def contadores(self):
+        return {
+            "fila_blocos": self.fila_blocos.qsize(),
+            "fila_gravacao": self.fila_gravacao.qsize(),
+            "profundidade_maxima": self.profundidade_maxima,
+            "blocos_recebidos": self.blocos_recebidos,
+            "blocos_descartados": self.blocos_descartados,
+            "blocos_filtrados": self.blocos_filtrados,
+            "blocos_gravados": self.blocos_gravados,
+            "erros": len(self.erros),
+        }
+
+    def parar(self):
+        # Esvazia o que já foi publicado e encerra as threads
+        self.fila_blocos.put(_FIM)
+        for t in self._threads:
+            t.join()
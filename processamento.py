@@ -0,0 +1,80 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+import numpy as np
+
+
+# Bloco já convertido: uma linha por amostra (por canal), uma coluna por canal.
+#   indice_inicial: índice (por canal) da primeira amostra desde o início da coleta
+#   timestamps:     vetor datetime64[ns] com o horário de cada amostra
+#   valores:        matriz (amostras, channelCount)
+#   indices:        opcional; só é passado quando as amostras não são consecutivas
+#                   (ex.: janela de evento que atravessa um bloco descartado)
+class Bloco:
+    __slots__ = ("indice_inicial", "timestamps", "valores", "_indices")
+
+    def __init__(self, indice_inicial, timestamps, valores, indices=None):
+        self.indice_inicial = indice_inicial
+        self.timestamps = timestamps
+        self.valores = valores
+        self._indices = indices
+
+    def __len__(self):
+        return len(self.valores)
+
+    @property
+    def indices(self):
+        if self._indices is None:
+            return np.arange(self.indice_inicial, self.indice_inicial + len(self), dtype=np.int64)
+        return self._indices
+
+
+def blocoParaMatriz(data, returnedCount, channelCount, dtype=np.float64):
+    # Converte o buffer intercalado do getData em (amostras, channelCount) numa
+    # única chamada. Uma leitura incompleta no fim do bloco é descartada, como
+    # fazia o teste len(amostras_da_leitura) == channelCount.
+    completos = (returnedCount // channelCount) * channelCount
+    return np.asarray(data[:completos], dtype=dtype).reshape(-1, channelCount)
+
+
+def inicioEmNs(hora_inicio_coleta):
+    # datetime "ingênuo" (hora local) -> inteiro de nanossegundos. Mantém os campos
+    # de data/hora como estão, igual ao strftime usado no CSV.
+    return int(np.datetime64(hora_inicio_coleta, "ns").astype(np.int64))
+
+
+def periodoEmNs(taxa_por_canal):
+    return 1e9 / taxa_por_canal
+
+
+def indicesParaNs(inicio_ns, indices, taxa_por_canal):
+    # Vetor int64 de nanossegundos: inicio + indice / taxa_por_canal.
+    # Com taxa inteira o cálculo é exato em inteiros; não acumula erro com o tempo.
+    # Segundos inteiros e resto separados: indices * 1e9 estouraria o int64
+    # depois de ~9.2e9 amostras (menos de 3 h a 1 MHz).
+    indices = np.asarray(indices, dtype=np.int64)
+    if float(taxa_por_canal).is_integer():
+        taxa = int(taxa_por_canal)
+        return inicio_ns + (indices // taxa) * 1_000_000_000 + (indices % taxa) * 1_000_000_000 // taxa
+    return inicio_ns + np.round(indices * periodoEmNs(taxa_por_canal)).astype(np.int64)
+
+
+def timestampsNs(inicio_ns, indice_inicial, quantidade, taxa_por_canal):
+    indices = np.arange(indice_inicial, indice_inicial + quantidade, dtype=np.int64)
+    return indicesParaNs(inicio_ns, indices, taxa_por_canal)
+
+
+def blocoAtivo(matriz, limiar=0.01):
+    # Equivalente vetorizado de statistics.mean(data) > limiar
+    return matriz.size > 0 and float(matriz.mean()) > limiar
+
+
+def processarBloco(data, returnedCount, channelCount, indice_inicial, inicio_ns,
+                   taxa_por_canal, limiar=0.01, dtype=np.float64):
+    # Bloco bruto -> Bloco, ou None se o bloco não passou no filtro de atividade
+    matriz = blocoParaMatriz(data, returnedCount, channelCount, dtype)
+    if not blocoAtivo(matriz, limiar):
+        return None
+    ns = timestampsNs(inicio_ns, indice_inicial, len(matriz), taxa_por_canal)
+    return Bloco(indice_inicial, ns.view("datetime64[ns]"), matriz)
+
@@ -0,0 +1,170 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Resumos multiescala: mín/máx/média/RMS por canal em janelas de tempo fixas
+# (ex.: 10 ms, 1 s, 1 min), atualizados a cada bloco e gravados ao lado dos
+# dados brutos. Uma coleta de horas pode ser visualizada lendo alguns KB do
+# resumo em vez de reler GB de CSV.
+#
+# Cada escala vira um arquivo .daq (mesmo cabeçalho do formato_binario) com
+# um quadro por janela: índice da primeira amostra da janela, quantidade de
+# amostras e as quatro estatísticas por canal.
+
+import datetime
+import os
+import time
+
+import numpy as np
+
+from formato_binario import abrirCaptura, dtypeParaJson, montarCabecalho, timestampsCaptura
+
+
+def dtypeResumo(channelCount):
+    return np.dtype([("indice", "<i8"), ("contagem", "<i4"),
+                     ("min", "<f4", (channelCount,)), ("max", "<f4", (channelCount,)),
+                     ("media", "<f4", (channelCount,)), ("rms", "<f4", (channelCount,))])
+
+
+def nomeEscala(escala):
+    if escala >= 60 and escala % 60 == 0:
+        return f"{int(escala // 60)}min"
+    if escala >= 1 and float(escala).is_integer():
+        return f"{int(escala)}s"
+    return f"{escala * 1000:g}ms"
+
+
+class _Escala:
+
+    def __init__(self, escala, amostras_por_janela, channelCount):
+        self.escala = escala
+        self.w = amostras_por_janela
+        self.dtype = dtypeResumo(channelCount)
+        # Janela parcial (ainda aberta) carregada entre blocos
+        self.janela = None
+        self.contagem = 0
+        self.minimo = self.maximo = self.soma = self.soma_q = None
+        self.arquivo = None
+
+    def acrescentar(self, indices, valores):
+        # Retorna os quadros das janelas concluídas neste bloco
+        janelas = indices // self.w
+        cortes = np.flatnonzero(np.diff(janelas)) + 1
+        inicios = np.concatenate([[0], cortes])
+
+        v = valores.astype(np.float64, copy=False)
+        minimos = np.minimum.reduceat(v, inicios, axis=0)
+        maximos = np.maximum.reduceat(v, inicios, axis=0)
+        somas = np.add.reduceat(v, inicios, axis=0)
+        somas_q = np.add.reduceat(v * v, inicios, axis=0)
+        contagens = np.diff(np.concatenate([inicios, [len(indices)]]))
+        ids = janelas[inicios]
+
+        # Junta a primeira janela do bloco com a parcial do bloco anterior
+        if self.janela is not None and ids[0] == self.janela:
+            minimos[0] = np.minimum(minimos[0], self.minimo)
+            maximos[0] = np.maximum(maximos[0], self.maximo)
+            somas[0] += self.soma
+            somas_q[0] += self.soma_q
+            contagens[0] += self.contagem
+            anterior = None
+        else:
+            anterior = self._parcial()
+
+        # A última janela fica aberta até o próximo bloco
+        self.janela, self.contagem = ids[-1], contagens[-1]
+        self.minimo, self.maximo = minimos[-1], maximos[-1]
+        self.soma, self.soma_q = somas[-1], somas_q[-1]
+
+        quadros = self._quadros(ids[:-1], contagens[:-1], minimos[:-1], maximos[:-1],
+                                somas[:-1], somas_q[:-1])
+        if anterior is not None:
+            quadros = np.concatenate([anterior, quadros])
+        return quadros
+
+    def _quadros(self, ids, contagens, minimos, maximos, somas, somas_q):
+        quadros = np.empty(len(ids), dtype=self.dtype)
+        if len(ids) == 0:
+            return quadros
+        n = contagens[:, None]
+        quadros["indice"] = ids * self.w
+        quadros["contagem"] = contagens
+        quadros["min"] = minimos
+        quadros["max"] = maximos
+        quadros["media"] = somas / n
+        quadros["rms"] = np.sqrt(somas_q / n)
+        return quadros
+
+    def _parcial(self):
+        if self.janela is None:
+            return None
+        quadros = self._quadros(np.array([self.janela]), np.array([self.contagem]),
+                                self.minimo[None], self.maximo[None],
+                                self.soma[None], self.soma_q[None])
+        self.janela = None
+        return quadros
+
+
+class ResumoMultiescala:
+
+    def __init__(self, canais, taxa_por_canal, inicio_ns, escalas=(0.01, 1.0, 60.0),
+                 diretorio=".", prefixo="dados", metadados=None, flush_segundos=1.0):
+        # canais: números dos canais; escalas: largura das janelas em segundos
+        self.canais = list(canais)
+        self.taxa_por_canal = taxa_por_canal
+        self.inicio_ns = inicio_ns
+        self.flush_segundos = flush_segundos
+        self._ultimo_flush = time.monotonic()
+
+        # inicio_ns guarda a hora local "como está" (ver processamento.inicioEmNs)
+        hora_inicio = datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=inicio_ns // 1000)
+        base = hora_inicio.strftime(f"{prefixo}_%Y-%m-%d_%H-%M-%S")
+        self.escalas = []
+        self.arquivos = []
+        for escala in escalas:
+            w = max(1, int(round(escala * taxa_por_canal)))
+            e = _Escala(escala, w, len(self.canais))
+            caminho = os.path.join(diretorio, f"{base}_resumo_{nomeEscala(escala)}.daq")
+            cabecalho = dict(metadados or {})
+            cabecalho.update({
+                "tipo": "resumo",
+                "escala_s": escala,
+                "amostras_por_janela": w,
+                "clockRate": taxa_por_canal * len(self.canais),
+                "inicio_ns": inicio_ns,
+                "startChannel": self.canais[0] if self.canais else 0,
+                "channelCount": len(self.canais),
+                "canais": self.canais,
+                "campos": dtypeParaJson(e.dtype),
+            })
+            e.arquivo = open(caminho, "wb")
+            e.arquivo.write(montarCabecalho(cabecalho))
+            self.escalas.append(e)
+            self.arquivos.append(caminho)
+
+    def acrescentar_bloco(self, bloco):
+        if len(bloco) == 0:
+            return
+        indices, valores = bloco.indices, bloco.valores
+        for e in self.escalas:
+            quadros = e.acrescentar(indices, valores)
+            if len(quadros):
+                e.arquivo.write(quadros.tobytes())
+        agora = time.monotonic()
+        if agora - self._ultimo_flush >= self.flush_segundos:
+            for e in self.escalas:
+                e.arquivo.flush()
+            self._ultimo_flush = agora
+
+    def fechar(self):
+        # Grava as janelas ainda abertas (incompletas) e fecha os arquivos
+        for e in self.escalas:
+            parcial = e._parcial()
+            if parcial is not None:
+                e.arquivo.write(parcial.tobytes())
+            e.arquivo.close()
+
+
+def lerResumo(caminho):
+    # Retorna (metadados, timestamps datetime64[ns], quadros) de um arquivo de resumo
+    metadados, quadros = abrirCaptura(caminho)
+    return metadados, timestampsCaptura(metadados, quadros["indice"]), quadros
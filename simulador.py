@@ -0,0 +1,371 @@
+#!/usr/bin/python
+# -*- coding:utf-8 -*-
+
+# Substituto em software do WaveformAiCtrl da Advantech (Automation.BDaq),
+# para rodar e medir a aquisição sem a placa, inclusive no Linux.
+#
+# Honra conversion.clockRate / channelCount / channelStart e
+# record.sectionLength, devolve as mesmas tuplas (ret, returnedCount, data)
+# do getData e entrega as amostras no ritmo do relógio de amostragem. Os
+# valores vêm de capturas dados_*.csv repetidas em laço ou de formas de onda
+# sintéticas (pulsos como os do ana.txt, senoide, ruído) e, como na placa,
+# saem da grade de 16 bits da faixa (valueRange) de cada canal.
+
+import glob
+import os
+import sys
+import threading
+import time
+from enum import Enum
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import select
+
+import numpy as np
+
+from formato_comprimido import coeficientesEscala, escalar, quantizar
+
+
+# Só os códigos que o script usa. Como no BDaq, erros ficam na faixa
+# 0xE0000000 e avisos na faixa 0xA0000000 (avisos não são falhas).
+class ErrorCode(Enum):
+    Success = 0
+    WarningFuncStopped = 0xA0000007
+    WarningFuncTimeout = 0xA0000008
+    WarningCacheOverflow = 0xA0000009
+    ErrorFuncNotInited = 0xE000001B
+    ErrorParamOutOfRange = 0xE0000001
+
+
+def BioFailed(ret):
+    return ret.value >= 0xE0000000
+
+
+def AdxEnumToString(nome, valor, tamanho):
+    try:
+        return ErrorCode(valor).name
+    except ValueError:
+        return "Unknown"
+
+
+# --- Fontes de forma de onda ---
+# gerar(indice_inicial, quantidade, channelCount, taxa_por_canal) -> matriz (quantidade, channelCount)
+
+class FonteSintetica:
+
+    def __init__(self, forma="pulsos", amplitude=5.0, frequencia=50.0, ruido=0.0005,
+                 periodo_pulso=1.0, duracao_pulso=0.02, semente=0):
+        # forma: "pulsos" (eventos de corrente com subida rápida e queda lenta),
+        #        "seno" ou "ruido"
+        self.forma = forma
+        self.amplitude = amplitude
+        self.frequencia = frequencia
+        self.ruido = ruido
+        self.periodo_pulso = periodo_pulso
+        self.duracao_pulso = duracao_pulso
+        self.rng = np.random.default_rng(semente)
+
+    def gerar(self, indice_inicial, quantidade, channelCount, taxa_por_canal):
+        t = np.arange(indice_inicial, indice_inicial + quantidade, dtype=np.float64) / taxa_por_canal
+        t = t[:, None] + np.arange(channelCount) * 1e-3  # canais levemente defasados
+        if self.forma == "seno":
+            sinal = self.amplitude * np.sin(2 * np.pi * self.frequencia * t)
+        elif self.forma == "ruido":
+            sinal = np.zeros_like(t)
+        else:
+            # Pulso: sobe em ~duracao/10, decai exponencialmente até o fim da janela
+            fase = np.mod(t, self.periodo_pulso)
+            tau = self.duracao_pulso / 4
+            subida = self.duracao_pulso / 10
+            sinal = np.where(fase < subida, fase / subida,
+                             np.exp(-(fase - subida) / tau))
+            sinal = np.where(fase < self.duracao_pulso, sinal, 0.0) * self.amplitude
+            sinal = sinal / (np.arange(channelCount) + 1)  # canais seguintes com escala menor
+        if self.ruido:
+            sinal = sinal + self.rng.normal(0.0, self.ruido, sinal.shape)
+        return sinal
+
+
+class FonteArquivo:
+
+    def __init__(self, caminhos):
+        # caminhos: arquivo, padrão glob (ex.: "dados_*.csv") ou lista deles
+        if isinstance(caminhos, str):
+            caminhos = sorted(glob.glob(caminhos)) or [caminhos]
+        colunas = []
+        for caminho in caminhos:
+            valores = lerValoresCsv(caminho)
+            if len(valores):
+                colunas.append(valores)
+        if not colunas:
+            raise ValueError(f"nenhuma amostra encontrada em {caminhos}")
+        largura = max(v.shape[1] for v in colunas)
+        self.valores = np.concatenate([np.resize(v, (len(v), largura)) if v.shape[1] != largura else v
+                                       for v in colunas])
+
+    def gerar(self, indice_inicial, quantidade, channelCount, taxa_por_canal):
+        # Repete a captura em laço; canais a mais reaproveitam as colunas existentes
+        linhas = np.arange(indice_inicial, indice_inicial + quantidade) % len(self.valores)
+        colunas = np.arange(channelCount) % self.valores.shape[1]
+        return self.valores[linhas][:, colunas]
+
+
+def lerValoresCsv(caminho):
+    # Lê só as colunas Canal_N de um arquivo "Timestamp, Canal_0, ..."
+    with open(caminho) as f:
+        cabecalho = f.readline()
+        largura = len(cabecalho.split(",")) - 1
+        if largura <= 0:
+            return np.empty((0, 0))
+        valores = np.loadtxt(f, delimiter=",", usecols=range(1, largura + 1), ndmin=2)
+    return valores
+
+
+# --- Objetos de configuração, com os mesmos nomes do BDaq ---
+
+class _Conversao:
+    def __init__(self):
+        self.channelStart = 0
+        self.channelCount = 1
+        self.clockRate = 1000
+
+
+class _Registro:
+    def __init__(self):
+        self.sectionCount = 0
+        self.sectionLength = 1024
+
+
+class ArgsEvento:
+    # Equivalente ao BfdAiEventArgs: Offset/Count em valores (amostras x canais)
+    def __init__(self, Offset=0, Count=0):
+        self.Offset = Offset
+        self.Count = Count
+
+
+class _Canal:
+    def __init__(self):
+        self.signalType = "SingleEnded"
+        self.valueRange = "V_Neg10To10"
+
+
+class WaveformAiCtrl:
+
+    # Configuração global, usada quando o script cria o controlador só com o deviceDescription
+    fonte_padrao = None
+    tempo_real = True
+    secoes_buffer = 16
+    bits_adc = 16               # None = valores da fonte sem passar pelo ADC
+
+    def __init__(self, deviceDescription="Simulado,BID#0", fonte=None, tempo_real=None,
+                 secoes_buffer=None, numero_canais=16):
+        self.deviceDescription = deviceDescription
+        self.fonte = fonte or WaveformAiCtrl.fonte_padrao or FonteSintetica()
+        self.tempo_real = WaveformAiCtrl.tempo_real if tempo_real is None else tempo_real
+        self.secoes_buffer = secoes_buffer or WaveformAiCtrl.secoes_buffer
+
+        self.loadProfile = None
+        self.conversion = _Conversao()
+        self.record = _Registro()
+        self.channels = [_Canal() for _ in range(numero_canais)]
+
+        self._handlers = {}
+        self._preparado = False
+        self._rodando = False
+        self._t0 = 0.0
+        self._entregues = 0       # amostras por canal já entregues
+        self.overruns = 0
+        self.amostras_perdidas = 0
+        self._lock = threading.RLock()
+
+    # --- Eventos ---
+    def _adicionar(self, evento, handler, param):
+        self._handlers.setdefault(evento, []).append((handler, param))
+
+    def _disparar(self, evento, args=None):
+        for handler, param in self._handlers.get(evento, []):
+            handler(self, args, param)
+
+    def addBurnOutHandler(self, handler, param=None):
+        self._adicionar("burnout", handler, param)
+
+    def addDataReadyHandler(self, handler, param=None):
+        self._adicionar("dados", handler, param)
+
+    def addOverrunHandler(self, handler, param=None):
+        self._adicionar("overrun", handler, param)
+
+    def addCacheOverflowHandler(self, handler, param=None):
+        self._adicionar("cache_overflow", handler, param)
+
+    def addStoppedHandler(self, handler, param=None):
+        self._adicionar("parado", handler, param)
+
+    def _laco_eventos(self):
+        # Como o driver: avisa a cada sectionLength amostras por canal prontas
+        # e avisa overrun quando o buffer circular transborda
+        secao = max(self.record.sectionLength, 1)
+        canais = self.conversion.channelCount
+        while self._rodando:
+            disponiveis = self.amostras_disponiveis()
+            if disponiveis > self.capacidade_buffer():
+                self._descartar_excesso()
+                self._disparar("overrun", ArgsEvento(0, disponiveis * canais))
+                self._disparar("cache_overflow", ArgsEvento(0, disponiveis * canais))
+            elif disponiveis >= secao:
+                self._disparar("dados", ArgsEvento(0, (disponiveis // secao) * secao * canais))
+            time.sleep(min(0.05, secao / self.taxa_por_canal / 4))
+        self._disparar("parado", ArgsEvento())
+
+    # --- Ciclo de vida ---
+    def prepare(self):
+        if self.conversion.channelCount <= 0 or self.conversion.clockRate <= 0:
+            return ErrorCode.ErrorParamOutOfRange
+        if self.conversion.channelStart + self.conversion.channelCount > len(self.channels):
+            return ErrorCode.ErrorParamOutOfRange
+        self._preparado = True
+        return ErrorCode.Success
+
+    def start(self):
+        if not self._preparado:
+            ret = self.prepare()
+            if BioFailed(ret):
+                return ret
+        self._t0 = time.monotonic()
+        self._entregues = 0
+        self._rodando = True
+        _reiniciarPrazo()
+        self._thread_eventos = None
+        if self._handlers.get("dados") and self.tempo_real:
+            self._thread_eventos = threading.Thread(target=self._laco_eventos, daemon=True)
+            self._thread_eventos.start()
+        return ErrorCode.Success
+
+    def stop(self):
+        self._rodando = False
+        if getattr(self, "_thread_eventos", None) is not None:
+            if self._thread_eventos is not threading.current_thread():
+                self._thread_eventos.join()
+            self._thread_eventos = None
+        return ErrorCode.Success
+
+    def release(self):
+        self._preparado = False
+        self._rodando = False
+
+    def dispose(self):
+        self._handlers.clear()
+
+    # --- Dados ---
+    @property
+    def taxa_por_canal(self):
+        return self.conversion.clockRate / self.conversion.channelCount
+
+    def capacidade_buffer(self):
+        # Amostras por canal que o "driver" guarda antes de sobrescrever (buffer circular)
+        return max(self.record.sectionLength, 1) * self.secoes_buffer
+
+    def amostras_disponiveis(self):
+        if not self.tempo_real:
+            return sys.maxsize
+        produzidas = int((time.monotonic() - self._t0) * self.taxa_por_canal)
+        return produzidas - self._entregues
+
+    def _descartar_excesso(self):
+        # O consumidor atrasou mais que o buffer do driver: as mais antigas se perdem
+        with self._lock:
+            perdidas = self.amostras_disponiveis() - self.capacidade_buffer()
+            if perdidas > 0:
+                self._entregues += perdidas
+                self.amostras_perdidas += perdidas
+                self.overruns += 1
+
+    def getData(self, count, timeout=-1):
+        # count: número de valores (amostras x canais), como no BDaq
+        # timeout: em ms; -1 espera indefinidamente, 0 devolve o que houver
+        if not self._rodando:
+            return (ErrorCode.ErrorFuncNotInited, 0, [])
+
+        canais = self.conversion.channelCount
+        pedidas = count // canais
+        ret = ErrorCode.Success
+
+        if self.tempo_real:
+            disponiveis = self.amostras_disponiveis()
+            if disponiveis > self.capacidade_buffer():
+                self._descartar_excesso()
+                ret = ErrorCode.WarningCacheOverflow
+                disponiveis = self.capacidade_buffer()
+
+            if disponiveis < pedidas and timeout != 0:
+                espera = (pedidas - disponiveis) / self.taxa_por_canal
+                if timeout > 0 and espera > timeout / 1000.0:
+                    time.sleep(timeout / 1000.0)
+                    disponiveis = self.amostras_disponiveis()
+                    if disponiveis < pedidas and ret == ErrorCode.Success:
+                        ret = ErrorCode.WarningFuncTimeout
+                else:
+                    time.sleep(espera)
+                    disponiveis = self.amostras_disponiveis()
+            pedidas = max(0, min(pedidas, disponiveis))
+
+        if pedidas == 0:
+            return (ret, 0, [])
+
+        matriz = self.fonte.gerar(self._entregues, pedidas, canais, self.taxa_por_canal)
+        if self.bits_adc is not None:
+            matriz = self._converter(matriz)
+        self._entregues += pedidas
+        # O driver entrega os canais intercalados numa lista de floats
+        data = matriz.reshape(-1).tolist()
+        return (ret, len(data), data)
+
+
+    def _converter(self, matriz):
+        # Como o ADC: satura na faixa de cada canal e arredonda para o código mais próximo
+        faixas = self.channels[self.conversion.channelStart:
+                               self.conversion.channelStart + self.conversion.channelCount]
+        coeficientes = [coeficientesEscala(c.valueRange, self.bits_adc) for c in faixas]
+        ganho = np.array([c[0] for c in coeficientes])
+        deslocamento = np.array([c[1] for c in coeficientes])
+        codigos = quantizar(matriz, ganho, deslocamento, self.bits_adc)[0]
+        return escalar(codigos, ganho, deslocamento, dtype=np.float64)
+
+
+# kbhit para o modo simulado: tecla no terminal (quando houver um) ou fim do
+# tempo definido em DAQ_SIMULADO_DURACAO (segundos), contado a partir do
+# primeiro kbhit depois do último start()
+_prazo = None
+_prazo_lock = threading.Lock()
+
+
+def _reiniciarPrazo():
+    global _prazo
+    with _prazo_lock:
+        _prazo = None
+
+
+def kbhit():
+    global _prazo
+    duracao = os.environ.get("DAQ_SIMULADO_DURACAO")
+    if duracao:
+        with _prazo_lock:
+            if _prazo is None:
+                _prazo = time.monotonic() + float(duracao)
+        if time.monotonic() >= _prazo:
+            return True
+    # A tecla é consumida para não parar também a próxima coleta
+    if os.name == "nt":
+        if msvcrt.kbhit():
+            msvcrt.getwch()
+            return True
+        return False
+    if sys.stdin is not None and sys.stdin.isatty():
+        pronto, _, _ = select.select([sys.stdin], [], [], 0)
+        if pronto:
+            # Terminal em modo canônico: só fica pronto com a linha completa (Enter)
+            sys.stdin.readline()
+            return True
+    return False